@@ -0,0 +1,406 @@
+import json
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from beam import Beam
+from instrumentation import instrumented, phase, record_allocation
+from loading import biaxial_required_stress, section_properties
+
+# degrees of freedom of a node and the matching load components, global axes
+NODE_DOFS = ("ux", "uy", "uz", "rx", "ry", "rz")
+NODE_LOADS = ("Fx", "Fy", "Fz", "Mx", "My", "Mz")
+
+Member = namedtuple("Member", ("name", "beam", "start", "end", "up"))
+
+# smallest singular value, relative to the largest, of the rigid-body
+# motions seen by the supports of a connected part below which the part is
+# taken to be free to move; the check does not depend on how finely the
+# members are sectioned, unlike the pivots of the factorization, which
+# fall off with the section count
+SUPPORT_TOLERANCE = 1e-9
+_MECHANISM = "The assembly is not sufficiently supported (it can move as a mechanism)."
+
+
+def _free_rigid_motion(positions, start, end, fixed):
+    """
+    Whether the supports leave a connected part of the frame free to move.
+
+    Rigidly jointed frame elements only deform under strain, so the
+    stiffness of every connected part is singular exactly along its six
+    rigid-body motions; the part is supported when the fixed dofs restrain
+    all six. Nodes without elements are parts of their own.
+    """
+    from scipy import sparse
+    from scipy.sparse.csgraph import connected_components
+
+    count = len(positions)
+    graph = sparse.coo_matrix((np.ones(len(start)), (start, end)), shape=(count, count))
+    parts, labels = connected_components(graph, directed=False)
+    held = fixed.reshape(count, 6)
+    order = np.argsort(labels, kind="stable")
+    for nodes in np.split(order, np.flatnonzero(np.diff(labels[order])) + 1):
+        x = positions[nodes] - positions[nodes].mean(axis=0)
+        size = np.abs(x).max()
+        r = x / size if size > 0 else x
+        # displacement of every dof (rows: ux..rz) under a unit translation
+        # or rotation (columns: tx, ty, tz, rx, ry, rz) about the part's centre
+        motion = np.zeros((len(nodes), 6, 6))
+        motion[:, np.arange(6), np.arange(6)] = 1.0
+        motion[:, 0, 4], motion[:, 0, 5] = r[:, 2], -r[:, 1]
+        motion[:, 1, 3], motion[:, 1, 5] = -r[:, 2], r[:, 0]
+        motion[:, 2, 3], motion[:, 2, 4] = r[:, 1], -r[:, 0]
+        restrained = motion[held[nodes]]
+        if len(restrained) < 6:
+            return True
+        singular = np.linalg.svd(restrained, compute_uv=False)
+        if singular[-1] <= SUPPORT_TOLERANCE * singular[0]:
+            return True
+    return False
+
+
+def _section_flexibility(L, EA, EI, EI_lateral, GJ):
+    """
+    Tip flexibility of sections clamped at their start, in local axes.
+
+    Local x runs along the section, z along the section height and y
+    along the width; EI bends in the height plane (uz, ry) and
+    EI_lateral in the width plane (uy, rz). Inputs are arrays over
+    sections, the result has shape (sections, 6, 6).
+    """
+    f = np.zeros((len(L), 6, 6))
+    f[:, 0, 0] = L / EA
+    f[:, 3, 3] = L / GJ
+    # (displacement, rotation) dofs and the sign of their coupling in each bending plane
+    for (u, r), EI_plane, sign in (((2, 4), EI, -1), ((1, 5), EI_lateral, 1)):
+        f[:, u, u] = L**3 / (3 * EI_plane)
+        f[:, u, r] = f[:, r, u] = sign * L**2 / (2 * EI_plane)
+        f[:, r, r] = L / EI_plane
+    return f
+
+
+def _offset(a):
+    """
+    Rigid-body transfer along local x: (n, 6, 6) matrices that carry the
+    displacement and rotation of a point to the point `a` further on; the
+    transpose carries forces and moments back by `a`.
+    """
+    g = np.broadcast_to(np.eye(6), (len(a), 6, 6)).copy()
+    g[:, 1, 5] = a
+    g[:, 2, 4] = -a
+    return g
+
+
+def _rotation(start, end, up):
+    # rows: local x (along the member), y (width) and z (height) in global coordinates
+    axis = np.subtract(end, start, dtype=float)
+    length = float(np.linalg.norm(axis))
+    if length == 0:
+        raise ValueError("Member start and end nodes coincide.")
+    x = axis / length
+    z = np.asarray(up, dtype=float) - np.dot(up, x) * x
+    if np.linalg.norm(z) < 1e-9 * np.linalg.norm(up):
+        raise ValueError("The member's up direction is parallel to the member.")
+    z /= np.linalg.norm(z)
+    return np.array([x, np.cross(z, x), z]), length
+
+
+class Assembly:
+    """
+    Frame of `Beam`s joined at nodes, solved with a global stiffness matrix.
+
+    Each member lays a beam out from its start node (section 0) to its end
+    node, with the section height along `up`. Every member becomes one
+    frame element whose end flexibility sums that of its sections (their
+    EA, EI, EI_lateral and GJ), which is exact for node loads, and the
+    forces in every section follow from the member end forces by statics.
+    Sections shared between beams also share their cached properties
+    (see `section.py`). Member matrices are built in chunks on a thread
+    pool, and the global system is factorized once and reused for every
+    load vector until the assembly changes.
+    """
+
+    def __init__(self, workers=None, chunk_size=2048):
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.nodes = {}
+        self.members = []
+        self.supports = {}
+        self._system = None
+
+    def add_node(self, name, x, y, z=0.0):
+        self.nodes[name] = (float(x), float(y), float(z))
+        self._system = None
+
+    def add_member(self, name, beam, start, end, up=(0.0, 0.0, 1.0)):
+        """Join nodes `start` and `end` with `beam`; its sections must add up to the node distance."""
+        for node in (start, end):
+            if node not in self.nodes:
+                raise ValueError(f"Member '{name}': unknown node '{node}'.")
+        if not beam.sections:
+            raise ValueError(f"Member '{name}': beam has no sections.")
+        if any(m.name == name for m in self.members):
+            raise ValueError(f"Member '{name}' already exists.")
+        _, distance = _rotation(self.nodes[start], self.nodes[end], up)
+        length = sum(s.length for s in beam.sections)
+        if abs(length - distance) > 1e-6 * distance:
+            raise ValueError(f"Member '{name}': sections add up to {length} m but the nodes are {distance} m apart.")
+        self.members.append(Member(name, beam, start, end, tuple(float(v) for v in up)))
+        self._system = None
+
+    def fix(self, node, dofs=NODE_DOFS):
+        """Hold some or all degrees of freedom (ux, uy, uz, rx, ry, rz) of a node at zero."""
+        if node not in self.nodes:
+            raise ValueError(f"Unknown node '{node}'.")
+        unknown = set(dofs) - set(NODE_DOFS)
+        if unknown:
+            raise ValueError(f"Unknown degrees of freedom: {', '.join(sorted(unknown))}.")
+        self.supports[node] = tuple(d for d in NODE_DOFS if d in dofs or d in self.supports.get(node, ()))
+        self._system = None
+
+    def invalidate(self):
+        # after editing sections of a member beam in place
+        self._system = None
+
+    @classmethod
+    def from_dict(cls, data, base_dir="."):
+        """
+        Build an assembly from {"nodes": {name: [x, y, z]}, "members": [{"name",
+        "beam" (file or inline beam), "start", "end", "up"}], "supports":
+        {node: "all" or [dofs]}}.
+        """
+        assembly = cls()
+        beams = {}
+        for name, position in data["nodes"].items():
+            assembly.add_node(name, *position)
+        for i, member in enumerate(data["members"]):
+            beam = member["beam"]
+            if isinstance(beam, str):
+                path = beam if os.path.isabs(beam) else os.path.join(base_dir, beam)
+                # members built from the same file share one Beam
+                if path not in beams:
+                    beams[path] = Beam.from_json(path)
+                beam = beams[path]
+            else:
+                beam = Beam.from_dict(beam)
+            assembly.add_member(member.get("name", f"member{i}"), beam, member["start"], member["end"],
+                                member.get("up", (0.0, 0.0, 1.0)))
+        for node, dofs in data.get("supports", {}).items():
+            assembly.fix(node, NODE_DOFS if dofs == "all" else dofs)
+        return assembly
+
+    @classmethod
+    def from_json(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f), os.path.dirname(os.path.abspath(path)))
+
+    def _layout(self):
+        # member and section arrays; sections of a member are contiguous, section 0 first
+        names = list(self.nodes)
+        index = {name: i for i, name in enumerate(names)}
+        positions = [self.nodes[name] for name in names]
+        members = {key: [] for key in ("start", "end", "length", "rotation")}
+        columns = {key: [] for key in ("x0", "L", "EA", "EI", "EI_lateral", "GJ", "c", "I", "c_lateral",
+                                        "I_lateral", "A", "r", "J", "strength", "member")}
+        for m, member in enumerate(self.members):
+            rotation, length = _rotation(self.nodes[member.start], self.nodes[member.end], member.up)
+            for key, value in (("start", index[member.start]), ("end", index[member.end]),
+                               ("length", length), ("rotation", rotation)):
+                members[key].append(value)
+            along = 0.0
+            for s in member.beam.sections:
+                p = section_properties(s)
+                for key, value in (("x0", along), ("L", s.length), ("EA", p.EA), ("EI", p.EI),
+                                   ("EI_lateral", p.EI_lateral), ("GJ", p.GJ), ("c", p.c), ("I", p.I_composite),
+                                   ("c_lateral", p.c_lateral), ("I_lateral", p.I_lateral), ("A", p.A_composite),
+                                   ("r", p.r), ("J", p.J), ("strength", s.tensile_strength), ("member", m)):
+                    columns[key].append(value)
+                along += s.length
+        members = {key: np.asarray(values) for key, values in members.items()}
+        elements = {key: np.asarray(values) for key, values in columns.items()}
+        members["first"] = np.flatnonzero(np.diff(elements["member"], prepend=-1))
+        return names, np.asarray(positions), members, elements
+
+    def _member_chunk(self, members, elements, start, stop):
+        # members start..stop and their sections
+        first = members["first"]
+        part = slice(first[start], first[stop] if stop < len(first) else len(elements["L"]))
+        length = members["length"][start:stop]
+        to_end = length[elements["member"][part] - start] - elements["x0"][part] - elements["L"][part]
+        flexibility = _section_flexibility(elements["L"][part], elements["EA"][part], elements["EI"][part],
+                                           elements["EI_lateral"][part], elements["GJ"][part])
+        # flexibility of the member end with the start clamped: every section's
+        # tip flexibility carried rigidly to the end, a sum of positive terms
+        # that stays accurate however finely the member is sectioned
+        carry = _offset(to_end)
+        terms = carry @ flexibility @ carry.transpose(0, 2, 1)
+        k_end = np.linalg.inv(np.add.reduceat(terms, first[start:stop] - first[start], axis=0))
+        k_end = (k_end + k_end.transpose(0, 2, 1)) / 2
+        # end forces from the end's displacement relative to the start's rigid motion
+        relative = np.concatenate([-_offset(length), np.broadcast_to(np.eye(6), (stop - start, 6, 6))], axis=2)
+        transform = np.zeros((stop - start, 12, 12))
+        for block in range(4):
+            transform[:, 3 * block:3 * block + 3, 3 * block:3 * block + 3] = members["rotation"][start:stop]
+        end_forces = k_end @ relative @ transform
+        k_global = (relative @ transform).transpose(0, 2, 1) @ end_forces
+        # local end forces of every section, by statics from the member end forces,
+        # kept for every solve
+        recover = np.concatenate([-_offset(to_end + elements["L"][part]).transpose(0, 2, 1),
+                                  carry.transpose(0, 2, 1)], axis=1)
+        k_forces = recover @ end_forces[elements["member"][part] - start]
+        return k_forces, k_global
+
+    def _element_matrices(self, members, elements):
+        n = len(members["length"])
+        bounds = [(start, min(start + self.chunk_size, n)) for start in range(0, n, self.chunk_size)]
+        if len(bounds) > 1 and self.workers != 1:
+            with ThreadPoolExecutor(self.workers) as pool:
+                chunks = list(pool.map(lambda b: self._member_chunk(members, elements, *b), bounds))
+        else:
+            chunks = [self._member_chunk(members, elements, *b) for b in bounds]
+        return tuple(np.concatenate([c[i] for c in chunks]) for i in range(2))
+
+    @instrumented("assembly.factorize")
+    def factorize(self):
+        """
+        Build and factorize the global system; `solve` does this on first use.
+
+        Raises ValueError when the supports leave a part of the frame free
+        to move as a rigid body (see `SUPPORT_TOLERANCE`), which the
+        factorization alone only catches when it is exactly singular.
+        """
+        from scipy import sparse
+        from scipy.sparse.linalg import splu
+
+        if not self.members:
+            raise ValueError("Assembly has no members.")
+        with phase("assembly.layout"):
+            names, positions, members, elements = self._layout()
+        with phase("assembly.elements"):
+            k_forces, k_global = self._element_matrices(members, elements)
+        with phase("assembly.global"):
+            member_dofs = np.concatenate([members["start"][:, np.newaxis] * 6 + np.arange(6),
+                                          members["end"][:, np.newaxis] * 6 + np.arange(6)], axis=1)
+            # the dofs of every section are its member's end dofs
+            dofs = member_dofs[elements["member"]]
+            size = len(positions) * 6
+            rows = np.broadcast_to(member_dofs[:, :, np.newaxis], k_global.shape).ravel()
+            cols = np.broadcast_to(member_dofs[:, np.newaxis, :], k_global.shape).ravel()
+            stiffness = sparse.coo_matrix((k_global.ravel(), (rows, cols)), shape=(size, size)).tocsc()
+            fixed = np.zeros(size, dtype=bool)
+            for node, held in self.supports.items():
+                fixed[names.index(node) * 6 + np.array([NODE_DOFS.index(d) for d in held], dtype=int)] = True
+            free = np.flatnonzero(~fixed)
+            if _free_rigid_motion(positions, members["start"], members["end"], fixed):
+                raise ValueError(_MECHANISM)
+        with phase("assembly.factorize"):
+            # symmetric diagonal scaling gives every dof a unit diagonal, so the
+            # pivots are comparable across force/moment units and stiff/soft terms
+            reduced = stiffness[free][:, free]
+            diagonal = reduced.diagonal()
+            if not np.all(diagonal > 0):
+                raise ValueError(_MECHANISM)
+            scale = 1 / np.sqrt(diagonal)
+            try:
+                # a supported frame is symmetric positive definite: diagonal
+                # pivots and a symmetric fill-reducing ordering are enough
+                lu = splu((sparse.diags(scale) @ reduced @ sparse.diags(scale)).tocsc(), permc_spec="MMD_AT_PLUS_A",
+                          diag_pivot_thresh=0.0, options={"SymmetricMode": True})
+            except RuntimeError:
+                raise ValueError(_MECHANISM) from None
+            if not np.all(lu.U.diagonal() > 0):
+                # not positive definite in floating point
+                raise ValueError(_MECHANISM)
+        record_allocation("assembly.elements", k_forces.nbytes + k_global.nbytes)
+        record_allocation("assembly.factor", lu.L.data.nbytes + lu.U.data.nbytes)
+        self._system = {"names": names, "positions": positions, "elements": elements, "k_forces": k_forces,
+                        "dofs": dofs, "stiffness": stiffness, "free": free,
+                        "fixed": np.flatnonzero(fixed), "lu": lu, "scale": scale}
+        return self._system
+
+    def _load_vectors(self, cases, names, size):
+        loads = np.zeros((size, len(cases)))
+        for c, case in enumerate(cases):
+            for node, values in case.items():
+                if node not in self.nodes:
+                    raise ValueError(f"Load on unknown node '{node}'.")
+                if isinstance(values, dict):
+                    unknown = set(values) - set(NODE_LOADS)
+                    if unknown:
+                        raise ValueError(f"Unknown load components: {', '.join(sorted(unknown))}.")
+                    values = [values.get(key, 0.0) for key in NODE_LOADS]
+                loads[names.index(node) * 6:names.index(node) * 6 + 6, c] += np.asarray(values, dtype=float)
+        return loads
+
+    @instrumented("assembly.solve")
+    def solve(self, cases):
+        """
+        Solve the assembly for one or more sets of node loads.
+
+        Parameters:
+        - cases: {node: {"Fx", "Fy", "Fz", "Mx", "My", "Mz"}} (global axes,
+          N and N*m, missing components 0; a 6-sequence also works), or a
+          list of those, one per load case
+
+        Returns:
+        - dict with "displacements" {node: (cases, 6) array of ux, uy, uz,
+          rx, ry, rz}, "reactions" {supported node: (cases, 6)}, "members"
+          {name: {"section_stress": (sections, cases), "max_stress",
+          "max_stress_section", "failed"}} and per case the member with
+          the highest utilization ("max_stress_member"), its "max_stress"
+          and whether the assembly "failed"
+        """
+        if isinstance(cases, dict):
+            cases = [cases]
+        system = self._system or self.factorize()
+        names, elements, dofs = system["names"], system["elements"], system["dofs"]
+        size = len(system["positions"]) * 6
+        loads = self._load_vectors(cases, names, size)
+
+        displacement = np.zeros_like(loads)
+        scale = system["scale"][:, np.newaxis]
+        displacement[system["free"]] = scale * system["lu"].solve(np.ascontiguousarray(scale * loads[system["free"]]))
+        reaction = system["stiffness"] @ displacement - loads
+
+        # local end forces of every element: (elements, 12, cases)
+        local = system["k_forces"] @ displacement[dofs]
+        ends = []
+        for sign, offset in ((-1, 0), (1, 6)):
+            N, Vy, Vz, T, My, Mz = (sign * local[:, offset + i] for i in range(6))
+            stress, _ = biaxial_required_stress(My * elements["c"][:, np.newaxis] / elements["I"][:, np.newaxis],
+                                                Mz * elements["c_lateral"][:, np.newaxis] / elements["I_lateral"][:, np.newaxis],
+                                                1.5 * Vz / elements["A"][:, np.newaxis],
+                                                1.5 * Vy / elements["A"][:, np.newaxis],
+                                                T * elements["r"][:, np.newaxis] / elements["J"][:, np.newaxis],
+                                                N / elements["A"][:, np.newaxis])
+            ends.append(stress)
+        element_stress = np.maximum(*ends)
+        utilization = element_stress / elements["strength"][:, np.newaxis]
+
+        # elements of a member are contiguous, section 0 first
+        offsets = np.flatnonzero(np.diff(elements["member"], prepend=-1))
+        member_stress = np.maximum.reduceat(element_stress, offsets, axis=0)
+        member_utilization = np.maximum.reduceat(utilization, offsets, axis=0)
+        governing = np.argmax(member_utilization, axis=0)
+        everything = np.arange(len(cases))
+        members = {}
+        for m, member in enumerate(self.members):
+            section_stress = element_stress[offsets[m]:offsets[m] + len(member.beam.sections)]
+            members[member.name] = {
+                "section_stress": section_stress,
+                "max_stress": member_stress[m],
+                "max_stress_section": np.argmax(section_stress, axis=0),
+                "failed": member_utilization[m] > 1,
+            }
+
+        index = {node: i for i, node in enumerate(names)}
+        return {
+            "displacements": {node: displacement[index[node] * 6:index[node] * 6 + 6].T for node in names},
+            "reactions": {node: reaction[index[node] * 6:index[node] * 6 + 6].T for node in self.supports},
+            "members": members,
+            "max_stress": member_stress[governing, everything],
+            "max_stress_member": [self.members[m].name for m in governing],
+            "failed": member_utilization[governing, everything] > 1,
+        }
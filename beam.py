@@ -1,16 +1,64 @@
+import json
+
+from instrumentation import instrumented, phase
+from loading import SECTION_TORSION_METHODS, analysis, biaxial_required_stress, section_properties, section_response
+from materials import registry
+from section import Section
+
+# NumPy (and the modules built on it) is only imported by the batch and
+# profile methods, so scalar analysis starts without it
+
+# version of the analysis kernels; bump it whenever a change alters the
+# results for an unchanged beam and load, so cached results are not reused
+# 2: rotations carried over the whole beam, stress checked at both section ends
+# 3: allowable stress lowered by the infill core's strength ratio
+ANALYSIS_VERSION = 3
+
+SECTION_FIELDS = ("material", "infill_pattern", "infill_density", "wall_count", "line_width", "torsion_method")
+
+LOAD_COLUMNS = ("M", "F", "T", "TF")
+# biaxial loads; the single-plane M and F are the height-plane Mz and Fy
+BIAXIAL_LOAD_COLUMNS = ("My", "Mz", "Fy", "Fz", "T", "TF")
+_BIAXIAL_ALIASES = {"M": "Mz", "F": "Fy"}
+
+
 class Beam:
-    def __init__(self, material=None, infill_pattern=None, infill_density=None, wall_count=None, line_width=None):
+    def __init__(self, material=None, infill_pattern=None, infill_density=None, wall_count=None, line_width=None,
+                 torsion_method=None):
         self.default_material = material
         self.default_infill_pattern = infill_pattern
         self.default_infill_density = infill_density
         self.default_wall_count = wall_count
         self.default_line_width = line_width
+        self.default_torsion_method = torsion_method
         self.sections = []
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a beam from the `beams/<name>.json` layout (defaults + sections)."""
+        defaults = data.get("defaults", {}) if isinstance(data, dict) else {}
+        beam_kwargs = {k: defaults[k] for k in SECTION_FIELDS if k in defaults and defaults[k] is not None}
+        beam = cls(**beam_kwargs)
+
+        for s in data.get("sections", []):
+            length = s.get("length")
+            width = s.get("width")
+            height = s.get("height")
+            if length is None or width is None or height is None:
+                continue
+            section_kwargs = {k: s[k] for k in SECTION_FIELDS if k in s and s[k] is not None}
+            beam.add_section(length=length, width=width, height=height, **section_kwargs)
+        return beam
+
+    @classmethod
+    def from_json(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
     
-    def add_section(self, length, width, height, material=None, infill_pattern=None, infill_density=None, wall_count=None, line_width=None):
+    @instrumented("beam.add_section")
+    def add_section(self, length, width, height, material=None, infill_pattern=None, infill_density=None, wall_count=None, line_width=None,
+                    torsion_method=None):
         # the first section added is the clamped end
-        from section import Section
-
         # Use parameters if provided, otherwise fall back to beam defaults
         section = Section(
         length=length,
@@ -21,6 +69,7 @@ class Beam:
         infill_density=infill_density if infill_density is not None else self.default_infill_density,
         wall_count=wall_count if wall_count is not None else self.default_wall_count,
         line_width=line_width if line_width is not None else self.default_line_width,
+        torsion_method=torsion_method if torsion_method is not None else self.default_torsion_method,
         )
         self.sections.append(section)
 
@@ -31,45 +80,355 @@ class Beam:
         self.T = T
         self.TF = TF
 
+    @instrumented("beam.analysis")
     def analysis(self):
         # first find the displacement of section by moving from free end to clamped end
-        from loading import analysis
         M = self.M
         F = self.F
         T = self.T
         TF = self.TF
-        analysis(M, F, T, TF, self.sections[-1])
-        cumulative_length = [self.sections[-1].length]
-        if len(self.sections) > 1:
-            for i in range(len(self.sections) - 2, -1, -1):
-                M = M + F * self.sections[i + 1].length
-                analysis(M, F, T, TF, self.sections[i])
+        with phase("beam.analysis.sections"):
+            analysis(M, F, T, TF, self.sections[-1])
+            cumulative_length = [self.sections[-1].length]
+            if len(self.sections) > 1:
+                for i in range(len(self.sections) - 2, -1, -1):
+                    M = M + F * self.sections[i + 1].length
+                    analysis(M, F, T, TF, self.sections[i])
 
-                #generate a reversed length to end array for later displacement calculation
-                cumulative_length.append(cumulative_length[-1] + self.sections[i].length)
-        else:
-            pass
+                    #generate a reversed length to end array for later displacement calculation
+                    cumulative_length.append(cumulative_length[-1] + self.sections[i].length)
+            else:
+                pass
 
-        cumulative_length.reverse()
+            cumulative_length.reverse()
 
         # then find displacements by moving from clamped end to free end
-        self.beam_displacement = 0
-        self.beam_rotation = 0
-        self.beam_twist = 0
-        for i in range(len(self.sections)-1):
-            self.beam_displacement += self.sections[i].displacement
-            self.beam_displacement += self.sections[i].rotation * (cumulative_length[i+1] if i > 0 else 0)
-            self.beam_rotation += self.sections[i].rotation
-            self.beam_twist += self.sections[i].twist
-        self.beam_displacement += self.sections[-1].displacement
-        self.beam_rotation += self.sections[-1].rotation
-        self.beam_twist += self.sections[-1].twist
-
-        # compare and find the maximum stress in the beam
-        self.max_stress = 0
-        self.max_stress_section = -1
-        for i in range(len(self.sections)):
-            if self.sections[i].required_yield_stress > self.max_stress:
-                self.max_stress = self.sections[i].required_yield_stress
-                self.max_stress_section = i
-        return self.beam_displacement, self.beam_rotation, self.beam_twist
\ No newline at end of file
+        with phase("beam.analysis.accumulate"):
+            self.beam_displacement = 0
+            self.beam_rotation = 0
+            self.beam_twist = 0
+            for i in range(len(self.sections)-1):
+                self.beam_displacement += self.sections[i].displacement
+                self.beam_displacement += self.sections[i].rotation * cumulative_length[i+1]
+                self.beam_rotation += self.sections[i].rotation
+                self.beam_twist += self.sections[i].twist
+            self.beam_displacement += self.sections[-1].displacement
+            self.beam_rotation += self.sections[-1].rotation
+            self.beam_twist += self.sections[-1].twist
+
+            # compare and find the maximum stress in the beam
+            self.max_stress = 0
+            self.max_stress_section = -1
+            for i in range(len(self.sections)):
+                if self.sections[i].required_yield_stress > self.max_stress:
+                    self.max_stress = self.sections[i].required_yield_stress
+                    self.max_stress_section = i
+        return self.beam_displacement, self.beam_rotation, self.beam_twist
+
+    def profile(self, M=None, F=None, T=None, TF=None):
+        """Lazy `BeamProfile` along the beam, for the input loads unless given."""
+        from beam_profile import BeamProfile
+        return BeamProfile(self, M, F, T, TF)
+
+    def incremental(self):
+        """Return an `IncrementalAnalysis` of this beam for edit-and-rerun loops."""
+        from incremental import IncrementalAnalysis
+        return IncrementalAnalysis(self)
+
+    def envelope(self, cases, **options):
+        """Governing load case and section of stress, displacement and twist, see `envelope.run_envelope`."""
+        from envelope import run_envelope
+        return run_envelope(self, cases, **options)
+
+    def analyze_batch(self, loads):
+        """
+        Evaluate many load cases against this beam at once.
+
+        Parameters:
+        - loads: mapping with "M", "F", "T" and "TF" arrays (missing keys
+          count as zero), or an (N, 4) array with columns M, F, T, TF
+
+        Returns:
+        - dict of arrays of length N: "displacement", "rotation", "twist",
+          "max_stress" and "max_stress_section" (-1 where no section is loaded)
+
+        Unlike `analysis`, the sections are left untouched.
+        """
+        M, F, T, TF = _load_columns(loads, LOAD_COLUMNS)
+        return analyze_sections(self.sections, M, F, T, TF)
+
+    def analyze_biaxial(self, loads):
+        """
+        Evaluate load cases with bending in both transverse planes.
+
+        Parameters:
+        - loads: mapping with any of "My", "Mz", "Fy", "Fz", "T", "TF"
+          ("M" and "F" are accepted for Mz and Fy), or an (N, 6) array in
+          that column order
+
+        Returns:
+        - see `analyze_sections_biaxial`
+        """
+        if isinstance(loads, dict):
+            renamed = {}
+            for key, value in loads.items():
+                key = _BIAXIAL_ALIASES.get(key, key)
+                if key in renamed:
+                    raise ValueError(f"Load '{key}' given twice.")
+                renamed[key] = value
+            loads = renamed
+        return analyze_sections_biaxial(self.sections, *_load_columns(loads, BIAXIAL_LOAD_COLUMNS))
+
+
+def _load_columns(loads, keys):
+    # a mapping of arrays (missing keys are zero) or an (N, len(keys)) array
+    import numpy as np
+
+    if isinstance(loads, dict):
+        n_cases = max((np.size(v) for v in loads.values()), default=0)
+        return [np.broadcast_to(np.asarray(loads.get(k, 0.0), dtype=float), (n_cases,)) for k in keys]
+    loads = np.atleast_2d(np.asarray(loads, dtype=float))
+    if loads.shape[1] != len(keys):
+        raise ValueError(f"Load array must have {len(keys)} columns: {', '.join(keys)}.")
+    return list(loads.T)
+
+
+def validate_beam_data(data):
+    """
+    Check a beam definition in the beams/<name>.json layout.
+
+    Returns:
+    - list of problem descriptions, empty when the beam can be analyzed
+    """
+    if not isinstance(data, dict):
+        return ["beam definition must be a JSON object"]
+    problems = []
+    defaults = data.get("defaults", {})
+    if not isinstance(defaults, dict):
+        problems.append("'defaults' must be an object")
+        defaults = {}
+    sections = data.get("sections")
+    if not isinstance(sections, list) or not sections:
+        return problems + ["beam has no sections"]
+
+    for i, s in enumerate(sections):
+        if not isinstance(s, dict):
+            problems.append(f"section {i}: must be an object")
+            continue
+        values = {k: s.get(k, defaults.get(k)) for k in SECTION_FIELDS}
+        for key in ("length", "width", "height"):
+            value = s.get(key)
+            if not isinstance(value, (int, float)) or value <= 0:
+                problems.append(f"section {i}: {key} must be a positive number")
+        if values["material"] is None:
+            problems.append(f"section {i}: no material")
+        elif values["material"] not in registry:
+            problems.append(f"section {i}: material '{values['material']}' not found in database")
+        density = values["infill_density"]
+        if not isinstance(density, (int, float)) or not 0 <= density <= 100:
+            problems.append(f"section {i}: infill_density must be between 0 and 100")
+        for key in ("wall_count", "line_width"):
+            if not isinstance(values[key], (int, float)) or values[key] <= 0:
+                problems.append(f"section {i}: {key} must be a positive number")
+        if values["torsion_method"] is not None and values["torsion_method"] not in SECTION_TORSION_METHODS:
+            problems.append(f"section {i}: torsion_method must be one of {', '.join(SECTION_TORSION_METHODS)}")
+    return problems
+
+
+@instrumented("beam.analyze_sections")
+def analyze_sections(sections, M, F, T, TF):
+    """
+    Vectorized counterpart of `Beam.analysis` over arrays of load cases.
+
+    The section loop is kept, every load-dependent term is an array
+    operation over the cases. Section attributes may themselves be arrays
+    broadcastable against the loads.
+
+    Besides the tip values, the result holds per-section arrays (first
+    axis = section) of required stress and of each section's share of the
+    tip displacement, rotation and twist.
+    """
+    import numpy as np
+
+    n = len(sections)
+    if n == 0:
+        raise ValueError("Beam has no sections.")
+
+    # walk from the free end to the clamped end accumulating the moment
+    responses = [None] * n
+    responses[-1] = section_response(M, F, T, TF, sections[-1])
+    cumulative_length = [sections[-1].length]
+    for i in range(n - 2, -1, -1):
+        M = M + F * sections[i + 1].length
+        responses[i] = section_response(M, F, T, TF, sections[i])
+        cumulative_length.append(cumulative_length[-1] + sections[i].length)
+    cumulative_length.reverse()
+
+    # then accumulate from the clamped end to the free end, keeping the share
+    # of every section in the tip values
+    contributions = []
+    for i in range(n):
+        delta, theta, phi, _ = responses[i]
+        lever = cumulative_length[i + 1] if i < n - 1 else 0
+        contributions.append((delta + theta * lever, theta, phi))
+    section_displacement, section_rotation, section_twist = (
+        np.stack(np.broadcast_arrays(*(c[k] for c in contributions))) for k in range(3))
+    displacement = section_displacement.sum(axis=0)
+    rotation = section_rotation.sum(axis=0)
+    twist = section_twist.sum(axis=0)
+
+    section_stress = np.stack(np.broadcast_arrays(*(r[3] for r in responses)))
+    max_stress_section = np.argmax(section_stress, axis=0)
+    max_stress = np.take_along_axis(section_stress, max_stress_section[np.newaxis], axis=0)[0]
+    # match `Beam.analysis`, which only reports sections with positive stress
+    max_stress_section = np.where(max_stress > 0, max_stress_section, -1)
+    max_stress = np.maximum(max_stress, 0.0)
+
+    return {
+        "displacement": displacement,
+        "rotation": rotation,
+        "twist": twist,
+        "max_stress": max_stress,
+        "max_stress_section": max_stress_section,
+        "section_stress": section_stress,
+        "section_displacement": section_displacement,
+        "section_rotation": section_rotation,
+        "section_twist": section_twist,
+    }
+
+
+@instrumented("beam.analyze_sections_biaxial")
+def analyze_sections_biaxial(sections, My, Mz, Fy, Fz, T, TF):
+    """
+    Biaxial counterpart of `analyze_sections` over arrays of load cases.
+
+    Mz and Fy bend the beam in the height plane (they are the M and F of
+    the single-plane analysis), My and Fz in the width plane, using the
+    lateral stiffness of each section. Stresses are checked at the corners
+    and face midpoints of every section (see `loading.STRESS_POINTS`) in
+    one vectorized pass over points, sections and cases.
+
+    Returns:
+    - dict with "displacement", "rotation" (height plane),
+      "lateral_displacement", "lateral_rotation" (width plane), "twist",
+      "max_stress", "max_stress_section", "max_stress_point", and
+      per-section "section_stress" and "section_point" (first axis = section)
+    """
+    import numpy as np
+
+    n = len(sections)
+    if n == 0:
+        raise ValueError("Beam has no sections.")
+    props = [section_properties(s) for s in sections]
+    lengths = [s.length for s in sections]
+    # distance from the free-side end of every section to the free end
+    outboard = [0.0] * n
+    for i in range(n - 2, -1, -1):
+        outboard[i] = outboard[i + 1] + lengths[i + 1]
+
+    result = {}
+    root_moments = {}
+    for prefix, M, F, stiffness in (("", Mz, Fy, "EI"), ("lateral_", My, Fz, "EI_lateral")):
+        displacement = rotation = 0.0
+        moments = []
+        for i in range(n):
+            EI = getattr(props[i], stiffness)
+            L = lengths[i]
+            M_end = M + F * outboard[i]
+            theta = M_end * L / EI + F * L**2 / (2 * EI)
+            delta = M_end * L**2 / (2 * EI) + F * L**3 / (3 * EI)
+            # every section's end rotation tilts the rest of the beam
+            displacement = displacement + delta + theta * outboard[i]
+            rotation = rotation + theta
+            # the moment is linear along the section, check the end that bends more
+            M_root = M_end + F * L
+            moments.append(np.where(np.abs(M_root) >= np.abs(M_end), M_root, M_end))
+        result[prefix + "displacement"] = np.asarray(displacement)
+        result[prefix + "rotation"] = np.asarray(rotation)
+        root_moments[prefix] = moments
+    result["twist"] = np.asarray(sum(T * L / p.GJ for L, p in zip(lengths, props)))
+
+    def stack(values):
+        return np.stack(np.broadcast_arrays(*values))
+
+    section_stress, section_point = biaxial_required_stress(
+        stack([m * p.c / p.I_composite for m, p in zip(root_moments[""], props)]),
+        stack([m * p.c_lateral / p.I_lateral for m, p in zip(root_moments["lateral_"], props)]),
+        stack([1.5 * Fy / p.A_composite for p in props]),
+        stack([1.5 * Fz / p.A_composite for p in props]),
+        stack([T * p.r / p.J for p in props]),
+        stack([TF / p.A_composite for p in props]))
+
+    max_stress_section = np.argmax(section_stress, axis=0)
+    max_stress = np.take_along_axis(section_stress, max_stress_section[np.newaxis], axis=0)[0]
+    max_stress_point = np.take_along_axis(section_point, max_stress_section[np.newaxis], axis=0)[0]
+    loaded = max_stress > 0
+    result.update({
+        "max_stress": np.maximum(max_stress, 0.0),
+        "max_stress_section": np.where(loaded, max_stress_section, -1),
+        "max_stress_point": np.where(loaded, max_stress_point, -1),
+        "section_stress": section_stress,
+        "section_point": section_point,
+    })
+    return result
+
+
+# up to this many load cases run through the scalar `Beam.analysis`, which
+# does not need NumPy; larger sets go through `Beam.analyze_batch`
+SCALAR_CASE_LIMIT = 16
+
+
+def _analyze_scalar(beam, cases):
+    # same layout as `analyze_sections`, as plain lists
+    results = {key: [] for key in ("displacement", "rotation", "twist", "max_stress", "max_stress_section")}
+    results["section_stress"] = [[] for _ in beam.sections]
+    for case in cases:
+        beam.input_load(case["M"], case["F"], case["T"], case["TF"])
+        beam.analysis()
+        results["displacement"].append(beam.beam_displacement)
+        results["rotation"].append(beam.beam_rotation)
+        results["twist"].append(beam.beam_twist)
+        results["max_stress"].append(beam.max_stress)
+        results["max_stress_section"].append(beam.max_stress_section)
+        for j, section in enumerate(beam.sections):
+            results["section_stress"][j].append(section.required_yield_stress)
+    return results
+
+
+def analyze_beam(beam, cases, per_section=False, /, **extra):
+    """
+    Run every load case against a beam.
+
+    Returns:
+    - (case records, section records), each record starting with the
+      `extra` fields; section records are only built with `per_section`
+    """
+    if len(cases) <= SCALAR_CASE_LIMIT:
+        results = _analyze_scalar(beam, cases)
+    else:
+        from loadcases import load_case_arrays
+        results = beam.analyze_batch(load_case_arrays(cases))
+
+    records = []
+    section_records = []
+    for i, case in enumerate(cases):
+        section = int(results["max_stress_section"][i])
+        records.append(dict(extra, **{
+            "case": case["name"],
+            "displacement": float(results["displacement"][i]),
+            "rotation": float(results["rotation"][i]),
+            "twist": float(results["twist"][i]),
+            "max_stress": float(results["max_stress"][i]),
+            "max_stress_section": section,
+            "failed": bool(section >= 0 and results["max_stress"][i] > beam.sections[section].tensile_strength),
+            "error": None,
+        }))
+        if per_section:
+            for j, s in enumerate(beam.sections):
+                section_records.append(dict(extra, **{
+                    "case": case["name"],
+                    "section": j,
+                    "required_yield_stress": float(results["section_stress"][j][i]),
+                    "tensile_strength": s.tensile_strength,
+                }))
+    return records, section_records
@@ -0,0 +1,140 @@
+import numpy as np
+
+from loading import required_stress, section_properties
+
+
+class BeamProfile:
+    """
+    Deflection, internal forces and stress at any station along a beam.
+
+    Stations `x` are measured from the clamped end (x = 0) to the free end.
+    Within each section the moment is linear, so rotation and deflection
+    are closed-form polynomials integrated from the clamped end. Nothing is
+    computed until the first query; after that each query is a vectorized
+    lookup over a station array. The values at the free end match
+    `Beam.analysis`.
+    """
+
+    def __init__(self, beam, M=None, F=None, T=None, TF=None):
+        self.beam = beam
+        self.M = beam.M if M is None else M
+        self.F = beam.F if F is None else F
+        self.T = beam.T if T is None else T
+        self.TF = beam.TF if TF is None else TF
+        self._tables = None
+
+    def _build(self):
+        sections = self.beam.sections
+        n = len(sections)
+        if n == 0:
+            raise ValueError("Beam has no sections.")
+        props = [section_properties(s) for s in sections]
+        length = np.array([s.length for s in sections], dtype=float)
+        start = np.concatenate(([0.0], np.cumsum(length)[:-1]))
+        total = float(start[-1] + length[-1])
+        EI = np.array([p.EI for p in props], dtype=float)
+        GJ = np.array([p.GJ for p in props], dtype=float)
+
+        # moment at the clamped-side end of every section
+        M0 = self.M + self.F * (total - start)
+        F = self.F
+
+        # slope, deflection and twist at the start of every section
+        rotation = M0 * length / EI - F * length**2 / (2 * EI)
+        displacement = M0 * length**2 / (2 * EI) - F * length**3 / (6 * EI)
+        twist = self.T * length / GJ
+        theta0 = np.concatenate(([0.0], np.cumsum(rotation)[:-1]))
+        w0 = np.concatenate(([0.0], np.cumsum(displacement + theta0 * length)[:-1]))
+        phi0 = np.concatenate(([0.0], np.cumsum(twist)[:-1]))
+
+        self._tables = {
+            "start": start, "length": length, "total": total, "EI": EI, "GJ": GJ, "M0": M0,
+            "theta0": theta0, "w0": w0, "phi0": phi0,
+            "c_over_I": np.array([p.c / p.I_composite for p in props], dtype=float),
+            "A": np.array([p.A_composite for p in props], dtype=float),
+            "r_over_J": np.array([p.r / p.J for p in props], dtype=float),
+        }
+
+    @property
+    def length(self):
+        if self._tables is None:
+            self._build()
+        return self._tables["total"]
+
+    def _locate(self, x):
+        # section index and local coordinate of every station
+        if self._tables is None:
+            self._build()
+        t = self._tables
+        x = np.asarray(x, dtype=float)
+        if np.any((x < 0) | (x > t["total"])):
+            raise ValueError("Stations must lie between 0 and the beam length.")
+        index = np.clip(np.searchsorted(t["start"], x, side="right") - 1, 0, len(t["start"]) - 1)
+        return index, x - t["start"][index]
+
+    def stations(self, count):
+        return np.linspace(0.0, self.length, count)
+
+    def moment(self, x):
+        x = np.asarray(x, dtype=float)
+        return self.M + self.F * (self.length - x)
+
+    def shear(self, x):
+        return np.full(np.shape(x), float(self.F))
+
+    def torque(self, x):
+        return np.full(np.shape(x), float(self.T))
+
+    def axial_force(self, x):
+        return np.full(np.shape(x), float(self.TF))
+
+    def rotation(self, x):
+        i, xi = self._locate(x)
+        t = self._tables
+        return t["theta0"][i] + (t["M0"][i] * xi - self.F * xi**2 / 2) / t["EI"][i]
+
+    def deflection(self, x):
+        i, xi = self._locate(x)
+        t = self._tables
+        return t["w0"][i] + t["theta0"][i] * xi + (t["M0"][i] * xi**2 / 2 - self.F * xi**3 / 6) / t["EI"][i]
+
+    def twist(self, x):
+        i, xi = self._locate(x)
+        t = self._tables
+        return t["phi0"][i] + self.T * xi / t["GJ"][i]
+
+    def bending_stress(self, x):
+        # at the top fiber, the bottom fiber carries the opposite sign
+        i, xi = self._locate(x)
+        return self.moment(x) * self._tables["c_over_I"][i]
+
+    def required_stress(self, x):
+        """Minimum yield stress needed at each station (same criteria as `loading.analysis`)."""
+        i, xi = self._locate(x)
+        t = self._tables
+        return required_stress(self.moment(x) * t["c_over_I"][i],
+                               0.0,
+                               (3 / 2) * self.F / t["A"][i],
+                               self.T * t["r_over_J"][i],
+                               self.TF / t["A"][i])
+
+    def sample(self, count=1000):
+        """All quantities at `count` evenly spaced stations, as a dict of arrays."""
+        x = self.stations(count)
+        return {
+            "x": x,
+            "deflection": self.deflection(x),
+            "rotation": self.rotation(x),
+            "twist": self.twist(x),
+            "moment": self.moment(x),
+            "shear": self.shear(x),
+            "bending_stress": self.bending_stress(x),
+            "required_stress": self.required_stress(x),
+        }
+
+    def hot_spot(self, count=10000):
+        """(station, required stress) of the highest required stress among `count` stations."""
+        x = self.stations(count)
+        stress = self.required_stress(x)
+        i = int(np.argmax(stress))
+        return float(x[i]), float(stress[i])
@@ -0,0 +1,213 @@
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import loading
+import torsion
+from beam import Beam
+from section import Section
+
+# reference section used by the kernel benchmarks
+B, H, T, N = 0.02, 0.01, 0.0012, 0.2
+
+# largest relative error against the reference values that is accepted;
+# the grid integration and the Saint-Venant series are approximations,
+# everything else must match to rounding
+TOLERANCES = {"torsion.grid": 5e-2, "torsion.series": 5e-2, "torsion.numeric": 1e-5}
+DEFAULT_TOLERANCE = 1e-9
+
+
+def measure(func, min_time=0.2, repeat=3):
+    """
+    Time `func()` and return (seconds per call, calls per second, peak bytes).
+
+    The call count is grown until one run takes `min_time`, then the best
+    of `repeat` runs is kept. Peak memory is traced over a single call.
+    """
+    func()
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1 << 24:
+            break
+        number *= 2 if elapsed <= 0 else max(2, min(10, int(min_time / elapsed) + 1))
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, 1 / best if best > 0 else float("inf"), peak
+
+
+def uniform_beam(n_sections, total_length=0.1):
+    beam = Beam(material="PLA", infill_density=N * 100, wall_count=3, line_width=0.0004)
+    for _ in range(n_sections):
+        beam.add_section(total_length / n_sections, B, H)
+    return beam
+
+
+def bench_torsion(quick):
+    results = []
+    reference = torsion.analytic_torsion_constant(B, H, T, N)
+    for size in ([100, 250, 500] if quick else [100, 250, 500, 1000, 2000]):
+        J = torsion.grid_torsion_constant(B, H, T, N, size, size)
+        results.append(("torsion.grid", size, *measure(lambda: torsion.grid_torsion_constant(B, H, T, N, size, size)),
+                        abs(J - reference) / reference))
+
+    def uncached(method):
+        torsion.clear_cache()
+        return torsion.torsion_constant(B, H, T, N, method=method)
+
+    # the series estimates the Saint-Venant constant, not the polar moment
+    try:
+        saint_venant = torsion.torsion_constant(B, H, T, N, method="mesh")
+    except ImportError:
+        saint_venant = None
+    for method, expected in (("analytic", reference), ("series", saint_venant), ("numeric", reference)):
+        J = uncached(method)
+        error = None if expected is None else abs(J - expected) / expected
+        results.append((f"torsion.{method}", 1, *measure(lambda: uncached(method)), error))
+    results.append(("torsion.cached", 1, *measure(lambda: torsion.torsion_constant(B, H, T, N)), 0.0))
+    return results
+
+
+def bench_kernels(quick):
+    section = Section(0.05, B, H, "PLA", None, N * 100, 3, 0.0004)
+    results = []
+    for name, func in (("moment_load", loading.moment_load), ("force_load", loading.force_load),
+                       ("torsion_load", loading.torsion_load), ("tensile_load", loading.tensile_load)):
+        results.append((f"loading.{name}", 1, *measure(lambda: func(section, 1.0)), None))
+        for size in ([10**4] if quick else [10**4, 10**6]):
+            loads = np.linspace(-1, 1, size)
+            results.append((f"loading.{name}", size, *measure(lambda: func(section, loads)), None))
+
+    for name, func in (("tresca", loading.required_yield_stress_tresca),
+                       ("von_mises", loading.required_yield_stress_von_mises)):
+        results.append((f"yield.{name}", 1, *measure(lambda: func(3e6, 1e6)), None))
+        for size in ([10**4] if quick else [10**4, 10**6]):
+            sigma = np.linspace(-1e7, 1e7, size)
+            results.append((f"yield.{name}", size, *measure(lambda: func(sigma, 0.3 * sigma)), None))
+    return results
+
+
+def bench_beam(quick):
+    results = []
+    M, F, Tq, TF = 0.5, 2.0, 0.1, 10.0
+    reference = uniform_beam(1)
+    reference.input_load(M, F, Tq, TF)
+    ref = reference.analysis()
+    for n in ([1, 10, 100, 1000] if quick else [1, 10, 100, 1000, 10000]):
+        beam = uniform_beam(n)
+        beam.input_load(M, F, Tq, TF)
+        result = beam.analysis()
+        # a uniform beam split into sections must match the single-section beam
+        error = max(abs(r - e) / abs(e) for r, e in zip(result, ref))
+        results.append(("beam.analysis", n, *measure(beam.analysis, min_time=0.1), error))
+
+    beam = uniform_beam(3)
+    for size in ([1, 100, 10**4] if quick else [1, 100, 10**4, 10**6]):
+        loads = np.tile([M, F, Tq, TF], (size, 1))
+        batch = beam.analyze_batch(loads)
+        error = max(abs(batch[key][0] - e) / abs(e) for key, e in zip(("displacement", "rotation", "twist"), ref))
+        results.append(("beam.analyze_batch", size, *measure(lambda: beam.analyze_batch(loads), min_time=0.1), error))
+    return results
+
+
+SUITES = {"torsion": bench_torsion, "kernels": bench_kernels, "beam": bench_beam}
+
+
+def run(suites, quick=False):
+    records = []
+    for name in suites:
+        for bench, size, seconds, rate, peak, error in SUITES[name](quick):
+            records.append({"name": bench, "size": size, "seconds": seconds,
+                            "throughput": rate * size, "peak_bytes": peak, "rel_error": error,
+                            "tolerance": TOLERANCES.get(bench, DEFAULT_TOLERANCE)})
+    return records
+
+
+def accuracy_failures(records):
+    # benchmarks whose result is further from the reference than their tolerance
+    return [r for r in records if r["rel_error"] is not None and not r["rel_error"] <= r["tolerance"]]
+
+
+def compare(records, baseline, threshold):
+    # returns the benchmarks that got slower than the baseline by more than `threshold`
+    previous = {(r["name"], r["size"]): r for r in baseline["results"]}
+    regressions = []
+    for record in records:
+        old = previous.get((record["name"], record["size"]))
+        if old is not None:
+            record["speedup"] = old["seconds"] / record["seconds"]
+            if record["speedup"] < 1 / (1 + threshold):
+                regressions.append(record)
+    return regressions
+
+
+def format_table(records):
+    lines = [f"{'benchmark':<24}{'size':>10}{'time/call':>14}{'items/s':>14}{'peak mem':>12}{'rel err':>11}{'speedup':>9}"]
+    for r in records:
+        error = "" if r["rel_error"] is None else f"{r['rel_error']:.2e}"
+        speedup = f"{r['speedup']:.2f}x" if "speedup" in r else ""
+        lines.append(f"{r['name']:<24}{r['size']:>10}{r['seconds']:>14.3e}{r['throughput']:>14.3e}"
+                     f"{r['peak_bytes'] / 1024:>10.1f}kB{error:>11}{speedup:>9}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the loading kernels and beam analysis.")
+    parser.add_argument("suites", nargs="*", help=f"suites to run: {', '.join(SUITES)} (default: all)")
+    parser.add_argument("--quick", action="store_true", help="smaller problem sizes")
+    parser.add_argument("--save", help="write the results to a baseline JSON file (refused when a result is inaccurate)")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="slowdown reported as a regression (default: 0.2)")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.suites if name not in SUITES]
+    if unknown:
+        parser.error(f"unknown suite(s): {', '.join(unknown)}")
+
+    records = run(args.suites or list(SUITES), args.quick)
+    regressions = []
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(records, json.load(f), args.threshold)
+    print(format_table(records))
+
+    failures = accuracy_failures(records)
+    if failures:
+        print(f"\n{len(failures)} result(s) outside their accuracy tolerance:")
+        for r in failures:
+            print(f"  {r['name']} (size {r['size']}): rel err {r['rel_error']:.2e} > {r['tolerance']:.0e}")
+        if args.save:
+            print(f"Not saving {args.save}: fix the results before recording a baseline.")
+        return 1
+    if args.save:
+        baseline = {"python": platform.python_version(), "numpy": np.__version__,
+                    "machine": platform.machine(), "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+                    "quick": args.quick, "results": records}
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+        for r in regressions:
+            print(f"  {r['name']} (size {r['size']}): {1 / r['speedup']:.2f}x slower")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
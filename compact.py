@@ -0,0 +1,205 @@
+import numpy as np
+
+from beam import Beam
+from loading import core_strength_ratio, section_response
+from materials import get_material
+
+# per-section input columns and the arrays they are stored in
+COLUMNS = ("length", "width", "height", "wall_count", "line_width", "infill_density")
+RESULTS = ("displacement", "rotation", "twist", "required_yield_stress")
+
+
+class SectionView:
+    """
+    Section-like view of one row of a CompactBeam.
+
+    Reads and writes go straight to the beam's arrays, so the loading
+    functions and existing callers can use it in place of a `Section`.
+    """
+
+    __slots__ = ("_beam", "_index")
+
+    def __init__(self, beam, index):
+        self._beam = beam
+        self._index = index
+
+    @property
+    def material(self):
+        return self._beam.materials[self._beam.material_index[self._index]].name
+
+    @property
+    def material_properties(self):
+        return self._beam.materials[self._beam.material_index[self._index]]
+
+    @property
+    def infill_pattern(self):
+        return self._beam.infill_patterns[self._index]
+
+    @property
+    def E_shell(self):
+        return self._beam.E_shell[self._index]
+
+    @property
+    def G_shell(self):
+        return self._beam.G_shell[self._index]
+
+    @property
+    def tensile_strength(self):
+        return self._beam.material_strength[self._index] * core_strength_ratio(self)
+
+    @property
+    def wall_thickness(self):
+        return self._beam.wall_count[self._index] * self._beam.line_width[self._index]
+
+
+def _column_property(name):
+    def fget(self):
+        return getattr(self._beam, name)[self._index]
+
+    def fset(self, value):
+        getattr(self._beam, name)[self._index] = value
+
+    return property(fget, fset)
+
+
+for _name in COLUMNS + RESULTS:
+    setattr(SectionView, _name, _column_property(_name))
+
+
+class CompactBeam:
+    """
+    Columnar storage of a beam: one NumPy array per section field.
+
+    Geometry, infill and material stiffness live in float arrays indexed
+    by section (index 0 is the clamped end), results of `analysis` are kept
+    in separate per-section result arrays. `sections` hands out
+    `SectionView` objects for code written against `Section`.
+    """
+
+    def __init__(self, length, width, height, wall_count, line_width, infill_density, materials, infill_patterns=None):
+        self.length = np.asarray(length, dtype=float)
+        n = self.length.size
+        self.width = np.broadcast_to(np.asarray(width, dtype=float), (n,)).copy()
+        self.height = np.broadcast_to(np.asarray(height, dtype=float), (n,)).copy()
+        self.wall_count = np.broadcast_to(np.asarray(wall_count, dtype=float), (n,)).copy()
+        self.line_width = np.broadcast_to(np.asarray(line_width, dtype=float), (n,)).copy()
+        self.infill_density = np.broadcast_to(np.asarray(infill_density, dtype=float), (n,)).copy()
+        self.infill_patterns = list(infill_patterns) if infill_patterns is not None else [None] * n
+
+        if isinstance(materials, str):
+            materials = [materials] * n
+        self.materials = []
+        index = {}
+        self.material_index = np.empty(n, dtype=np.intp)
+        for i, name in enumerate(materials):
+            if name not in index:
+                index[name] = len(self.materials)
+                self.materials.append(get_material(name))
+            self.material_index[i] = index[name]
+        self.refresh_materials()
+
+        for name in RESULTS:
+            setattr(self, name, np.zeros(n))
+
+    @classmethod
+    def from_beam(cls, beam):
+        sections = beam.sections
+        if any(s.torsion_method not in (None, "analytic") for s in sections):
+            # the columns are evaluated with the analytic torsion constant only
+            raise ValueError("CompactBeam only supports the analytic torsion method.")
+        return cls(length=[s.length for s in sections],
+                   width=[s.width for s in sections],
+                   height=[s.height for s in sections],
+                   wall_count=[s.wall_count for s in sections],
+                   line_width=[s.line_width for s in sections],
+                   infill_density=[s.infill_density for s in sections],
+                   materials=[s.material for s in sections],
+                   infill_patterns=[s.infill_pattern for s in sections])
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls.from_beam(Beam.from_dict(data))
+
+    def to_beam(self):
+        beam = Beam()
+        for s in self.sections:
+            beam.add_section(length=float(s.length), width=float(s.width), height=float(s.height),
+                             material=s.material, infill_pattern=s.infill_pattern,
+                             infill_density=float(s.infill_density), wall_count=int(s.wall_count),
+                             line_width=float(s.line_width))
+        return beam
+
+    def refresh_materials(self):
+        # rebuild the material columns after editing `materials`/`material_index`
+        self.E_shell = np.array([m.youngs_modulus for m in self.materials])[self.material_index]
+        self.G_shell = np.array([m.shear_modulus for m in self.materials])[self.material_index]
+        self.material_strength = np.array([m.tensile_strength for m in self.materials])[self.material_index]
+
+    @property
+    def tensile_strength(self):
+        # allowable stress of every section, see `loading.core_strength_ratio`
+        return self.material_strength * core_strength_ratio(self)
+
+    @property
+    def wall_thickness(self):
+        # derived on access so edits to `wall_count`/`line_width` are never left stale
+        return self.wall_count * self.line_width
+
+    @property
+    def infill_pattern(self):
+        # one pattern per section, matched to the section arrays by `infill.core_ratios`
+        return self.infill_patterns
+
+    def __len__(self):
+        return self.length.size
+
+    def __getitem__(self, index):
+        if not -len(self) <= index < len(self):
+            raise IndexError("section index out of range")
+        return SectionView(self, index % len(self))
+
+    @property
+    def sections(self):
+        return [SectionView(self, i) for i in range(len(self))]
+
+    def input_load(self, M, F, T, TF):
+        self.M = M
+        self.F = F
+        self.T = T
+        self.TF = TF
+
+    def analysis(self):
+        """
+        Same results as `Beam.analysis`, evaluated over all sections at once.
+
+        Per-section results are written to the result arrays and the beam
+        totals to `beam_displacement`, `beam_rotation`, `beam_twist`,
+        `max_stress` and `max_stress_section`.
+        """
+        # distance from the free-side end of every section to the free end
+        lever = np.cumsum(self.length[::-1])[::-1] - self.length
+        moment = self.M + self.F * lever
+        (self.displacement,
+         self.rotation,
+         self.twist,
+         self.required_yield_stress) = (np.broadcast_to(r, self.length.shape).astype(float)
+                                        for r in section_response(moment, self.F, self.T, self.TF, self))
+
+        self.beam_displacement = float(np.sum(self.displacement + self.rotation * lever))
+        self.beam_rotation = float(np.sum(self.rotation))
+        self.beam_twist = float(np.sum(self.twist))
+
+        i = int(np.argmax(self.required_yield_stress))
+        if self.required_yield_stress[i] > 0:
+            self.max_stress = float(self.required_yield_stress[i])
+            self.max_stress_section = i
+        else:
+            self.max_stress = 0
+            self.max_stress_section = -1
+        return self.beam_displacement, self.beam_rotation, self.beam_twist
+
+    def analyze_batch(self, loads):
+        return Beam.analyze_batch(self, loads)
+
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in COLUMNS + RESULTS + ("E_shell", "G_shell", "material_strength"))
@@ -0,0 +1,157 @@
+import numpy as np
+
+from beam import analyze_sections
+from instrumentation import instrumented
+from loadcases import LOAD_COMPONENTS, load_case_arrays, normalize_load_case
+
+# quantities tracked per section: required stress, deflection and twist at
+# the free-side end of the section
+QUANTITIES = ("stress", "displacement", "twist")
+
+
+class Envelope:
+    """
+    Running per-section extremes over load cases.
+
+    Every quantity keeps, per section, the value of largest magnitude
+    seen so far and the index of the case that produced it, so cases can
+    be fed in chunks without keeping their results.
+    """
+
+    def __init__(self, n_sections):
+        self.n_sections = n_sections
+        self.case_names = []
+        self.value = {name: np.zeros(n_sections) for name in QUANTITIES}
+        self.magnitude = {name: np.full(n_sections, -1.0) for name in QUANTITIES}
+        self.case = {name: np.full(n_sections, -1, dtype=np.intp) for name in QUANTITIES}
+
+    def __len__(self):
+        return len(self.case_names)
+
+    def _reduce(self, name, values, offset):
+        # values: (sections, cases) for the cases starting at `offset`
+        magnitude = np.abs(values)
+        worst = np.argmax(magnitude, axis=1)
+        rows = np.arange(self.n_sections)
+        better = magnitude[rows, worst] > self.magnitude[name]
+        self.magnitude[name][better] = magnitude[rows, worst][better]
+        self.value[name][better] = values[rows, worst][better]
+        self.case[name][better] = offset + worst[better]
+
+    def add(self, results, lengths, case_names):
+        """
+        Fold in the `analyze_sections` results of a chunk of cases.
+
+        Parameters:
+        - results: dict returned by `analyze_sections`
+        - lengths: section lengths, clamped end first
+        - case_names: names of the cases in the chunk
+        """
+        offset = len(self.case_names)
+        self.case_names.extend(case_names)
+        self._reduce("stress", results["section_stress"], offset)
+
+        # deflection at the end of section j: the tip shares of sections up
+        # to j, minus their rotation times the length beyond j
+        beyond = np.cumsum(np.asarray(lengths, dtype=float)[::-1])[::-1] - lengths
+        rotation = np.cumsum(results["section_rotation"], axis=0)
+        displacement = np.cumsum(results["section_displacement"], axis=0) - beyond[:, np.newaxis] * rotation
+        self._reduce("displacement", displacement, offset)
+        self._reduce("twist", np.cumsum(results["section_twist"], axis=0), offset)
+
+    def report(self, strength=None, safety_factor=1.0, max_displacement=None, max_twist=None):
+        """
+        Governing load case and section of every limit.
+
+        Parameters:
+        - strength: per-section tensile strength, for utilization
+        - safety_factor: required stress must stay below strength / safety_factor
+        - max_displacement, max_twist: optional limits on the deflection
+          and twist (magnitudes)
+
+        Returns:
+        - {"cases": count, "limits": {quantity: {"value", "case", "section",
+          ...}}, "sections": [per-section extremes], "failed": bool}
+        """
+        if not self.case_names:
+            raise ValueError("No load cases in the envelope.")
+        sections = []
+        for j in range(self.n_sections):
+            record = {"section": j}
+            for name in QUANTITIES:
+                record[name] = float(self.value[name][j])
+                record[f"{name}_case"] = self.case_names[self.case[name][j]]
+            sections.append(record)
+
+        limits = {}
+        for name in QUANTITIES:
+            j = int(np.argmax(self.magnitude[name]))
+            limits[name] = {"value": float(self.value[name][j]), "case": self.case_names[self.case[name][j]],
+                            "section": j}
+        checks = []
+        if strength is not None:
+            utilization = self.value["stress"] * safety_factor / np.asarray(strength, dtype=float)
+            for record, u in zip(sections, utilization):
+                record["utilization"] = float(u)
+            j = int(np.argmax(utilization))
+            limits["utilization"] = {"value": float(utilization[j]), "case": self.case_names[self.case["stress"][j]],
+                                     "section": j, "limit": 1.0}
+            checks.append("utilization")
+        for name, limit in (("displacement", max_displacement), ("twist", max_twist)):
+            if limit is not None:
+                limits[name]["limit"] = limit
+                checks.append(name)
+        for name in checks:
+            limits[name]["ok"] = bool(abs(limits[name]["value"]) <= limits[name]["limit"])
+        return {"cases": len(self.case_names), "limits": limits, "sections": sections,
+                "failed": not all(limits[name]["ok"] for name in checks)}
+
+
+@instrumented("envelope.run")
+def run_envelope(beam, cases, chunk_size=4096, safety_factor=1.0, max_displacement=None, max_twist=None):
+    """
+    Envelope of a beam over named load cases in a single pass.
+
+    Parameters:
+    - beam: `Beam` (or `CompactBeam`)
+    - cases: load cases as dicts with "name", "M", "F", "T", "TF"
+      (combinations already expanded, see `loadcases.combine_load_cases`)
+    - chunk_size: cases evaluated at once; memory stays at one chunk of
+      per-section results however many cases there are
+
+    Returns:
+    - report dict, see `Envelope.report`
+    """
+    cases = [normalize_load_case(case, i) for i, case in enumerate(cases)]
+    sections = beam.sections
+    lengths = [s.length for s in sections]
+    envelope = Envelope(len(sections))
+    for start in range(0, len(cases), chunk_size):
+        chunk = cases[start:start + chunk_size]
+        loads = load_case_arrays(chunk)
+        results = analyze_sections(sections, *(loads[key] for key in LOAD_COMPONENTS))
+        envelope.add(results, lengths, [case["name"] for case in chunk])
+    return envelope.report([s.tensile_strength for s in sections], safety_factor, max_displacement, max_twist)
+
+
+_UNITS = {"stress": ("MPa", 1e-6), "displacement": ("mm", 1e3), "twist": ("rad", 1.0), "utilization": ("", 1.0)}
+
+
+def format_report(report):
+    """Plain-text table of the governing case and section of every limit."""
+    lines = [f"{report['cases']} load case(s)", ""]
+    lines.append(f"{'limit':<14}{'value':>14}  {'case':<20}{'section':>8}  check")
+    for name, limit in report["limits"].items():
+        unit, scale = _UNITS[name]
+        value = f"{limit['value'] * scale:.4g} {unit}".strip()
+        check = ""
+        if "ok" in limit:
+            check = f"{'ok' if limit['ok'] else 'FAILED'} (limit {limit['limit'] * scale:.4g})"
+        lines.append(f"{name:<14}{value:>14}  {limit['case']:<20}{limit['section']:>8}  {check}")
+    lines.append("")
+    lines.append(f"{'section':>7}  {'stress':>12} {'case':<14} {'displacement':>14} {'case':<14} {'twist':>12} {'case':<14}")
+    for record in report["sections"]:
+        lines.append(f"{record['section']:>7}  {record['stress'] * 1e-6:>8.4g} MPa {record['stress_case']:<14} "
+                     f"{record['displacement'] * 1e3:>11.4g} mm {record['displacement_case']:<14} "
+                     f"{record['twist']:>8.4g} rad {record['twist_case']:<14}")
+    return "\n".join(lines)
@@ -0,0 +1,162 @@
+import numpy as np
+
+from loading import force_load, moment_load, required_stress, section_properties, tensile_load, torsion_load
+
+# per-section response to unit loads, all load-independent
+_COEFFICIENTS = ("m_rot", "m_disp", "k_moment", "f_disp", "f_rot", "k_force", "k_shear", "t_twist", "k_torsion", "k_axial")
+
+
+class IncrementalAnalysis:
+    """
+    Re-analysis of a beam that only redoes the work an edit invalidates.
+
+    Every section response is linear in the loads, so each section keeps
+    its unit-load coefficients and its share of the tip sums
+    (displacement per unit M and F, rotation per unit M and F, twist per
+    unit T). Editing a section recomputes its coefficients only. A length
+    change also shifts the lever arm of the sections between it and the
+    clamped end, so only that prefix of the tip sums is rebuilt. A load
+    change costs O(1) for the tip values. Required stresses are re-evaluated
+    lazily, and only for sections whose local loads or geometry changed.
+
+    Results match `Beam.analysis`.
+    """
+
+    def __init__(self, beam, M=None, F=None, T=None, TF=None):
+        self.beam = beam
+        self.loads = {key: getattr(beam, key, 0.0) if value is None else value
+                      for key, value in (("M", M), ("F", F), ("T", T), ("TF", TF))}
+        self.rebuild()
+
+    def rebuild(self):
+        """Recompute everything, needed after sections are added or removed."""
+        sections = self.beam.sections
+        n = len(sections)
+        if n == 0:
+            raise ValueError("Beam has no sections.")
+        self._coefficients = {name: np.empty(n) for name in _COEFFICIENTS}
+        for i, section in enumerate(sections):
+            self._load_coefficients(i, section)
+        self._length = np.array([s.length for s in sections], dtype=float)
+        # distance from the free-side end of each section to the free end
+        self._lever = np.cumsum(self._length[::-1])[::-1] - self._length
+        self._contributions = np.empty((5, n))
+        self._update_contributions(np.arange(n))
+        self._totals = self._contributions.sum(axis=1)
+        self._stress = np.empty(n)
+        self._stale_all = True
+        self._stale = set()
+        self._dirty = set()
+        self.recomputed_sections = n
+
+    def _load_coefficients(self, i, section):
+        c = self._coefficients
+        p = section_properties(section)
+        c["m_rot"][i], c["m_disp"][i], c["k_moment"][i] = moment_load(section, 1.0, p)
+        c["f_disp"][i], c["f_rot"][i], c["k_force"][i], c["k_shear"][i] = force_load(section, 1.0, p)
+        c["t_twist"][i], c["k_torsion"][i] = torsion_load(section, 1.0, p)
+        c["k_axial"][i] = tensile_load(section, 1.0, p)
+
+    def _update_contributions(self, index):
+        c = self._coefficients
+        S = self._lever[index]
+        m_disp, m_rot, f_disp, f_rot = c["m_disp"][index], c["m_rot"][index], c["f_disp"][index], c["f_rot"][index]
+        self._contributions[0, index] = m_disp + m_rot * S  # tip displacement per unit M
+        self._contributions[1, index] = m_disp * S + f_disp + (m_rot * S + f_rot) * S  # per unit F
+        self._contributions[2, index] = m_rot  # tip rotation per unit M
+        self._contributions[3, index] = m_rot * S + f_rot  # per unit F
+        self._contributions[4, index] = c["t_twist"][index]  # twist per unit T
+
+    def set_loads(self, M=None, F=None, T=None, TF=None):
+        for key, value in (("M", M), ("F", F), ("T", T), ("TF", TF)):
+            if value is not None and value != self.loads[key]:
+                self.loads[key] = value
+                # every section's local loads move with the beam loads
+                self._stale_all = True
+
+    def update_section(self, index, **fields):
+        """Set fields on a section (e.g. width=0.02, wall_count=3) and mark it dirty."""
+        section = self.beam.sections[index]
+        for name, value in fields.items():
+            setattr(section, name, value)
+        self.mark_dirty(index)
+
+    def mark_dirty(self, index):
+        # for sections edited directly on the beam
+        self._dirty.add(index % len(self._length))
+
+    def _apply_edits(self):
+        sections = self.beam.sections
+        if len(sections) != len(self._length):
+            self.rebuild()
+            return
+        if not self._dirty:
+            self.recomputed_sections = 0
+            return
+        dirty = sorted(self._dirty)
+        self._dirty.clear()
+
+        prefix_end = 0
+        for j in dirty:
+            self._load_coefficients(j, sections[j])
+            delta = sections[j].length - self._length[j]
+            if delta:
+                self._length[j] = sections[j].length
+                self._lever[:j] += delta
+                prefix_end = max(prefix_end, j)
+
+        # sections before the last length change see a new lever arm
+        affected = np.union1d(np.arange(prefix_end), dirty)
+        old = self._contributions[:, affected].sum(axis=1)
+        self._update_contributions(affected)
+        self._totals += self._contributions[:, affected].sum(axis=1) - old
+        self._stale.update(affected.tolist())
+        self.recomputed_sections = affected.size
+
+    def analysis(self):
+        """
+        Bring the results up to date and return (displacement, rotation, twist).
+
+        `max_stress` and `max_stress_section` are refreshed as well.
+        """
+        self._apply_edits()
+        M, F, T = self.loads["M"], self.loads["F"], self.loads["T"]
+        totals = self._totals
+        self.beam_displacement = float(M * totals[0] + F * totals[1])
+        self.beam_rotation = float(M * totals[2] + F * totals[3])
+        self.beam_twist = float(T * totals[4])
+        self._refresh_stress()
+        return self.beam_displacement, self.beam_rotation, self.beam_twist
+
+    def _refresh_stress(self):
+        if self._stale_all:
+            stale = slice(None)
+        elif self._stale:
+            stale = np.fromiter(self._stale, dtype=np.intp, count=len(self._stale))
+        else:
+            return
+        c = self._coefficients
+        M, F, T, TF = (self.loads[key] for key in ("M", "F", "T", "TF"))
+        moment = M + F * self._lever[stale]
+        self._stress[stale] = required_stress(c["k_moment"][stale] * moment,
+                                              c["k_force"][stale] * F,
+                                              c["k_shear"][stale] * F,
+                                              c["k_torsion"][stale] * T,
+                                              c["k_axial"][stale] * TF)
+        self._stale_all = False
+        self._stale.clear()
+
+        i = int(np.argmax(self._stress))
+        if self._stress[i] > 0:
+            self.max_stress = float(self._stress[i])
+            self.max_stress_section = i
+        else:
+            self.max_stress = 0
+            self.max_stress_section = -1
+
+    @property
+    def required_yield_stress(self):
+        # per-section required stress for the current loads
+        self._apply_edits()
+        self._refresh_stress()
+        return self._stress
@@ -0,0 +1,230 @@
+import hashlib
+import json
+import os
+from collections import namedtuple
+from threading import Lock
+
+DEFAULT_TABLES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "infill_tables.json")
+
+# core stiffness and strength relative to the solid material
+CoreRatios = namedtuple("CoreRatios", ("E", "G", "strength"))
+
+# Gibson-Ashby style scaling of every property with the effective solid
+# fraction rho: ratio = rho**m * (C + (1 - C) * rho), i.e. C * rho**m for
+# sparse infill and exactly 1 for solid infill. (C, m) per property, for
+# a core loaded along the beam axis lying in the print plane: m = 1 for
+# stretch-dominated cells, 2 to 3 where the cell walls bend.
+PATTERN_MODELS = {
+    "honeycomb": {"E": (1.0, 3), "G": (1.0, 3), "strength": (0.5, 2)},
+    "triangles": {"E": (0.33, 1), "G": (0.34, 1), "strength": (0.33, 1)},
+    "grid": {"E": (0.5, 1), "G": (0.25, 2), "strength": (0.5, 1)},
+    "rectilinear": {"E": (1.0, 2), "G": (0.6, 1), "strength": (0.5, 1.5)},
+    "gyroid": {"E": (1.0, 2), "G": (1.0, 2), "strength": (0.3, 1.5)},
+    "cubic": {"E": (0.33, 1), "G": (0.2, 2), "strength": (0.33, 1)},
+    "concentric": {"E": (1.0, 1), "G": (0.3, 2), "strength": (1.0, 1)},
+}
+
+PATTERN_ALIASES = {
+    "hc": "honeycomb", "hex": "honeycomb", "hexagonal": "honeycomb",
+    "tri": "triangles", "triangular": "triangles",
+    "lines": "rectilinear", "line": "rectilinear", "zigzag": "rectilinear",
+    "gyr": "gyroid",
+    "con": "concentric",
+}
+
+# depth of the necks between neighbouring beads on either side of a line;
+# the load-bearing fraction of a line of width w is 1 - 2 * NECK_DEPTH / w
+NECK_DEPTH = 2e-5
+
+# table axes: infill density in percent and line width in meters
+DENSITY_AXIS = (0.0, 100.0, 41)
+LINE_WIDTH_AXIS = (0.0002, 0.0012, 21)
+
+_tables = None
+_lock = Lock()
+
+
+def pattern_name(pattern):
+    """Canonical model name of an infill pattern, or None if there is no model for it."""
+    if pattern is None:
+        return None
+    name = str(pattern).strip().lower()
+    name = PATTERN_ALIASES.get(name, name)
+    return name if name in PATTERN_MODELS else None
+
+
+def _axis(start, stop, num):
+    step = (stop - start) / (num - 1)
+    return [start + i * step for i in range(num)]
+
+
+def model_ratios(pattern, density, line_width):
+    """
+    Evaluate the pattern model directly (what the tables are built from).
+
+    Parameters:
+    - pattern: model name, see `PATTERN_MODELS`
+    - density: infill density in percent
+    - line_width: extrusion line width in meters
+    """
+    knockdown = min(max(1 - 2 * NECK_DEPTH / line_width, 0.0), 1.0)
+    rho = min(max(density / 100, 0.0), 1.0) * knockdown
+    return CoreRatios(*(rho**m * (C + (1 - C) * rho)
+                        for C, m in (PATTERN_MODELS[pattern][key] for key in CoreRatios._fields)))
+
+
+def build_tables():
+    densities = _axis(*DENSITY_AXIS)
+    widths = _axis(*LINE_WIDTH_AXIS)
+    patterns = {}
+    for pattern in PATTERN_MODELS:
+        grid = [[model_ratios(pattern, d, w) for w in widths] for d in densities]
+        patterns[pattern] = {key: [[round(r[k], 9) for r in row] for row in grid]
+                             for k, key in enumerate(CoreRatios._fields)}
+    return {"density": dict(zip(("start", "stop", "num"), DENSITY_AXIS)),
+            "line_width": dict(zip(("start", "stop", "num"), LINE_WIDTH_AXIS)),
+            "neck_depth": NECK_DEPTH,
+            "patterns": patterns}
+
+
+def write_tables(path=DEFAULT_TABLES):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(build_tables(), f, separators=(",", ":"))
+        f.write("\n")
+
+
+def load_tables(path=DEFAULT_TABLES):
+    """Read the lookup tables (done lazily on first use by `core_ratios`)."""
+    global _tables
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    data = json.loads(text)
+    data["version"] = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+    for axis in ("density", "line_width"):
+        spec = data[axis]
+        spec["step"] = (spec["stop"] - spec["start"]) / (spec["num"] - 1)
+    data["arrays"] = {}
+    with _lock:
+        _tables = data
+    return data
+
+
+def _get_tables():
+    tables = _tables
+    if tables is None:
+        tables = load_tables()
+    return tables
+
+
+def tables_version():
+    """
+    Hash of the loaded lookup tables, for keying cached results that
+    depend on the infill models.
+    """
+    return _get_tables()["version"]
+
+
+def _cell(spec, value):
+    # index of the lower table row and the fraction towards the next one, clamped to the table
+    position = (value - spec["start"]) / spec["step"]
+    position = min(max(position, 0.0), spec["num"] - 1.0)
+    i = min(int(position), spec["num"] - 2)
+    return i, position - i
+
+
+def _lookup(table, i, u, j, v):
+    low, high = table[i], table[i + 1]
+    return ((1 - u) * ((1 - v) * low[j] + v * low[j + 1])
+            + u * ((1 - v) * high[j] + v * high[j + 1]))
+
+
+def _lookup_arrays(pattern, density, line_width, tables):
+    import numpy as np
+
+    arrays = tables["arrays"].get(pattern)
+    if arrays is None:
+        arrays = tables["arrays"][pattern] = np.stack([np.asarray(tables["patterns"][pattern][key], dtype=float)
+                                                       for key in CoreRatios._fields])
+    spec = tables["density"]
+    u = np.clip((density - spec["start"]) / spec["step"], 0, spec["num"] - 1)
+    i = np.minimum(u.astype(np.intp), spec["num"] - 2)
+    u = u - i
+    spec = tables["line_width"]
+    v = np.clip((line_width - spec["start"]) / spec["step"], 0, spec["num"] - 1)
+    j = np.minimum(v.astype(np.intp), spec["num"] - 2)
+    v = v - j
+    return ((1 - u) * ((1 - v) * arrays[:, i, j] + v * arrays[:, i, j + 1])
+            + u * ((1 - v) * arrays[:, i + 1, j] + v * arrays[:, i + 1, j + 1]))
+
+
+def _linear(density):
+    n = density / 100
+    return CoreRatios(n, n, n)
+
+
+def core_ratios(pattern, density, line_width=None):
+    """
+    Effective E, G and strength of the infill core relative to the solid material.
+
+    Parameters:
+    - pattern: infill pattern name (aliases such as "HC" are accepted); a
+      sequence of names is matched to the first axis of `density`
+    - density: infill density in percent (scalar or NumPy array)
+    - line_width: extrusion line width in meters
+
+    Returns:
+    - CoreRatios(E, G, strength)
+
+    Patterns without a model, or a missing line width, fall back to the
+    plain density ratio for every property. Known patterns are looked up
+    in the precomputed tables with bilinear interpolation, clamped to the
+    table range.
+    """
+    if any(hasattr(v, "shape") for v in (density, line_width)):
+        return _core_ratio_arrays(pattern, density, line_width)
+    name = pattern_name(pattern)
+    if name is None or line_width is None:
+        return _linear(density)
+    tables = _get_tables()
+    i, u = _cell(tables["density"], density)
+    j, v = _cell(tables["line_width"], line_width)
+    table = tables["patterns"][name]
+    return CoreRatios(_lookup(table["E"], i, u, j, v),
+                      _lookup(table["G"], i, u, j, v),
+                      _lookup(table["strength"], i, u, j, v))
+
+
+def _core_ratio_arrays(pattern, density, line_width):
+    import numpy as np
+
+    density = np.asarray(density, dtype=float)
+    if line_width is None:
+        return _linear(density)
+    line_width = np.asarray(line_width, dtype=float)
+    shape = np.broadcast_shapes(density.shape, line_width.shape)
+    density = np.broadcast_to(density, shape)
+    line_width = np.broadcast_to(line_width, shape)
+    tables = None
+
+    if isinstance(pattern, (str, type(None))):
+        name = pattern_name(pattern)
+        if name is None:
+            return _linear(density)
+        return CoreRatios(*_lookup_arrays(name, density, line_width, _get_tables()))
+
+    names = [pattern_name(p) for p in pattern]
+    if len(names) != shape[0]:
+        raise ValueError("One infill pattern per row of the section arrays is needed.")
+    names = np.array(names, dtype=object).reshape((-1,) + (1,) * (len(shape) - 1))
+    ratios = np.broadcast_to(density / 100, (len(CoreRatios._fields),) + shape).copy()
+    for name in set(names.ravel()) - {None}:
+        if tables is None:
+            tables = _get_tables()
+        rows = np.broadcast_to(names == name, shape)
+        ratios[:, rows] = _lookup_arrays(name, density[rows], line_width[rows], tables)
+    return CoreRatios(*ratios)
+
+
+if __name__ == "__main__":
+    write_tables()
+    print(f"Wrote {DEFAULT_TABLES}")
@@ -0,0 +1,177 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# nothing is recorded until `enable` is called; while disabled every hook
+# is a single attribute check
+_NULL = nullcontext()
+
+
+class Recorder:
+    """Per-phase timings, call counts, allocation sizes and trace events."""
+
+    def __init__(self, max_events=100000):
+        self.enabled = False
+        self.max_events = max_events
+        self.reset()
+
+    def reset(self):
+        self.phases = {}  # name -> [calls, total, min, max]
+        self.allocations = {}  # name -> [count, total bytes, max bytes]
+        self.events = []
+        self.dropped_events = 0
+        self.origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add_phase(self, name, start, end):
+        elapsed = end - start
+        with self._lock:
+            stats = self.phases.get(name)
+            if stats is None:
+                self.phases[name] = [1, elapsed, elapsed, elapsed]
+            else:
+                stats[0] += 1
+                stats[1] += elapsed
+                stats[2] = min(stats[2], elapsed)
+                stats[3] = max(stats[3], elapsed)
+            if len(self.events) < self.max_events:
+                self.events.append((name, start, elapsed, threading.get_ident()))
+            else:
+                self.dropped_events += 1
+
+    def add_allocation(self, name, nbytes):
+        with self._lock:
+            stats = self.allocations.get(name)
+            if stats is None:
+                self.allocations[name] = [1, nbytes, nbytes]
+            else:
+                stats[0] += 1
+                stats[1] += nbytes
+                stats[2] = max(stats[2], nbytes)
+
+
+recorder = Recorder()
+
+
+class _Phase:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        recorder.add_phase(self.name, self.start, time.perf_counter())
+
+
+def enable():
+    recorder.enabled = True
+
+
+def disable():
+    recorder.enabled = False
+
+
+def is_enabled():
+    return recorder.enabled
+
+
+def reset():
+    recorder.reset()
+
+
+def phase(name):
+    """Context manager timing a named phase (a shared no-op while disabled)."""
+    if not recorder.enabled:
+        return _NULL
+    return _Phase(name)
+
+
+def instrumented(name):
+    """Decorator recording every call of the function as phase `name`."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not recorder.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                recorder.add_phase(name, start, time.perf_counter())
+        return wrapper
+    return decorator
+
+
+def record_allocation(name, nbytes):
+    if recorder.enabled:
+        recorder.add_allocation(name, int(nbytes))
+
+
+@contextmanager
+def profiled():
+    """Enable instrumentation for a block, starting from a clean recorder."""
+    was_enabled = recorder.enabled
+    recorder.reset()
+    recorder.enabled = True
+    try:
+        yield recorder
+    finally:
+        recorder.enabled = was_enabled
+
+
+def report():
+    """
+    Structured summary of everything recorded so far.
+
+    Returns:
+    - {"phases": {name: {calls, total_s, mean_s, min_s, max_s}},
+       "allocations": {name: {count, total_bytes, max_bytes}},
+       "events": number of trace events, "dropped_events": events over the limit}
+    """
+    phases = {}
+    for name, (calls, total, low, high) in sorted(recorder.phases.items(), key=lambda item: -item[1][1]):
+        phases[name] = {"calls": calls, "total_s": total, "mean_s": total / calls, "min_s": low, "max_s": high}
+    allocations = {}
+    for name, (count, total, high) in sorted(recorder.allocations.items(), key=lambda item: -item[1][1]):
+        allocations[name] = {"count": count, "total_bytes": total, "max_bytes": high}
+    return {"phases": phases, "allocations": allocations,
+            "events": len(recorder.events), "dropped_events": recorder.dropped_events}
+
+
+def format_report():
+    data = report()
+    lines = [f"{'phase':<32}{'calls':>10}{'total ms':>12}{'mean us':>12}{'max us':>12}"]
+    for name, s in data["phases"].items():
+        lines.append(f"{name:<32}{s['calls']:>10}{s['total_s'] * 1e3:>12.3f}{s['mean_s'] * 1e6:>12.2f}{s['max_s'] * 1e6:>12.2f}")
+    if data["allocations"]:
+        lines.append("")
+        lines.append(f"{'allocation':<32}{'count':>10}{'total kB':>12}{'max kB':>12}")
+        for name, s in data["allocations"].items():
+            lines.append(f"{name:<32}{s['count']:>10}{s['total_bytes'] / 1024:>12.1f}{s['max_bytes'] / 1024:>12.1f}")
+    return "\n".join(lines)
+
+
+def chrome_trace():
+    """Recorded phases as a Chrome trace ("Trace Event Format") document."""
+    pid = os.getpid()
+    events = [{"name": name, "cat": name.split(".", 1)[0], "ph": "X", "pid": pid, "tid": tid,
+               "ts": (start - recorder.origin) * 1e6, "dur": elapsed * 1e6}
+              for name, start, elapsed, tid in recorder.events]
+    for name, (count, total, high) in recorder.allocations.items():
+        events.append({"name": name, "ph": "C", "pid": pid, "tid": 0, "ts": 0,
+                       "args": {"total_bytes": total, "max_bytes": high}})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def export(path):
+    """Write a Chrome trace when `path` ends in .trace.json, a structured report otherwise."""
+    data = chrome_trace() if path.endswith(".trace.json") else report()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=None if "traceEvents" in data else 2)
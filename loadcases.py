@@ -0,0 +1,79 @@
+import csv
+import json
+import os
+
+LOAD_COMPONENTS = ("M", "F", "T", "TF")
+
+
+def normalize_load_case(case, index=0):
+    """Return {"name", "M", "F", "T", "TF"} with missing components set to 0."""
+    normalized = {"name": str(case.get("name", f"case{index}"))}
+    for key in LOAD_COMPONENTS:
+        value = case.get(key)
+        normalized[key] = float(value) if value not in (None, "") else 0.0
+    return normalized
+
+
+def combine_load_cases(cases, combinations):
+    """
+    Factored sums of named load cases.
+
+    Parameters:
+    - cases: normalized load cases
+    - combinations: {name: {case name: factor}} or a list of
+      {"name": ..., "factors": {case name: factor}}
+
+    Returns:
+    - list of normalized load cases, one per combination
+    """
+    by_name = {case["name"]: case for case in cases}
+    if isinstance(combinations, dict):
+        combinations = [{"name": name, "factors": factors} for name, factors in combinations.items()]
+    combined = []
+    for i, combination in enumerate(combinations):
+        name = str(combination.get("name", f"combination{i}"))
+        totals = dict.fromkeys(LOAD_COMPONENTS, 0.0)
+        for case_name, factor in combination["factors"].items():
+            if case_name not in by_name:
+                raise ValueError(f"Combination '{name}' refers to unknown load case '{case_name}'.")
+            for key in LOAD_COMPONENTS:
+                totals[key] += float(factor) * by_name[case_name][key]
+        combined.append(dict(totals, name=name))
+    return [normalize_load_case(case) for case in combined]
+
+
+def read_load_cases(path):
+    """
+    Read load cases from a JSON or CSV file.
+
+    JSON can be a single case object, a list of cases, {"cases": [...]}
+    or a mapping of case name to case. With {"cases": ..., "combinations":
+    ...} the factored combinations (see `combine_load_cases`) follow the
+    cases. CSV needs a header row with any of the columns name, M, F, T, TF.
+    """
+    if os.path.splitext(path)[1].lower() == ".csv":
+        with open(path, "r", newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        return [normalize_load_case(row, i) for i, row in enumerate(rows)]
+
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    combinations = None
+    if isinstance(data, dict) and "cases" in data:
+        combinations = data.get("combinations")
+        data = data["cases"]
+    if isinstance(data, dict):
+        if any(key in data for key in LOAD_COMPONENTS):
+            data = [data]
+        else:
+            data = [dict(case, name=name) for name, case in data.items()]
+    cases = [normalize_load_case(case, i) for i, case in enumerate(data)]
+    if combinations:
+        cases += combine_load_cases(cases, combinations)
+    return cases
+
+
+def load_case_arrays(cases):
+    # column arrays in the layout expected by Beam.analyze_batch
+    import numpy as np
+    return {key: np.array([case[key] for case in cases], dtype=float) for key in LOAD_COMPONENTS}
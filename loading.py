@@ -1,15 +1,80 @@
-def moment_load(section,M):
+from collections import namedtuple
+from functools import reduce
+
+from infill import core_ratios
+from instrumentation import instrumented
+from torsion import core_dimensions, grid_torsion_constant, torsion_constant
+
+# torsion methods a section can select with its `torsion_method` field
+SECTION_TORSION_METHODS = ("analytic", "mesh")
+
+# the plain terms are for bending in the height plane (M, F), the lateral
+# ones for bending in the width plane (My, Fz)
+SectionProperties = namedtuple("SectionProperties", ("I_composite", "A_composite", "J", "EI", "GJ", "EA", "c", "r",
+                                                     "I_lateral", "EI_lateral", "c_lateral", "strength_ratio"))
+
+
+def _maximum(*values):
+    # elementwise maximum that stays in plain Python for scalar inputs
+    if any(hasattr(v, "shape") for v in values):
+        import numpy as np
+        return reduce(np.maximum, values)
+    return max(values)
+
+
+def _strength_ratio(n, strength, A_core):
+    # at the shell's strain the core carries n times the shell stress but
+    # only `strength` times the material's strength, so a core weaker than
+    # it is stiff lowers the allowable stress of the whole section
+    if any(hasattr(v, "shape") for v in (n, strength, A_core)):
+        import numpy as np
+        has_core = (A_core > 0) & (n > 0)
+        return np.where(has_core, np.minimum(1.0, strength / np.where(has_core, n, 1.0)), 1.0)
+    if A_core <= 0 or n <= 0:
+        return 1.0
+    return min(1.0, strength / n)
+
+
+def core_strength_ratio(section):
+    """
+    Allowable stress of a section relative to its material's tensile strength.
+
+    The core's stress is checked with the shell's: at equal strain it
+    carries the E ratio times the shell stress and yields at the strength
+    ratio times the material strength (see `infill.core_ratios`). Patterns
+    without a model have equal ratios and keep the full strength.
+    """
+    core = core_ratios(getattr(section, "infill_pattern", None), section.infill_density,
+                       getattr(section, "line_width", None))
+    b_core, h_core = core_dimensions(section.width, section.height, section.wall_thickness)
+    return _strength_ratio(core.E, core.strength, b_core * h_core)
+
+
+@instrumented("section.properties")
+def compute_section_properties(section):
+    """
+    Load-independent stiffness terms of a composite section.
+
+    The shell is the outer rectangle minus the core, and the core is
+    transformed by the effective stiffness ratios of its infill pattern
+    (see `infill.core_ratios`): the E ratio for bending and axial terms,
+    the G ratio for torsion, and its strength ratio limits the allowable
+    stress (see `core_strength_ratio`). Section fields may be NumPy arrays.
+
+    The section's `torsion_method` (default "analytic", the composite polar
+    moment) selects J and the torsional shear stress: "mesh" solves the
+    Saint-Venant problem of the shell and core (see `section_solver`) and
+    takes the peak of its shear field, for scalar fields only.
+    """
     b = section.width
     h = section.height
-    L = section.length
     t = section.wall_thickness
-    E_shell = section.E_shell
-    n = section.infill_density/100
-    applied_moment = M
+    core = core_ratios(getattr(section, "infill_pattern", None), section.infill_density,
+                       getattr(section, "line_width", None))
+    n = core.E
 
-    # Dimensions of the core
-    b_core = b - 2 * t
-    h_core = h - 2 * t
+    # Dimensions of the core, which vanishes once the walls meet
+    b_core, h_core = core_dimensions(b, h, t)
 
     # Moment of inertia of shell (outer rectangle minus inner core)
     I_outer = (b * h**3) / 12
@@ -20,142 +85,128 @@ def moment_load(section,M):
     I_core_transformed = n * I_inner
     I_composite = I_shell + I_core_transformed
 
+    # Areas
+    A_shell = b * h - b_core * h_core
+    A_core = b_core * h_core
+
+    # Transformed core area
+    A_core_transformed = n * A_core
+    A_composite = A_shell + A_core_transformed
+
+    # Same about the height axis, for lateral bending
+    I_lateral = (h * b**3 - (1 - n) * h_core * b_core**3) / 12
+
+    method = getattr(section, "torsion_method", None) or "analytic"
+    if method == "mesh":
+        J, r = _mesh_torsion(section)
+    elif method == "analytic":
+        # Polar moment of inertia approximation for rectangular section
+        J = compute_tortion_constant(b, h, t, section.G_shell, core.G)
+        r = _maximum(b, h) / 2  # outer radius for torsional shear
+    else:
+        raise ValueError(f"Unknown section torsion method '{method}'.")
+
+    return SectionProperties(
+        I_composite=I_composite,
+        A_composite=A_composite,
+        J=J,
+        EI=section.E_shell * I_composite,
+        GJ=section.G_shell * J,
+        EA=section.E_shell * A_composite,
+        c=h / 2,  # extreme fiber distance
+        r=r,
+        I_lateral=I_lateral,
+        EI_lateral=section.E_shell * I_lateral,
+        c_lateral=b / 2,
+        strength_ratio=_strength_ratio(n, core.strength, A_core),
+    )
+
+def _mesh_torsion(section):
+    # Saint-Venant J of the shell and core, and the radius that makes
+    # T * r / J the peak shear stress of the solved field
+    if any(hasattr(getattr(section, name), "shape") for name in ("width", "height", "wall_thickness", "infill_density")):
+        raise ValueError("The mesh torsion method needs scalar section fields.")
+    from section_solver import Profile, solve_profile
+
+    solution = solve_profile(Profile.from_section(section))
+    return solution.J, solution.max_shear_unit * solution.J
+
+def section_properties(section):
+    # sections cache their properties, other section-like objects are evaluated directly
+    properties = getattr(section, "properties", None)
+    if properties is None:
+        properties = compute_section_properties(section)
+    return properties
+
+@instrumented("loading.moment_load")
+def moment_load(section, M, properties=None):
+    # `properties` saves the lookup when the caller already has them
+    L = section.length
+    p = section_properties(section) if properties is None else properties
+    applied_moment = M
+
     # End rotation (radians)
-    theta = applied_moment * L / (E_shell * I_composite)
+    theta = applied_moment * L / p.EI
 
     # End displacement (meters)
-    delta = applied_moment * L**2 / (2 * E_shell * I_composite)
+    delta = applied_moment * L**2 / (2 * p.EI)
 
     # Maximum stress at top surface (Pascals)
-    c = h / 2
-    sigma_top = applied_moment * c / I_composite # at top and bottom surface
+    sigma_top = applied_moment * p.c / p.I_composite # at top and bottom surface
 
     return (theta, delta, sigma_top)
 
-def force_load(section, F):
+@instrumented("loading.force_load")
+def force_load(section, F, properties=None):
     # Extract parameters
-    b = section.width
-    h = section.height
     L = section.length
-    t = section.wall_thickness
-    E_shell = section.E_shell
-    n = section.infill_density/100
+    p = section_properties(section) if properties is None else properties
     applied_force = F
 
-    # Dimensions of the core
-    b_core = b - 2 * t
-    h_core = h - 2 * t
-
-    # Moment of inertia of shell (outer rectangle minus inner core)
-    I_outer = (b * h**3) / 12
-    I_inner = (b_core * h_core**3) / 12
-    I_shell = I_outer - I_inner
-
-    # Composite moment of inertia using transformed section method
-    I_core_transformed = n * I_inner
-    I_composite = I_shell + I_core_transformed
-
     # End displacement (meters)
-    delta = applied_force * L**3 / (3 * E_shell * I_composite)
+    delta = applied_force * L**3 / (3 * p.EI)
 
     # End rotation (radians)
-    theta = applied_force * L**2 / (2 * E_shell * I_composite)
+    theta = applied_force * L**2 / (2 * p.EI)
 
     # Maximum stress at top surface (Pascals)
     M = applied_force * L
-    c = h / 2
-    sigma_top = M * c / I_composite # at top and bottom surface
+    sigma_top = M * p.c / p.I_composite # at top and bottom surface
 
-    
     # Shear stress at neutral axis
-    A_shell = b * h - b_core * h_core
-    A_core = b_core * h_core
-    A_core_transformed = n * A_core
-    A_composite = A_shell + A_core_transformed
-    tau_max = (3 / 2) * applied_force / A_composite # at neutral axis
-
+    tau_max = (3 / 2) * applied_force / p.A_composite # at neutral axis
 
     return(delta, theta, sigma_top, tau_max)
 
-def compute_tortion_constant(b, h, t, G_shell, n, nx=1000, ny=1000):
-    import numpy as np
-    # Inner dimensions
-    bi = b - 2 * t
-    hi = h - 2 * t
-
-    # Create grid
-    x = np.linspace(-b/2, b/2, nx)
-    y = np.linspace(-h/2, h/2, ny)
-    dx = x[1] - x[0]
-    dy = y[1] - y[0]
-    X, Y = np.meshgrid(x, y)
-
-    # Masks for outer shell and core
-    mask_outer = (np.abs(X) <= b/2) & (np.abs(Y) <= h/2)
-    mask_core = (np.abs(X) <= bi/2) & (np.abs(Y) <= hi/2)
-
-    # Shear modulus distribution
-    shear_modulus = np.where(mask_core, n, 1)
-
-    # Integrate (x^2 + y^2) * G over the entire section
-    integrand = (X**2 + Y**2) * shear_modulus
-    J = np.sum(integrand) * dx * dy
-
-    return J
+def compute_tortion_constant(b, h, t, G_shell, n, nx=1000, ny=1000, method="analytic", tol=1e-6):
+    # "grid" keeps the original brute force meshgrid integration for reference,
+    # every other method goes through the cached torsion engine
+    if method == "grid":
+        return grid_torsion_constant(b, h, t, n, nx, ny)
+    return torsion_constant(b, h, t, n, method=method, tol=tol)
 
-
-
-def torsion_load(section, T):
+@instrumented("loading.torsion_load")
+def torsion_load(section, T, properties=None):
     # Extract parameters
-    b = section.width
-    h = section.height
     L = section.length
-    t = section.wall_thickness
-    G_shell = section.G_shell
-    n = section.infill_density/100
+    p = section_properties(section) if properties is None else properties
     applied_torque = T
 
-    # Dimensions of the core
-    b_core = b - 2 * t
-    h_core = h - 2 * t
-
-    # Polar moment of inertia approximation for rectangular section
-    J = compute_tortion_constant(b, h, t, G_shell, n)
-
     # Torsional rotation (radians)
-    theta = applied_torque * L / (G_shell * J)
+    theta = applied_torque * L / p.GJ
 
     # Maximum shear stress at outer surface
-    r = max(b, h) / 2
-    tau_max = applied_torque * r / J # constant arround the shell
+    tau_max = applied_torque * p.r / p.J # constant arround the shell
 
     return (theta, tau_max)
 
-def tensile_load(section, TF):
-    
-# Extract parameters
-    b = section.width
-    h = section.height
-    t = section.wall_thickness
-    n = section.infill_density/100
+@instrumented("loading.tensile_load")
+def tensile_load(section, TF, properties=None):
+    p = section_properties(section) if properties is None else properties
     applied_tensile_force = TF
 
-    # Dimensions of the core
-    b_core = b - 2 * t
-    h_core = h - 2 * t
-
-    # Areas
-    A_shell = b * h - b_core * h_core
-    A_core = b_core * h_core
-
-    # Transformed core area
-    A_core_transformed = n * A_core
-
-    # Effective area
-    A_eff = A_shell + A_core_transformed
-
     # Axial stress (same at top and bottom surfaces)
-    axial_stress = applied_tensile_force / A_eff
+    axial_stress = applied_tensile_force / p.A_composite
 
     return axial_stress
 
@@ -179,7 +230,7 @@ def required_yield_stress_tresca(tensile_stress, shear_stress):
     sigma_max = abs(sigma_1 - sigma_2)
 
     # Required yield stress must satisfy both conditions
-    required_yield_stress = max(sigma_max, sigma_1)
+    required_yield_stress = _maximum(sigma_max, sigma_1)
 
     return required_yield_stress 
 
@@ -202,36 +253,112 @@ def required_yield_stress_von_mises(tensile_stress, shear_stress):
 
     return sigma_max
 
-def analysis(M, F, T, TF, section):
-    if M is not None:
-        theta_moment, delta_moment, sigma_moment = moment_load(section, M)
-    if F is not None:
-        delta_force, theta_force, sigma_force, tau_force = force_load(section, F)
-    if T is not None:
-        theta_torsion, tau_torsion = torsion_load(section, T)
-    if TF is not None:
-        axial_stress = tensile_load(section, TF)
-    
-    section.displacement = delta_moment + delta_force
-    section.rotation = theta_moment + theta_force
-    section.twist = theta_torsion
+def required_stress(sigma_moment, sigma_force, tau_force, tau_torsion, axial_stress):
+    """
+    Combine the load component stresses of a section into the minimum
+    yield stress it requires, checking the top/bottom surfaces and the
+    neutral axis with both Tresca and Von Mises.
+
+    `sigma_moment` is the bending stress of the moment at the free-side end
+    of the section and `sigma_force` what the transverse force adds up to
+    the clamped-side end. The moment is linear in between, so the surfaces
+    are checked at whichever end bends more.
 
+    Inputs can be scalars or NumPy arrays of load cases.
+    """
     # do mohr's circle analysis to find principal stresses
+    bending_stress = _maximum(abs(sigma_moment + sigma_force), abs(sigma_moment))
 
     # at the top and bottom surface
-    top_surface_stress = sigma_moment + sigma_force + axial_stress
-    bottom_surface_stress = -sigma_moment + -sigma_force + axial_stress
-    surface_tensile_stress = max(top_surface_stress, bottom_surface_stress)
+    top_surface_stress = bending_stress + axial_stress
+    bottom_surface_stress = -bending_stress + axial_stress
+    surface_tensile_stress = _maximum(top_surface_stress, bottom_surface_stress)
     surface_shear_stress = axial_stress
 
     # at the neutral axis
     neutral_axis_shear_stress = abs(tau_force) + abs(tau_torsion)
     neutral_axis_tensile_stress = axial_stress
-    required_yield_stress = max(required_yield_stress_tresca(surface_tensile_stress, surface_shear_stress),
-                                required_yield_stress_von_mises(surface_tensile_stress, surface_shear_stress),
-                                required_yield_stress_tresca(neutral_axis_tensile_stress, neutral_axis_shear_stress),
-                                required_yield_stress_von_mises(neutral_axis_tensile_stress, neutral_axis_shear_stress))
-    section.required_yield_stress = required_yield_stress
-    return None
+    return _maximum(required_yield_stress_tresca(surface_tensile_stress, surface_shear_stress),
+                    required_yield_stress_von_mises(surface_tensile_stress, surface_shear_stress),
+                    required_yield_stress_tresca(neutral_axis_tensile_stress, neutral_axis_shear_stress),
+                    required_yield_stress_von_mises(neutral_axis_tensile_stress, neutral_axis_shear_stress))
+
+# stress points of a rectangular section as (y, z) in units of (h/2, b/2):
+# the four corners, then the middle of the top, bottom and two side faces
+STRESS_POINTS = ((1, 1), (1, -1), (-1, 1), (-1, -1), (1, 0), (-1, 0), (0, 1), (0, -1))
+
+
+def biaxial_required_stress(sigma_height, sigma_width, tau_height, tau_width, tau_torsion, axial_stress):
+    """
+    Minimum yield stress over the stress points of a biaxially loaded section.
+
+    Parameters:
+    - sigma_height: bending stress at the top face (moment in the height plane)
+    - sigma_width: bending stress at a side face (moment in the width plane)
+    - tau_height, tau_width: transverse shear at the neutral axis of each plane
+    - tau_torsion: torsional shear at the faces
+    - axial_stress: tensile stress
+
+    Returns:
+    - (required stress, index into STRESS_POINTS of the governing point)
+
+    Normal stress is superposed at every point. Transverse shear peaks on
+    the neutral axis of its plane and torsional shear on the faces, both
+    vanish at the corners. With one normal and one shear component Tresca
+    (sqrt(sigma^2 + 4 tau^2)) is never below Von Mises (sqrt(sigma^2 +
+    3 tau^2)) and both only depend on |sigma|, so each group of points
+    (corners, top/bottom, sides) reduces to its worst sign in closed form
+    and the inputs are never expanded along a point axis.
+    """
+    import numpy as np
+
+    axial = np.abs(axial_stress)
+    bend_height = np.abs(sigma_height)
+    bend_width = np.abs(sigma_width)
+    required = np.stack(np.broadcast_arrays(
+        axial + bend_height + bend_width,
+        required_yield_stress_tresca(axial + bend_height, np.abs(tau_width) + np.abs(tau_torsion)),
+        required_yield_stress_tresca(axial + bend_width, np.abs(tau_height) + np.abs(tau_torsion))))
+    group = np.argmax(required, axis=0)
+
+    # the face (y, z = +-1) where the bending stress adds to the axial stress
+    sign = np.where(axial_stress >= 0, 1, -1)
+    y = sign * np.where(sigma_height >= 0, 1, -1)
+    z = sign * np.where(sigma_width >= 0, 1, -1)
+    point = np.choose(group, [(1 - y) + (1 - z) // 2, 4 + (1 - y) // 2, 6 + (1 - z) // 2])
+    return np.take_along_axis(required, group[np.newaxis], axis=0)[0], point
 
 
+def section_response(M, F, T, TF, section):
+    """
+    Evaluate one section under its local loads without touching the section.
+
+    Returns:
+    - (displacement, rotation, twist, required_yield_stress), each a scalar
+      or an array matching the load inputs
+
+    The section properties are looked up (or, for section-likes without a
+    cache, computed) once and shared by the four load cases.
+    """
+    p = section_properties(section)
+    if M is not None:
+        theta_moment, delta_moment, sigma_moment = moment_load(section, M, p)
+    if F is not None:
+        delta_force, theta_force, sigma_force, tau_force = force_load(section, F, p)
+    if T is not None:
+        theta_torsion, tau_torsion = torsion_load(section, T, p)
+    if TF is not None:
+        axial_stress = tensile_load(section, TF, p)
+
+    displacement = delta_moment + delta_force
+    rotation = theta_moment + theta_force
+    twist = theta_torsion
+    required_yield_stress = required_stress(sigma_moment, sigma_force, tau_force, tau_torsion, axial_stress)
+    return displacement, rotation, twist, required_yield_stress
+
+def analysis(M, F, T, TF, section):
+    (section.displacement,
+     section.rotation,
+     section.twist,
+     section.required_yield_stress) = section_response(M, F, T, TF, section)
+    return None
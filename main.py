@@ -1,10 +1,13 @@
+import argparse
 import json
 import os
+import sys
 
+from beam import Beam, analyze_beam
+from instrumentation import is_enabled
 
-if __name__ == "__main__":
-    from beam import Beam
 
+def run_interactive():
     # Prompt for beam name
     beam_name = input("Please enter the name of the beam:").strip()
     if not beam_name:
@@ -51,23 +54,7 @@ if __name__ == "__main__":
         choice = input("Load existing beam? [Y/n]: ").strip().lower()
         if choice in ("", "y", "yes"):
             try:
-                with open(beam_file, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-
-                defaults = data.get("defaults", {}) if isinstance(data, dict) else {}
-                allowed_defaults = ("material", "infill_pattern", "infill_density", "wall_count", "line_width")
-                beam_kwargs = {k: defaults[k] for k in allowed_defaults if k in defaults and defaults[k] is not None}
-                beam = Beam(**beam_kwargs)
-
-                for s in data.get("sections", []):
-                    length = s.get("length")
-                    width = s.get("width")
-                    height = s.get("height")
-                    if length is None or width is None or height is None:
-                        continue
-                    allowed_section_keys = ("material", "infill_pattern", "infill_density", "wall_count", "line_width")
-                    section_kwargs = {k: s[k] for k in allowed_section_keys if k in s and s[k] is not None}
-                    beam.add_section(length=length, width=width, height=height, **section_kwargs)
+                beam = Beam.from_json(beam_file)
 
                 print(f"Loaded beam '{beam_name}' with {len(beam.sections)} sections.")
                 return beam, True
@@ -221,4 +208,401 @@ if __name__ == "__main__":
         print(f"  Rotation: {rot}")
         print(f"  Twist: {twist}")
         # except Exception as e:
-        #     print(f"Analysis failed: {e}")
\ No newline at end of file
+        #     print(f"Analysis failed: {e}")
+
+
+def collect_beam_files(paths):
+    """Expand files and directories (their *.json files) into a sorted list of beam files."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith(".json"))
+        else:
+            files.append(path)
+    return files
+
+
+CASE_FIELDS = ["beam", "file", "case", "displacement", "rotation", "twist",
+               "max_stress", "max_stress_section", "failed", "error"]
+SECTION_OUTPUT_FIELDS = ["beam", "case", "section", "required_yield_stress", "tensile_strength"]
+# column types for columnar output, so they do not depend on which record comes first
+CASE_SCHEMA = dict(zip(CASE_FIELDS, ("str", "str", "str", "float", "float", "float",
+                                     "float", "int", "bool", "str")))
+SECTION_OUTPUT_SCHEMA = dict(zip(SECTION_OUTPUT_FIELDS, ("str", "str", "int", "float", "float")))
+
+
+def analyze_beam_file(beam_file, cases, per_section=False):
+    """
+    Run every load case against one beam file.
+
+    Returns:
+    - (case records, section records); section records are only built
+      with `per_section`
+    """
+    beam_name = os.path.splitext(os.path.basename(beam_file))[0]
+    try:
+        beam = Beam.from_json(beam_file)
+        records, section_records = analyze_beam(beam, cases, per_section, beam=beam_name, file=beam_file)
+    except (OSError, ValueError, KeyError, TypeError, ArithmeticError) as e:
+        return [{"beam": beam_name, "file": beam_file, "error": str(e)}], []
+    for record in section_records:
+        del record["file"]
+    return records, section_records
+
+
+def _open_output(path, schema):
+    from results import NDJSONSink, open_sink
+
+    if path is None or path == "-":
+        return NDJSONSink(sys.stdout)
+    return open_sink(path, fieldnames=list(schema), schema=schema)
+
+
+def cmd_analyze(args):
+    from loadcases import normalize_load_case, read_load_cases
+
+    if args.loads:
+        cases = read_load_cases(args.loads)
+    else:
+        M, F, T, TF = args.load or (0.0, 0.0, 0.0, 0.0)
+        cases = [normalize_load_case({"M": M, "F": F, "T": T, "TF": TF})]
+    beam_files = collect_beam_files(args.beams)
+    if not beam_files:
+        print("No beam files found.", file=sys.stderr)
+        return 1
+
+    failed = False
+    per_section = args.section_output is not None
+    out = _open_output(args.output, CASE_SCHEMA)
+    section_out = _open_output(args.section_output, SECTION_OUTPUT_SCHEMA) if per_section else None
+    n = len(beam_files)
+    try:
+        # instrumentation only sees the current process, so profiled runs stay in it
+        if is_enabled() or args.workers == 1:
+            pool = None
+            results = map(analyze_beam_file, beam_files, [cases] * n, [per_section] * n)
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            pool = ProcessPoolExecutor(max_workers=args.workers)
+            results = pool.map(analyze_beam_file, beam_files, [cases] * n, [per_section] * n)
+        for records, section_records in results:
+            for record in records:
+                failed |= record.get("error") is not None
+                out.write(record)
+            for record in section_records:
+                section_out.write(record)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        for sink in (out, section_out):
+            if sink is not None:
+                sink.close()
+    return 1 if failed else 0
+
+
+def cmd_sweep(args):
+    from sweep import run_sweep
+
+    with open(args.spec, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    beam = spec["beam"]
+    if isinstance(beam, str) and not os.path.isabs(beam):
+        # beam paths in a spec are relative to the spec file
+        beam = os.path.join(os.path.dirname(os.path.abspath(args.spec)), beam)
+    count = run_sweep(beam, spec["parameters"], spec.get("loads", {}), args.output,
+                      workers=args.workers, chunk_size=args.chunk_size)
+    print(f"Evaluated {count} candidates, results written to {args.output}", file=sys.stderr)
+    return 0
+
+
+def cmd_validate(args):
+    from beam import validate_beam_data
+
+    invalid = 0
+    for beam_file in collect_beam_files(args.beams):
+        try:
+            with open(beam_file, "r", encoding="utf-8") as f:
+                problems = validate_beam_data(json.load(f))
+        except (OSError, ValueError) as e:
+            problems = [str(e)]
+        if problems:
+            invalid += 1
+            for problem in problems:
+                print(f"{beam_file}: {problem}")
+        elif not args.quiet:
+            print(f"{beam_file}: ok")
+    return 1 if invalid else 0
+
+
+def cmd_envelope(args):
+    from envelope import format_report, run_envelope
+    from loadcases import read_load_cases
+
+    beam = Beam.from_json(args.beam)
+    report = run_envelope(beam, read_load_cases(args.loads), safety_factor=args.safety_factor,
+                          max_displacement=args.max_displacement, max_twist=args.max_twist)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    print(format_report(report))
+    return 1 if report["failed"] else 0
+
+
+def _read_node_load_cases(path):
+    # {"cases": ...} or the cases themselves: a list of {"name", "loads"} or {name: loads}
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict) and "cases" in data:
+        data = data["cases"]
+    if isinstance(data, dict):
+        return [{"name": name, "loads": loads} for name, loads in data.items()]
+    return [{"name": case.get("name", f"case{i}"), "loads": case["loads"]} for i, case in enumerate(data)]
+
+
+def cmd_assembly(args):
+    import numpy as np
+
+    from assembly import Assembly
+    from results import NDJSONSink
+
+    assembly = Assembly.from_json(args.frame)
+    assembly.workers = args.workers
+    with open(args.frame, "r", encoding="utf-8") as f:
+        frame = json.load(f)
+    cases = _read_node_load_cases(args.loads) if args.loads else [
+        {"name": case.get("name", f"case{i}"), "loads": case["loads"]} for i, case in enumerate(frame.get("load_cases", []))]
+    if not cases:
+        print("No load cases: give --loads or \"load_cases\" in the frame file.", file=sys.stderr)
+        return 2
+    result = assembly.solve([case["loads"] for case in cases])
+
+    nodes = list(result["displacements"])
+    # translation magnitude of every assembly node, (nodes, cases)
+    travel = np.stack([np.linalg.norm(result["displacements"][node][:, :3], axis=1) for node in nodes])
+    out = NDJSONSink(sys.stdout)
+    for i, case in enumerate(cases):
+        member = result["max_stress_member"][i]
+        j = int(np.argmax(travel[:, i]))
+        out.write({
+            "case": case["name"],
+            "max_stress": float(result["max_stress"][i]),
+            "max_stress_member": member,
+            "max_stress_section": int(result["members"][member]["max_stress_section"][i]),
+            "max_displacement": float(travel[j, i]),
+            "max_displacement_node": nodes[j],
+            "failed": bool(result["failed"][i]),
+        })
+    out.close()
+    return 1 if np.any(result["failed"]) else 0
+
+
+def cmd_reliability(args):
+    from reliability import ReliabilityTally, parse_chunks, run_reliability
+
+    if args.merge:
+        tally = ReliabilityTally.load(args.merge[0])
+        for path in args.merge[1:]:
+            tally.merge(ReliabilityTally.load(path))
+    elif args.spec:
+        with open(args.spec, "r", encoding="utf-8") as f:
+            spec = json.load(f)
+        beam = spec["beam"]
+        if isinstance(beam, str) and not os.path.isabs(beam):
+            beam = os.path.join(os.path.dirname(os.path.abspath(args.spec)), beam)
+        tally = run_reliability(beam, spec["variables"], spec.get("loads", {}),
+                                samples=args.samples or spec.get("samples", 1000000),
+                                seed=spec.get("seed", 0) if args.seed is None else args.seed,
+                                chunk_size=spec.get("chunk_size", 65536),
+                                chunks=parse_chunks(args.chunks) if args.chunks else None,
+                                workers=args.workers)
+    else:
+        print("Give a spec file or --merge.", file=sys.stderr)
+        return 2
+    if args.output:
+        tally.save(args.output)
+    print(json.dumps(tally.summary(), indent=2))
+    return 0
+
+
+def cmd_store(args):
+    from results import NDJSONSink
+    from store import DesignStore
+
+    with DesignStore(args.db) as store:
+        if args.action == "import":
+            added, errors = store.import_files(collect_beam_files(args.beams))
+            for path, error in errors.items():
+                print(f"{path}: {error}", file=sys.stderr)
+            print(f"{len(added)} beam(s) added or updated, {len(store)} in {args.db}", file=sys.stderr)
+            return 1 if errors else 0
+        if args.action == "prune":
+            print(f"Removed {store.prune_results()} stale result(s)", file=sys.stderr)
+            return 0
+
+        criteria = {}
+        for column in ("material", "infill_pattern", "wall_count"):
+            if getattr(args, column) is not None:
+                criteria[column] = getattr(args, column)
+        for column in ("infill_density", "width", "height", "length"):
+            if getattr(args, column) is not None:
+                criteria[column] = tuple(getattr(args, column))
+        match = "any" if args.any else "all"
+        out = NDJSONSink(sys.stdout)
+        if args.load is None:
+            for name in store.find(match, **criteria):
+                out.write({"beam": name})
+        else:
+            M, F, T, TF = args.load
+            for record in store.query({"M": M, "F": F, "T": T, "TF": TF}, max_displacement=args.max_displacement,
+                                      max_twist=args.max_twist, max_stress=args.max_stress, match=match, **criteria):
+                out.write(record)
+        out.close()
+    return 0
+
+
+def cmd_serve(args):
+    import asyncio
+
+    from service import is_loopback, serve
+
+    if not args.socket and not args.allow_remote and not is_loopback(args.host):
+        print(f"--host {args.host} is not a loopback address; the service has no authentication, "
+              "pass --allow-remote to serve it anyway.", file=sys.stderr)
+        return 1
+    where = args.socket or f"http://{args.host}:{args.port}"
+    print(f"Serving on {where}", file=sys.stderr)
+    try:
+        asyncio.run(serve(args.host, args.port, args.socket, allow_remote=args.allow_remote, workers=args.workers,
+                          batch_window=args.batch_window / 1000, max_pending=args.max_pending))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def cmd_worker(args):
+    import worker
+
+    if not args.cold:
+        worker.warm_up()
+    if args.socket:
+        print(f"Listening on {args.socket}", file=sys.stderr)
+        worker.serve_socket(args.socket)
+    else:
+        worker.serve_stream()
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Failure Analyzer for FDM beams. Runs the interactive prompt when no command is given.")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="record phase timings and allocations; PATH ending in .trace.json gets a Chrome trace, anything else a JSON report")
+    subparsers = parser.add_subparsers(dest="command")
+
+    subparsers.add_parser("interactive", help="build or load a beam through terminal prompts (default)")
+
+    analyze = subparsers.add_parser("analyze", help="analyze beam files against load cases")
+    analyze.add_argument("beams", nargs="+", help="beam JSON files or directories of them")
+    loads = analyze.add_mutually_exclusive_group()
+    loads.add_argument("--loads", help="load case file (JSON or CSV)")
+    loads.add_argument("--load", nargs=4, type=float, metavar=("M", "F", "T", "TF"), help="single load case")
+    analyze.add_argument("-o", "--output", help="results file, .ndjson, .csv or a directory for columnar .npy (default: NDJSON on stdout)")
+    analyze.add_argument("--section-output", help="per-section results file, same formats as --output")
+    analyze.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    analyze.set_defaults(func=cmd_analyze)
+
+    sweep = subparsers.add_parser("sweep", help="run a parameter sweep described by a JSON spec")
+    sweep.add_argument("spec", help='JSON file with "beam", "parameters" and "loads"')
+    sweep.add_argument("-o", "--output", required=True, help="results file, .ndjson, .csv or a directory for columnar .npy")
+    sweep.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    sweep.add_argument("--chunk-size", type=int, default=512, help="candidates per worker task")
+    sweep.set_defaults(func=cmd_sweep)
+
+    validate = subparsers.add_parser("validate", help="check beam files for missing or invalid fields")
+    validate.add_argument("beams", nargs="+", help="beam JSON files or directories of them")
+    validate.add_argument("-q", "--quiet", action="store_true", help="only report invalid beams")
+    validate.set_defaults(func=cmd_validate)
+
+    envelope = subparsers.add_parser("envelope", help="governing load case and section of every limit over a set of load cases")
+    envelope.add_argument("beam", help="beam JSON file")
+    envelope.add_argument("--loads", required=True,
+                          help='load case file (JSON or CSV); JSON may add factored "combinations" of named cases')
+    envelope.add_argument("-o", "--output", help="save the full report (JSON) here")
+    envelope.add_argument("--safety-factor", type=float, default=1.0, help="required stress must stay below strength / factor")
+    envelope.add_argument("--max-displacement", type=float, help="deflection limit in meters")
+    envelope.add_argument("--max-twist", type=float, help="twist limit in radians")
+    envelope.set_defaults(func=cmd_envelope)
+
+    assembly = subparsers.add_parser("assembly", help="solve a frame of beams joined at nodes under node loads")
+    assembly.add_argument("frame", help='JSON file with "nodes", "members", "supports" and optionally "load_cases"')
+    assembly.add_argument("--loads", help='node load cases (JSON): [{"name", "loads": {node: {"Fx", ..., "Mz"}}}]')
+    assembly.add_argument("-j", "--workers", type=int, default=None, help="threads for building element matrices (default: CPU count)")
+    assembly.set_defaults(func=cmd_assembly)
+
+    reliability = subparsers.add_parser("reliability", help="Monte Carlo failure probability under parameter scatter")
+    reliability.add_argument("spec", nargs="?", help='JSON file with "beam", "variables", "loads" and optionally "samples", "seed", "chunk_size"')
+    reliability.add_argument("-o", "--output", help="save the mergeable tally (JSON) here")
+    reliability.add_argument("--samples", type=int, help="total samples of the run (overrides the spec)")
+    reliability.add_argument("--seed", type=int, help="random seed (overrides the spec)")
+    reliability.add_argument("--chunks", metavar="A:B", help="only evaluate chunks A to B-1, for splitting a run across machines")
+    reliability.add_argument("--merge", nargs="+", metavar="TALLY", help="merge saved tallies instead of sampling")
+    reliability.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    reliability.set_defaults(func=cmd_reliability)
+
+    store = subparsers.add_parser("store", help="index beam files in a design store and query cached results")
+    store.add_argument("--db", default="designs.sqlite", help="store file (default: designs.sqlite)")
+    actions = store.add_subparsers(dest="action", required=True)
+    store_import = actions.add_parser("import", help="add or update beam files")
+    store_import.add_argument("beams", nargs="+", help="beam JSON files or directories of them")
+    store_query = actions.add_parser("query", help="list beams by section criteria, and by results with --load")
+    store_query.add_argument("--material")
+    store_query.add_argument("--infill-pattern")
+    store_query.add_argument("--wall-count", type=int)
+    for column in ("infill-density", "width", "height", "length"):
+        store_query.add_argument(f"--{column}", nargs=2, type=float, metavar=("LOW", "HIGH"))
+    store_query.add_argument("--any", action="store_true", help="one matching section is enough (default: all sections)")
+    store_query.add_argument("--load", nargs=4, type=float, metavar=("M", "F", "T", "TF"),
+                             help="load case for result limits; missing results are computed and cached")
+    store_query.add_argument("--max-displacement", type=float)
+    store_query.add_argument("--max-twist", type=float)
+    store_query.add_argument("--max-stress", type=float)
+    actions.add_parser("prune", help="drop cached results of old definitions and material versions")
+    store.set_defaults(func=cmd_store)
+
+    serve = subparsers.add_parser("serve", help="local HTTP service with request batching (loopback or unix socket only)")
+    serve.add_argument("--host", default="127.0.0.1", help="loopback address to listen on (default: 127.0.0.1)")
+    serve.add_argument("--allow-remote", action="store_true",
+                       help="allow a non-loopback --host; the service has no authentication")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--socket", metavar="PATH", help="listen on a unix socket instead of TCP")
+    serve.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    serve.add_argument("--batch-window", type=float, default=2.0, metavar="MS",
+                       help="how long to collect concurrent /analyze requests into one batch (default: 2 ms)")
+    serve.add_argument("--max-pending", type=int, default=1024, help="requests in flight before answering 503")
+    serve.set_defaults(func=cmd_serve)
+
+    worker = subparsers.add_parser("worker", help="stay running and answer NDJSON analysis jobs on stdin or a unix socket")
+    worker.add_argument("--socket", metavar="PATH", help="listen on a unix socket instead of stdin/stdout")
+    worker.add_argument("--cold", action="store_true", help="skip the warm-up analysis at startup")
+    worker.set_defaults(func=cmd_worker)
+    return parser
+
+
+def main(argv=None):
+    import instrumentation
+
+    args = build_parser().parse_args(argv)
+    if args.profile:
+        instrumentation.enable()
+    try:
+        if args.command in (None, "interactive"):
+            run_interactive()
+            return 0
+        return args.func(args)
+    finally:
+        if args.profile:
+            instrumentation.export(args.profile)
+            print(instrumentation.format_report(), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
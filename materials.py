@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import time
+from collections import namedtuple
+from threading import Lock
+
+from instrumentation import phase
+
+DEFAULT_DATABASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "materials.json")
+
+# density (kg/m^3) is optional, it is only needed for mass estimates
+Material = namedtuple("Material", ("name", "youngs_modulus", "shear_modulus", "tensile_strength", "density"),
+                      defaults=(None,))
+
+# one record per distinct material so sections built from the same entry share it
+_interned = {}
+
+
+def intern_material(name, youngs_modulus, shear_modulus, tensile_strength, density=None):
+    key = (name, youngs_modulus, shear_modulus, tensile_strength, density)
+    record = _interned.get(key)
+    if record is None:
+        record = _interned.setdefault(key, Material(*key))
+    return record
+
+
+def _record_from_entry(name, entry):
+    return intern_material(name,
+                           entry['youngs_modulus'],  # Pascals
+                           entry['shear_modulus'],  # Pascals
+                           entry['tensile_strength'],  # Pascals
+                           entry.get('density'))  # kg/m^3
+
+
+class MaterialRegistry:
+    """
+    Material database shared by every section.
+
+    Database files are parsed once and only re-read when their mtime
+    changes; the mtime itself is checked at most every `check_interval`
+    seconds. Later files override earlier ones, and materials registered
+    in memory override all files.
+    """
+
+    def __init__(self, databases=(DEFAULT_DATABASE,), check_interval=1.0):
+        self.check_interval = check_interval
+        self._databases = []
+        self._files = {}  # path -> (mtime, {name: Material})
+        self._custom = {}
+        self._merged = None
+        self._last_check = 0.0
+        self._lock = Lock()
+        for path in databases:
+            self.add_database(path)
+
+    def add_database(self, path):
+        path = os.path.abspath(path)
+        with self._lock:
+            if path not in self._databases:
+                self._databases.append(path)
+                self._merged = None
+
+    def remove_database(self, path):
+        path = os.path.abspath(path)
+        with self._lock:
+            if path in self._databases:
+                self._databases.remove(path)
+                self._files.pop(path, None)
+                self._merged = None
+
+    def register(self, name, youngs_modulus, shear_modulus, tensile_strength, density=None):
+        """Add or replace a material without touching any database file."""
+        record = intern_material(name, youngs_modulus, shear_modulus, tensile_strength, density)
+        with self._lock:
+            self._custom[name] = record
+            self._merged = None
+        return record
+
+    def unregister(self, name):
+        with self._lock:
+            if self._custom.pop(name, None) is not None:
+                self._merged = None
+
+    def _load_file(self, path):
+        # caller holds the lock
+        mtime = os.stat(path).st_mtime_ns
+        cached = self._files.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1], False
+        with phase("materials.load"):
+            with open(path, 'r') as f:
+                entries = json.load(f)
+            records = {name: _record_from_entry(name, entry) for name, entry in entries.items()}
+        self._files[path] = (mtime, records)
+        return records, True
+
+    def _materials(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._merged is None or now - self._last_check >= self.check_interval:
+                changed = self._merged is None
+                for path in self._databases:
+                    changed |= self._load_file(path)[1]
+                self._last_check = now
+                if changed:
+                    merged = {}
+                    for path in self._databases:
+                        merged.update(self._files[path][1])
+                    merged.update(self._custom)
+                    self._merged = merged
+            return self._merged
+
+    def get(self, name, database=None):
+        """
+        Return the interned record for a material.
+
+        With `database`, only that file is searched (it does not need to be
+        registered). Raises ValueError for unknown materials.
+        """
+        if database is None:
+            materials = self._materials()
+        else:
+            path = os.path.abspath(database)
+            with self._lock:
+                materials, changed = self._load_file(path)
+                if changed and path in self._databases:
+                    self._merged = None
+        if name in materials:
+            return materials[name]
+        raise ValueError(f"Material '{name}' not found in database.")
+
+    def names(self):
+        return sorted(self._materials())
+
+    def version(self, names=None):
+        """
+        Short content hash of the material records (all of them, or only
+        `names`), for keying cached results: it changes whenever one of
+        those records is edited, added or removed.
+        """
+        materials = self._materials()
+        digest = hashlib.sha256()
+        for name in sorted(materials if names is None else names):
+            digest.update(repr(materials.get(name)).encode("utf-8"))
+        return digest.hexdigest()[:16]
+
+    def __contains__(self, name):
+        return name in self._materials()
+
+
+registry = MaterialRegistry()
+
+
+def get_material(name, database=None):
+    return registry.get(name, database)
+
+
+def register_material(name, youngs_modulus, shear_modulus, tensile_strength, density=None):
+    return registry.register(name, youngs_modulus, shear_modulus, tensile_strength, density)
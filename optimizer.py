@@ -0,0 +1,379 @@
+import itertools
+from types import SimpleNamespace
+
+import numpy as np
+
+from beam import Beam, analyze_sections
+from cache import LRUCache
+from infill import core_ratios
+from loading import compute_section_properties
+from sweep import apply_parameters
+from torsion import core_dimensions
+
+CONTINUOUS_FIELDS = ("infill_density", "width", "height", "line_width")
+DISCRETE_FIELDS = ("wall_count", "material", "infill_pattern")
+
+# volumetric flow rate used for print time estimates, m^3/s (about 12 mm^3/s)
+DEFAULT_FLOW_RATE = 12e-9
+
+
+class DesignProblem:
+    """
+    Minimum-mass (or print time) layout of a beam under a load envelope.
+
+    Parameters:
+    - beam_data: base beam definition in the beams/<name>.json layout
+    - variables: {field: (low, high)} for continuous fields (infill_density,
+      width, height, line_width) or {field: [choices]} for discrete ones
+      (wall_count, material, infill_pattern, or any continuous field); a
+      variable applies to every section, like a sweep parameter
+    - load_cases: list of {"M", "F", "T", "TF"} cases the design must carry
+    - max_displacement, max_twist: limits on the tip values (None = no limit)
+    - safety_factor: required stress must stay below tensile_strength / safety_factor
+    - objective: "mass" (kg, needs material densities) or "print_time" (s)
+    - tolerance: relative constraint violation still counted as feasible
+
+    Evaluations are cached on the design values, so repeated designs cost
+    a dictionary lookup.
+    """
+
+    def __init__(self, beam_data, variables, load_cases, max_displacement=None, max_twist=None,
+                 safety_factor=1.0, objective="mass", flow_rate=DEFAULT_FLOW_RATE, tolerance=1e-6,
+                 cache_size=100000):
+        if objective not in ("mass", "print_time"):
+            raise ValueError(f"Unknown objective '{objective}'.")
+        self.beam_data = beam_data
+        self.continuous = {}
+        self.discrete = {}
+        for name, spec in variables.items():
+            if isinstance(spec, tuple):
+                if name not in CONTINUOUS_FIELDS:
+                    raise ValueError(f"'{name}' can only take a list of choices.")
+                self.continuous[name] = (float(spec[0]), float(spec[1]))
+            else:
+                self.discrete[name] = list(spec)
+        self.loads = {key: np.array([case.get(key, 0.0) for case in load_cases], dtype=float)[np.newaxis]
+                      for key in ("M", "F", "T", "TF")}
+        self.max_displacement = max_displacement
+        self.max_twist = max_twist
+        self.safety_factor = safety_factor
+        self.tolerance = tolerance
+        self.objective = objective
+        self.flow_rate = flow_rate
+        self.evaluations = 0
+        self._cache = LRUCache(cache_size)
+
+    def _key(self, design):
+        return tuple((name, round(v, 12) if isinstance(v, float) else v) for name, v in sorted(design.items()))
+
+    def _sections(self, designs):
+        # one section-like namespace per section position, fields are (designs, 1) arrays
+        beams = [Beam.from_dict(apply_parameters(self.beam_data, design)) for design in designs]
+        namespaces = []
+        for j in range(len(beams[0].sections)):
+            column = [beam.sections[j] for beam in beams]
+            fields = {}
+            for name in ("length", "width", "height", "wall_thickness", "line_width", "infill_density",
+                         "E_shell", "G_shell", "tensile_strength"):
+                fields[name] = np.array([getattr(s, name) for s in column], dtype=float)[:, np.newaxis]
+            fields["density"] = np.array([s.material_properties.density or np.nan for s in column])[:, np.newaxis]
+            fields["infill_pattern"] = [s.infill_pattern for s in column]
+            namespaces.append(SimpleNamespace(**fields))
+        return namespaces
+
+    def _volume_and_mass(self, sections):
+        volume = 0.0
+        mass = 0.0
+        for s in sections:
+            v = s.length * _material_area(s)
+            volume = volume + v
+            mass = mass + s.density * v
+        return volume[:, 0], mass[:, 0]
+
+    def evaluate(self, designs):
+        """
+        Evaluate a batch of designs (dicts of variable values).
+
+        Returns:
+        - list of dicts with "objective", "displacement", "twist" (worst case
+          magnitudes), "stress_ratio", "displacement_ratio", "twist_ratio"
+          and "feasible"
+        """
+        keys = [self._key(d) for d in designs]
+        results = [self._cache.get(k) for k in keys]
+        missing = [i for i, r in enumerate(results) if r is None]
+        if missing:
+            for i, result in zip(missing, self._evaluate([designs[i] for i in missing])):
+                self._cache.put(keys[i], result)
+                results[i] = result
+        return results
+
+    def _evaluate(self, designs):
+        self.evaluations += len(designs)
+        sections = self._sections(designs)
+        r = analyze_sections(sections, self.loads["M"], self.loads["F"], self.loads["T"], self.loads["TF"])
+        displacement = np.max(np.abs(r["displacement"]), axis=-1)
+        twist = np.max(np.abs(r["twist"]), axis=-1)
+        allowable = np.stack([s.tensile_strength for s in sections]) / self.safety_factor
+        stress_ratio = np.max(r["section_stress"] / allowable, axis=(0, 2))
+        displacement_ratio = displacement / self.max_displacement if self.max_displacement else np.zeros(len(designs))
+        twist_ratio = twist / self.max_twist if self.max_twist else np.zeros(len(designs))
+        volume, mass = self._volume_and_mass(sections)
+        if self.objective == "mass":
+            if np.any(np.isnan(mass)):
+                raise ValueError("Mass objective needs a density for every material.")
+            objective = mass
+        else:
+            objective = volume / self.flow_rate
+
+        results = []
+        for i in range(len(designs)):
+            worst = max(stress_ratio[i], displacement_ratio[i], twist_ratio[i])
+            results.append({
+                "objective": float(objective[i]),
+                "displacement": float(displacement[i]),
+                "twist": float(twist[i]),
+                "stress_ratio": float(stress_ratio[i]),
+                "displacement_ratio": float(displacement_ratio[i]),
+                "twist_ratio": float(twist_ratio[i]),
+                "feasible": bool(worst <= 1.0 + self.tolerance),
+            })
+        return results
+
+    def gradients(self, design):
+        """
+        Analytic gradients with respect to the continuous variables.
+
+        Returns:
+        - {"objective": {var: d/dvar}, "displacement": {...}, "twist": {...}}
+
+        Every section's share of the tip displacement scales with 1/EI and
+        its share of the twist with 1/GJ, so their derivatives follow from
+        dI/dvar and dJ/dvar of the composite section. The governing load
+        case is held fixed.
+        """
+        sections = self._sections([design])
+        r = analyze_sections(sections, self.loads["M"], self.loads["F"], self.loads["T"], self.loads["TF"])
+        case_d = int(np.argmax(np.abs(r["displacement"][0])))
+        case_t = int(np.argmax(np.abs(r["twist"][0])))
+        sign_d = np.sign(r["displacement"][0, case_d])
+        sign_t = np.sign(r["twist"][0, case_t])
+        per_volume = 1.0 if self.objective == "mass" else 1.0 / self.flow_rate
+
+        grads = {"objective": {}, "displacement": {}, "twist": {}}
+        for name in self.continuous:
+            d_obj = d_disp = d_twist = 0.0
+            for j, s in enumerate(sections):
+                dI, dJ, dA = _property_derivatives(s, name)
+                p = compute_section_properties(s)
+                weight = s.density if self.objective == "mass" else 1.0
+                d_obj += (weight * s.length * dA).item() * per_volume
+                d_disp -= (r["section_displacement"][j][0, case_d] * dI / p.I_composite).item()
+                d_twist -= (r["section_twist"][j][0, case_t] * dJ / p.J).item()
+            grads["objective"][name] = d_obj
+            grads["displacement"][name] = sign_d * d_disp
+            grads["twist"][name] = sign_t * d_twist
+        return grads
+
+
+def _material_area(s):
+    # printed cross-section: the shell plus the infill core at its density
+    bc, hc = core_dimensions(s.width, s.height, s.wall_thickness)
+    return s.width * s.height - (1 - s.infill_density / 100) * bc * hc
+
+
+def _core_slopes(s, name):
+    # derivatives of the core E and G ratios, by central differences of the infill tables
+    if name == "infill_density":
+        step, low, high = 1e-3, 0.0, 100.0
+    elif name == "line_width":
+        step, low, high = 1e-8, 0.0, np.inf
+    else:
+        return 0.0, 0.0
+    value = getattr(s, name)
+    lower = np.maximum(value - step, low)
+    upper = np.minimum(value + step, high)
+    ratios = []
+    for v in (lower, upper):
+        fields = {"infill_density": s.infill_density, "line_width": s.line_width, name: v}
+        ratios.append(core_ratios(s.infill_pattern, fields["infill_density"], fields["line_width"]))
+    return ((ratios[1].E - ratios[0].E) / (upper - lower),
+            (ratios[1].G - ratios[0].G) / (upper - lower))
+
+
+def _property_derivatives(s, name):
+    # derivatives of (I_composite, J, printed area) of a composite section
+    b, h, t = s.width, s.height, s.wall_thickness
+    n = s.infill_density / 100
+    core = core_ratios(s.infill_pattern, s.infill_density, s.line_width)
+    bc, hc = core_dimensions(b, h, t)
+    dE, dG = _core_slopes(s, name)
+
+    def polar(b, h):
+        return b * h * (b**2 + h**2) / 12
+
+    def polar_db(b, h):
+        return (3 * b**2 * h + h**3) / 12
+
+    def polar_dh(b, h):
+        return (b**3 + 3 * b * h**2) / 12
+
+    if name == "infill_density":
+        return bc * hc**3 / 12 * dE, polar(bc, hc) * dG, bc * hc / 100
+    if name == "width":
+        return ((h**3 - (1 - core.E) * hc**3) / 12,
+                polar_db(b, h) - (1 - core.G) * polar_db(bc, hc),
+                h - (1 - n) * hc)
+    if name == "height":
+        return ((b * h**2 - (1 - core.E) * bc * hc**2) / 4,
+                polar_dh(b, h) - (1 - core.G) * polar_dh(bc, hc),
+                b - (1 - n) * bc)
+    if name == "line_width":
+        # the wall thickness moves the core boundary: t = wall_count * line_width,
+        # and the line width changes the core ratios themselves
+        dt = t / s.line_width if getattr(s, "line_width", None) else 0.0
+        dI = (1 - core.E) * (2 * hc**3 + 6 * bc * hc**2) / 12 * dt + bc * hc**3 / 12 * dE
+        dJ = (1 - core.G) * 2 * (polar_db(bc, hc) + polar_dh(bc, hc)) * dt + polar(bc, hc) * dG
+        dA = (1 - n) * 2 * (hc + bc) * dt
+        return dI, dJ, dA
+    raise ValueError(f"No analytic derivative for '{name}'.")
+
+
+def _discrete_combinations(problem):
+    names = list(problem.discrete)
+    for values in itertools.product(*(problem.discrete[n] for n in names)):
+        yield dict(zip(names, values))
+
+
+def _best(designs, results):
+    best = None
+    for design, result in zip(designs, results):
+        if result["feasible"] and (best is None or result["objective"] < best[1]["objective"]):
+            best = (design, result)
+    return best
+
+
+def grid_search(problem, resolution=11, batch_size=4096):
+    """Evaluate every combination on a grid of `resolution` points per continuous variable."""
+    axes = {name: np.linspace(low, high, resolution).tolist() for name, (low, high) in problem.continuous.items()}
+    names = list(axes)
+    best = None
+    candidates = (dict(fixed, **dict(zip(names, values)))
+                  for fixed in _discrete_combinations(problem)
+                  for values in itertools.product(*(axes[n] for n in names)))
+    while True:
+        batch = list(itertools.islice(candidates, batch_size))
+        if not batch:
+            return best
+        found = _best(batch, problem.evaluate(batch))
+        if found and (best is None or found[1]["objective"] < best[1]["objective"]):
+            best = found
+
+
+def pattern_search(problem, start=None, step=0.25, min_step=1e-4, max_iterations=500):
+    """
+    Gradient-free compass search on the continuous variables, run for every
+    combination of the discrete ones.
+
+    Steps are fractions of each variable's range; all poll points of an
+    iteration are evaluated as one batch. Infeasible points are ranked by
+    their worst constraint ratio, so the search can start infeasible.
+    """
+    names = list(problem.continuous)
+    lows = np.array([problem.continuous[n][0] for n in names])
+    highs = np.array([problem.continuous[n][1] for n in names])
+
+    def score(result):
+        worst = max(result["stress_ratio"], result["displacement_ratio"], result["twist_ratio"])
+        return (0, result["objective"]) if result["feasible"] else (1, worst)
+
+    best = None
+    for fixed in _discrete_combinations(problem):
+        # start from the stiffest corner unless told otherwise
+        x = highs.copy() if start is None else np.array([start[n] for n in names], dtype=float)
+        current = problem.evaluate([dict(fixed, **dict(zip(names, x.tolist())))])[0]
+        size = step
+        for _ in range(max_iterations):
+            if size < min_step or not names:
+                break
+            polls = []
+            for k in range(len(names)):
+                for direction in (-1.0, 1.0):
+                    y = x.copy()
+                    y[k] = np.clip(y[k] + direction * size * (highs[k] - lows[k]), lows[k], highs[k])
+                    polls.append(y)
+            results = problem.evaluate([dict(fixed, **dict(zip(names, y.tolist()))) for y in polls])
+            k = min(range(len(polls)), key=lambda i: score(results[i]))
+            if score(results[k]) < score(current):
+                x, current = polls[k], results[k]
+            else:
+                size /= 2
+        design = dict(fixed, **dict(zip(names, x.tolist())))
+        if current["feasible"] and (best is None or current["objective"] < best[1]["objective"]):
+            best = (design, current)
+    return best
+
+
+def gradient_search(problem, max_iterations=100):
+    """
+    SLSQP on the continuous variables with analytic gradients of the
+    objective, tip displacement and twist (stress gradients are estimated
+    by SciPy), run for every combination of the discrete ones.
+    """
+    from scipy.optimize import minimize
+
+    names = list(problem.continuous)
+    if not names:
+        return grid_search(problem)
+    lows = np.array([problem.continuous[n][0] for n in names])
+    span = np.array([problem.continuous[n][1] for n in names]) - lows
+
+    best = None
+    for fixed in _discrete_combinations(problem):
+        # work on variables scaled to [0, 1]
+        def design(u):
+            return dict(fixed, **dict(zip(names, (lows + span * np.clip(u, 0, 1)).tolist())))
+
+        def result(u):
+            return problem.evaluate([design(u)])[0]
+
+        def gradient(u, key):
+            g = problem.gradients(design(u))[key]
+            return np.array([g[n] for n in names]) * span
+
+        constraints = [{"type": "ineq", "fun": lambda u: 1.0 - result(u)["stress_ratio"]}]
+        if problem.max_displacement:
+            constraints.append({"type": "ineq", "fun": lambda u: 1.0 - result(u)["displacement_ratio"],
+                                "jac": lambda u: -gradient(u, "displacement") / problem.max_displacement})
+        if problem.max_twist:
+            constraints.append({"type": "ineq", "fun": lambda u: 1.0 - result(u)["twist_ratio"],
+                                "jac": lambda u: -gradient(u, "twist") / problem.max_twist})
+
+        scale = max(result(np.ones(len(names)))["objective"], 1e-300)
+        solution = minimize(lambda u: result(u)["objective"] / scale, np.ones(len(names)),
+                            jac=lambda u: gradient(u, "objective") / scale,
+                            bounds=[(0.0, 1.0)] * len(names), constraints=constraints,
+                            method="SLSQP", options={"maxiter": max_iterations})
+        candidate = design(solution.x)
+        outcome = result(solution.x)
+        if outcome["feasible"] and (best is None or outcome["objective"] < best[1]["objective"]):
+            best = (candidate, outcome)
+    return best
+
+
+METHODS = {"grid": grid_search, "pattern": pattern_search, "gradient": gradient_search}
+
+
+def optimize(problem, method="pattern", **options):
+    """
+    Run one of the search methods ("grid", "pattern", "gradient").
+
+    Returns:
+    - {"design", "result", "evaluations", "cache"} with design/result None
+      when no feasible design was found
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown optimization method '{method}'.")
+    best = METHODS[method](problem, **options)
+    design, result = best if best is not None else (None, None)
+    return {"design": design, "result": result, "evaluations": problem.evaluations, "cache": problem._cache.info()}
@@ -0,0 +1,364 @@
+import json
+import math
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from types import SimpleNamespace
+
+import numpy as np
+
+from beam import Beam, analyze_sections
+from loadcases import LOAD_COMPONENTS, normalize_load_case
+from loading import core_strength_ratio
+
+GEOMETRY_FIELDS = ("length", "width", "height", "infill_density", "line_width")
+# material properties map onto the section attributes the kernels read
+MATERIAL_FIELDS = {"youngs_modulus": "E_shell", "shear_modulus": "G_shell", "tensile_strength": "material_strength"}
+
+# per-process state set up once by the pool initializer
+_worker = {}
+
+
+class LogHistogram:
+    """
+    Histogram of magnitudes over log-spaced bins, mergeable by adding counts.
+
+    Bin 0 collects values below `low` (including zeros), the last bin
+    values above `high`. Quantiles are interpolated geometrically inside
+    a bin, so with 100 bins per decade they are accurate to well under 1%.
+    """
+
+    def __init__(self, low=1e-12, high=1e3, bins_per_decade=100, counts=None):
+        self.low = low
+        self.high = high
+        self.bins_per_decade = bins_per_decade
+        self.bins = int(round(math.log10(high / low) * bins_per_decade))
+        self.counts = np.zeros(self.bins + 2, dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+
+    def add(self, values):
+        values = np.abs(np.asarray(values, dtype=float)).ravel()
+        with np.errstate(divide="ignore"):
+            index = np.floor(np.log10(values / self.low) * self.bins_per_decade) + 1
+        index = np.clip(np.nan_to_num(index, nan=0, neginf=0, posinf=self.bins + 1), 0, self.bins + 1)
+        self.counts += np.bincount(index.astype(np.intp), minlength=self.bins + 2)
+
+    def merge(self, other):
+        if (self.low, self.high, self.bins_per_decade) != (other.low, other.high, other.bins_per_decade):
+            raise ValueError("Histograms have different bins.")
+        self.counts += other.counts
+
+    @property
+    def total(self):
+        return int(self.counts.sum())
+
+    def quantile(self, q):
+        total = self.total
+        if total == 0:
+            return math.nan
+        cumulative = np.cumsum(self.counts)
+        target = q * total
+        i = int(np.searchsorted(cumulative, target, side="left"))
+        if i == 0:
+            return 0.0 if self.counts[0] else self.low
+        if i > self.bins:
+            return math.inf
+        # fraction of the way through bin i, interpolated on a log scale
+        before = cumulative[i - 1]
+        fraction = (target - before) / self.counts[i] if self.counts[i] else 0.0
+        return self.low * 10 ** ((i - 1 + fraction) / self.bins_per_decade)
+
+    def to_dict(self):
+        nonzero = np.flatnonzero(self.counts)
+        return {"low": self.low, "high": self.high, "bins_per_decade": self.bins_per_decade,
+                "counts": {int(i): int(self.counts[i]) for i in nonzero}}
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(data["low"], data["high"], data["bins_per_decade"])
+        for i, count in data["counts"].items():
+            histogram.counts[int(i)] = count
+        return histogram
+
+
+class ReliabilityTally:
+    """
+    Mergeable summary of evaluated samples.
+
+    Keeps the failure counts, log histograms of tip displacement, twist
+    and stress ratio (required stress / tensile strength), and running
+    moments. Chunks are numbered, so partial runs on different machines
+    can be merged as long as they cover different chunks.
+    """
+
+    QUANTITIES = ("displacement", "twist", "stress_ratio")
+
+    def __init__(self, seed=0, chunk_size=65536, n_sections=0):
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.samples = 0
+        self.failures = 0
+        self.section_failures = np.zeros(n_sections, dtype=np.int64)
+        self.chunks = set()
+        self.histograms = {name: LogHistogram() for name in self.QUANTITIES}
+        # sum, sum of squares, min, max
+        self.moments = {name: [0.0, 0.0, math.inf, -math.inf] for name in self.QUANTITIES}
+
+    def add(self, chunk, values, failed, section_failed):
+        self.chunks.add(chunk)
+        self.samples += failed.size
+        self.failures += int(failed.sum())
+        self.section_failures += section_failed.sum(axis=1)
+        for name in self.QUANTITIES:
+            v = values[name]
+            self.histograms[name].add(v)
+            m = self.moments[name]
+            m[0] += float(v.sum())
+            m[1] += float((v * v).sum())
+            m[2] = min(m[2], float(v.min()))
+            m[3] = max(m[3], float(v.max()))
+
+    def merge(self, other):
+        if (self.seed, self.chunk_size) != (other.seed, other.chunk_size):
+            raise ValueError("Can only merge runs with the same seed and chunk size.")
+        overlap = self.chunks & other.chunks
+        if overlap:
+            raise ValueError(f"Runs share {len(overlap)} chunk(s), merging would count samples twice.")
+        if self.section_failures.size == 0:
+            self.section_failures = np.zeros_like(other.section_failures)
+        self.chunks |= other.chunks
+        self.samples += other.samples
+        self.failures += other.failures
+        self.section_failures += other.section_failures
+        for name in self.QUANTITIES:
+            self.histograms[name].merge(other.histograms[name])
+            a, b = self.moments[name], other.moments[name]
+            self.moments[name] = [a[0] + b[0], a[1] + b[1], min(a[2], b[2]), max(a[3], b[3])]
+        return self
+
+    def failure_probability(self, z=1.96):
+        """(estimate, low, high) with a Wilson score interval, 95% by default."""
+        n = self.samples
+        if n == 0:
+            return math.nan, 0.0, 1.0
+        p = self.failures / n
+        center = (p + z * z / (2 * n)) / (1 + z * z / n)
+        half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+        return p, max(0.0, center - half), min(1.0, center + half)
+
+    def summary(self, percentiles=(1, 5, 50, 95, 99, 99.9)):
+        p, low, high = self.failure_probability()
+        result = {"samples": self.samples, "failures": self.failures,
+                  "failure_probability": p, "failure_probability_95": [low, high],
+                  "section_failure_probability": (self.section_failures / max(self.samples, 1)).tolist(),
+                  "chunks": len(self.chunks)}
+        for name in self.QUANTITIES:
+            total, squares, lowest, highest = self.moments[name]
+            mean = total / self.samples if self.samples else math.nan
+            std = math.sqrt(max(squares / self.samples - mean * mean, 0.0)) if self.samples else math.nan
+            result[name] = {"mean": mean, "std": std, "min": lowest, "max": highest,
+                            "percentiles": {str(q): self.histograms[name].quantile(q / 100) for q in percentiles}}
+        return result
+
+    def to_dict(self):
+        return {"seed": self.seed, "chunk_size": self.chunk_size, "samples": self.samples,
+                "failures": self.failures, "section_failures": self.section_failures.tolist(),
+                "chunks": sorted(self.chunks),
+                "histograms": {name: h.to_dict() for name, h in self.histograms.items()},
+                "moments": self.moments}
+
+    @classmethod
+    def from_dict(cls, data):
+        tally = cls(data["seed"], data["chunk_size"], len(data["section_failures"]))
+        tally.samples = data["samples"]
+        tally.failures = data["failures"]
+        tally.section_failures = np.asarray(data["section_failures"], dtype=np.int64)
+        tally.chunks = set(data["chunks"])
+        tally.histograms = {name: LogHistogram.from_dict(h) for name, h in data["histograms"].items()}
+        tally.moments = {name: list(m) for name, m in data["moments"].items()}
+        return tally
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+def _draw(rng, spec, size):
+    """
+    Sample one variable.
+
+    Specs: {"dist": "normal", "std" | "cov"}, {"dist": "lognormal", "cov"},
+    {"dist": "uniform", "low", "high"} or {"dist": "uniform", "spread"}.
+    Without "mean" (or low/high) the draw is a factor around 1 applied to
+    the nominal value; "min"/"max" clip the final value.
+
+    Returns:
+    - (values, relative)
+    """
+    dist = spec.get("dist", "normal")
+    relative = "mean" not in spec and "low" not in spec
+    mean = 1.0 if relative else spec.get("mean")
+    if dist == "normal":
+        std = spec["std"] if "std" in spec else spec["cov"] * mean
+        values = rng.normal(mean, std, size)
+    elif dist == "lognormal":
+        sigma = math.sqrt(math.log1p(spec["cov"] ** 2))
+        values = rng.lognormal(math.log(mean) - sigma * sigma / 2, sigma, size)
+    elif dist == "uniform":
+        if relative:
+            low, high = 1.0 - spec["spread"], 1.0 + spec["spread"]
+        else:
+            low, high = spec["low"], spec["high"]
+        values = rng.uniform(low, high, size)
+    else:
+        raise ValueError(f"Unknown distribution '{dist}'.")
+    return values, relative
+
+
+def _targets(name, n_sections):
+    # (field, section indices) a variable name applies to
+    if name.startswith("sections."):
+        _, index, field = name.split(".", 2)
+        sections = [int(index)]
+    else:
+        field, sections = name, range(n_sections)
+    if field not in GEOMETRY_FIELDS and field not in MATERIAL_FIELDS:
+        raise ValueError(f"Cannot sample '{name}'.")
+    return MATERIAL_FIELDS.get(field, field), sections
+
+
+def sample_sections(beam, variables, rng, size):
+    """
+    Section-like namespaces with (size, 1) arrays of sampled fields.
+
+    Every variable is drawn once per sample and applied to all sections
+    (or to one with "sections.<i>.<field>"), like a sweep parameter.
+    """
+    fields = ("length", "width", "height", "infill_density", "line_width", "wall_count", "E_shell", "G_shell")
+    sampled = [dict({name: np.full((size, 1), float(getattr(s, name))) for name in fields},
+                    material_strength=np.full((size, 1), float(s.material_properties.tensile_strength)))
+               for s in beam.sections]
+    for name, spec in variables.items():
+        field, indices = _targets(name, len(beam.sections))
+        values, relative = _draw(rng, spec, size)
+        for i in indices:
+            column = sampled[i][field][:, 0]
+            column[:] = column * values if relative else values
+            if "min" in spec or "max" in spec:
+                np.clip(column, spec.get("min", -np.inf), spec.get("max", np.inf), out=column)
+    namespaces = []
+    for s, values in zip(beam.sections, sampled):
+        values["wall_thickness"] = values["wall_count"] * values["line_width"]
+        section = SimpleNamespace(infill_pattern=s.infill_pattern, **values)
+        # the allowable stress follows the sampled infill, see `loading.core_strength_ratio`
+        section.tensile_strength = section.material_strength * core_strength_ratio(section)
+        namespaces.append(section)
+    return namespaces
+
+
+def evaluate_chunk(beam, variables, cases, seed, chunk, chunk_size, samples):
+    """
+    Sample and evaluate one chunk of a run of `samples` samples. The
+    chunk's random stream only depends on (seed, chunk), so results do
+    not depend on how chunks are spread over processes or machines.
+
+    Returns:
+    - ReliabilityTally for this chunk
+    """
+    size = min(chunk_size, samples - chunk * chunk_size)
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(chunk,)))
+    sections = sample_sections(beam, variables, rng, size)
+    loads = [np.array([[case[key] for case in cases]]) for key in LOAD_COMPONENTS]
+    r = analyze_sections(sections, *loads)
+    strength = np.stack([s.tensile_strength for s in sections])
+    ratio = r["section_stress"] / strength  # (sections, size, cases)
+    section_failed = np.any(ratio > 1.0, axis=2)
+    values = {"displacement": np.max(np.abs(r["displacement"]), axis=1),
+              "twist": np.max(np.abs(r["twist"]), axis=1),
+              "stress_ratio": np.max(ratio, axis=(0, 2))}
+    tally = ReliabilityTally(seed, chunk_size, len(sections))
+    tally.add(chunk, values, np.any(section_failed, axis=0), section_failed)
+    return tally
+
+
+def _init_worker(beam_data, variables, cases, seed, chunk_size, samples):
+    _worker["beam"] = Beam.from_dict(beam_data)
+    _worker["args"] = (variables, cases, seed)
+    _worker["run"] = (chunk_size, samples)
+
+
+def _evaluate(chunk):
+    return evaluate_chunk(_worker["beam"], *_worker["args"], chunk, *_worker["run"])
+
+
+def run_reliability(beam_data, variables, loads, samples=1000000, seed=0, chunk_size=65536,
+                    chunks=None, workers=None, max_pending=None):
+    """
+    Monte Carlo estimate of the failure probability under parameter scatter.
+
+    Parameters:
+    - beam_data: nominal beam definition (beams/<name>.json layout) or a path to one
+    - variables: {field: distribution spec}, see `_draw`; fields are
+      length, width, height, infill_density, line_width, youngs_modulus,
+      shear_modulus and tensile_strength, or "sections.<i>.<field>"
+    - loads: one {"M", "F", "T", "TF"} case or a list; a sample fails when
+      the required stress exceeds the sampled tensile strength of any
+      section in any case
+    - samples: total samples of the run, split into chunks of `chunk_size`
+    - chunks: chunk indices to evaluate (default: all); use disjoint ranges
+      on different machines and `ReliabilityTally.merge` the results
+    - workers: processes (default: CPU count), 1 evaluates in this process
+    - max_pending: chunks in flight at once (default: 2 per worker)
+
+    Returns:
+    - ReliabilityTally
+    """
+    if isinstance(beam_data, (str, os.PathLike)):
+        with open(beam_data, "r", encoding="utf-8") as f:
+            beam_data = json.load(f)
+    if isinstance(loads, dict):
+        loads = [loads]
+    cases = [normalize_load_case(case, i) for i, case in enumerate(loads)]
+    n_chunks = -(-samples // chunk_size)
+    chunks = list(range(n_chunks) if chunks is None else chunks)
+    if any(not 0 <= c < n_chunks for c in chunks):
+        raise ValueError(f"Chunks must lie between 0 and {n_chunks - 1}.")
+    initargs = (beam_data, variables, cases, seed, chunk_size, samples)
+
+    tally = ReliabilityTally(seed, chunk_size)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        _init_worker(*initargs)
+        for chunk in chunks:
+            tally.merge(_evaluate(chunk))
+        return tally
+
+    max_pending = max_pending or 2 * workers
+    remaining = iter(chunks)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+        pending = set()
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < max_pending:
+                chunk = next(remaining, None)
+                if chunk is None:
+                    exhausted = True
+                    break
+                pending.add(pool.submit(_evaluate, chunk))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                tally.merge(future.result())
+    return tally
+
+
+def parse_chunks(text):
+    # "A:B" -> range(A, B), "A" -> [A]
+    if ":" in text:
+        start, stop = text.split(":", 1)
+        return range(int(start), int(stop))
+    return [int(text)]
@@ -0,0 +1,295 @@
+import csv
+import json
+import math
+import os
+
+# every .npy header written by ColumnarSink is padded to this size so the
+# final shape can be patched in place when the sink is closed
+_NPY_HEADER_SIZE = 128
+_MANIFEST = "columns.json"
+
+
+class NDJSONSink:
+    """Write one JSON object per line as records arrive, to a path or an open text stream."""
+
+    def __init__(self, path):
+        self.path = path
+        self._owns_file = not hasattr(path, "write")
+        self._file = open(path, "w", encoding="utf-8") if self._owns_file else path
+        self.rows = 0
+
+    def write(self, record):
+        self._file.write(json.dumps(_plain(record)) + "\n")
+        self.rows += 1
+
+    def write_columns(self, columns):
+        for record in _rows(columns):
+            self.write(record)
+
+    def close(self):
+        if self._owns_file and not self._file.closed:
+            self._file.close()
+        else:
+            self._file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CSVSink:
+    """
+    Write records as CSV rows.
+
+    The header comes from `fieldnames`, or from the keys of the first
+    record. Keys missing from a record are left blank, unknown keys are
+    dropped.
+    """
+
+    def __init__(self, path, fieldnames=None):
+        self.path = path
+        self.fieldnames = list(fieldnames) if fieldnames is not None else None
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = None
+        self.rows = 0
+
+    def write(self, record):
+        if self._writer is None:
+            if self.fieldnames is None:
+                self.fieldnames = list(record)
+            self._writer = csv.DictWriter(self._file, self.fieldnames, restval="", extrasaction="ignore")
+            self._writer.writeheader()
+        self._writer.writerow({k: ("" if v is None else v) for k, v in _plain(record).items()})
+        self.rows += 1
+
+    def write_columns(self, columns):
+        for record in _rows(columns):
+            self.write(record)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ColumnarSink:
+    """
+    Write each field to its own `.npy` file inside a directory.
+
+    Rows are buffered up to `buffer_size` and appended to the column files,
+    so memory stays bounded however many rows are written. On close the
+    .npy headers are patched with the final length, which lets
+    `read_columns` memory-map every column without copying.
+
+    With a `schema` ({name: "float", "int", "bool" or "str"}) the columns
+    and their types are fixed up front; without one they are inferred from
+    the first record. Writing a field that has no column raises ValueError.
+    String fields are stored as int32 codes with the labels in the
+    `columns.json` manifest. Missing values become NaN for float columns
+    and -1 for integer and string columns.
+    """
+
+    def __init__(self, path, buffer_size=65536, schema=None):
+        import numpy as np
+
+        self._np = np
+        self.path = path
+        self.buffer_size = buffer_size
+        self.schema = dict(schema or {})
+        os.makedirs(path, exist_ok=True)
+        self.rows = 0
+        self._columns = None  # name -> {"dtype", "file", "labels"}
+        self._buffer = []
+
+    def _open_columns(self, sample):
+        np = self._np
+        self._columns = {}
+        kinds = dict(self.schema) if self.schema else {name: _infer_kind(value) for name, value in sample.items()}
+        for name, kind in kinds.items():
+            labels = {} if kind == "str" else None
+            dtype = np.dtype(_KIND_DTYPES[kind])
+            f = open(os.path.join(self.path, f"{name}.npy"), "wb")
+            f.write(_npy_header(dtype, 0))
+            self._columns[name] = {"dtype": dtype, "file": f, "labels": labels}
+
+    def _encode(self, name, value):
+        column = self._columns[name]
+        if column["labels"] is not None:
+            if value is None:
+                return -1
+            return column["labels"].setdefault(str(value), len(column["labels"]))
+        if value is None:
+            return {"f": math.nan, "b": False}.get(column["dtype"].kind, -1)
+        return value
+
+    def _check_fields(self, names):
+        unknown = [name for name in names if name not in self._columns]
+        if unknown:
+            raise ValueError(f"No column for field(s) {', '.join(map(repr, unknown))} in {self.path}.")
+
+    def write(self, record):
+        if self._columns is None:
+            self._open_columns(record)
+        self._check_fields(record)
+        self._buffer.append(record)
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def write_columns(self, columns):
+        """Append whole arrays at once (all columns of equal length)."""
+        np = self._np
+        if self._columns is None:
+            self._open_columns({k: (v[0] if len(v) else 0.0) for k, v in columns.items()})
+        self._check_fields(columns)
+        self.flush()
+        n = None
+        for name, column in self._columns.items():
+            values = columns.get(name)
+            if column["labels"] is not None:
+                values = np.array([self._encode(name, v) for v in values], dtype=np.int32)
+            else:
+                values = np.asarray(values, dtype=column["dtype"])
+            n = len(values) if n is None else n
+            if len(values) != n:
+                raise ValueError("All columns must have the same length.")
+            column["file"].write(np.ascontiguousarray(values).tobytes())
+        self.rows += n or 0
+
+    def flush(self):
+        if not self._buffer:
+            return
+        np = self._np
+        for name, column in self._columns.items():
+            values = np.array([self._encode(name, r.get(name)) for r in self._buffer], dtype=column["dtype"])
+            column["file"].write(values.tobytes())
+        self.rows += len(self._buffer)
+        self._buffer = []
+
+    def close(self):
+        if self._columns is None:
+            self._columns = {}
+        self.flush()
+        manifest = {"rows": self.rows, "columns": {}}
+        for name, column in self._columns.items():
+            f = column["file"]
+            if not f.closed:
+                f.seek(0)
+                f.write(_npy_header(column["dtype"], self.rows))
+                f.close()
+            entry = {"dtype": column["dtype"].str}
+            if column["labels"] is not None:
+                entry["labels"] = sorted(column["labels"], key=column["labels"].get)
+            manifest["columns"][name] = entry
+        with open(os.path.join(self.path, _MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_KIND_DTYPES = {"float": "float64", "int": "int64", "bool": "bool", "str": "int32"}
+
+
+def _infer_kind(value):
+    if isinstance(value, bool) or type(value).__name__ == "bool_":
+        return "bool"
+    if isinstance(value, int) or type(value).__name__.startswith("int"):
+        return "int"
+    if isinstance(value, str):
+        return "str"
+    return "float"
+
+
+def _npy_header(dtype, rows):
+    # .npy version 1.0 header padded to a fixed size
+    header = "{'descr': %r, 'fortran_order': False, 'shape': (%d,), }" % (dtype.str, rows)
+    header = header.ljust(_NPY_HEADER_SIZE - 10 - 1) + "\n"
+    return b"\x93NUMPY\x01\x00" + len(header).to_bytes(2, "little") + header.encode("latin1")
+
+
+def read_columns(path, decode_labels=False):
+    """
+    Open a ColumnarSink directory as {name: memory-mapped array}.
+
+    With `decode_labels`, string columns are returned as lists of labels
+    (None for missing) instead of their int32 codes.
+    """
+    import numpy as np
+
+    with open(os.path.join(path, _MANIFEST), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    columns = {}
+    for name, entry in manifest["columns"].items():
+        values = np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+        if decode_labels and "labels" in entry:
+            labels = entry["labels"]
+            values = [labels[code] if code >= 0 else None for code in values]
+        columns[name] = values
+    return columns
+
+
+def open_sink(path, format=None, fieldnames=None, schema=None):
+    """
+    Open a result sink, inferring the format from the path when not given.
+
+    Formats: "ndjson" (.ndjson, .jsonl), "csv" (.csv) and "npy" (any other
+    path, taken as a directory of column files). `fieldnames` fixes the CSV
+    header and `schema` the columnar types.
+    """
+    if format is None:
+        ext = os.path.splitext(path)[1].lower()
+        format = {".ndjson": "ndjson", ".jsonl": "ndjson", ".json": "ndjson", ".csv": "csv"}.get(ext, "npy")
+    if format == "ndjson":
+        return NDJSONSink(path)
+    if format == "csv":
+        return CSVSink(path, fieldnames)
+    if format == "npy":
+        return ColumnarSink(path, schema=schema)
+    raise ValueError(f"Unknown result format '{format}'.")
+
+
+def case_record(beam, **extra):
+    """Tip results of the last `Beam.analysis` run as a flat record."""
+    record = dict(extra)
+    record["displacement"] = beam.beam_displacement
+    record["rotation"] = beam.beam_rotation
+    record["twist"] = beam.beam_twist
+    record["max_stress"] = beam.max_stress
+    record["max_stress_section"] = beam.max_stress_section
+    return record
+
+
+def section_records(beam, **extra):
+    """Per-section results of the last `Beam.analysis` run, one record per section."""
+    records = []
+    for i, section in enumerate(beam.sections):
+        record = dict(extra)
+        record["section"] = i
+        record["displacement"] = section.displacement
+        record["rotation"] = section.rotation
+        record["twist"] = section.twist
+        record["required_yield_stress"] = section.required_yield_stress
+        record["tensile_strength"] = section.tensile_strength
+        records.append(record)
+    return records
+
+
+def _rows(columns):
+    names = list(columns)
+    for values in zip(*(columns[name] for name in names)):
+        yield dict(zip(names, values))
+
+
+def _plain(record):
+    # NumPy scalars are not JSON serializable
+    return {k: (v.item() if hasattr(v, "item") else v) for k, v in record.items()}
@@ -1,6 +1,32 @@
-import json
+from cache import LRUCache
+from infill import pattern_name, tables_version
+from instrumentation import instrumented
+from loading import compute_section_properties
+from materials import get_material
+
+# fields the cached section properties depend on
+PROPERTY_FIELDS = frozenset(("width", "height", "infill_pattern", "infill_density",
+                             "wall_count", "line_width", "wall_thickness", "material_properties",
+                             "torsion_method"))
+_KEY_FIELDS = tuple(sorted(PROPERTY_FIELDS))
+
+# properties shared by every section with the same geometry, infill and
+# material record, whichever beam it belongs to; keys of tabulated infill
+# patterns also carry the tables version, so reloaded tables do not serve
+# old properties
+_shared = LRUCache(maxsize=4096)
+
+
 class Section:
-    def __init__(self, length, width, height, material=None, infill_pattern=None, infill_density=None, wall_count=None, line_width=None):
+    __slots__ = ("length", "width", "height",
+                 "material", "infill_pattern", "infill_density", "wall_count", "line_width",
+                 "torsion_method", "wall_thickness", "material_properties", "_properties",
+                 # results written by loading.analysis
+                 "displacement", "rotation", "twist", "required_yield_stress")
+
+    @instrumented("section.init")
+    def __init__(self, length, width, height, material=None, infill_pattern=None, infill_density=None, wall_count=None, line_width=None,
+                 torsion_method=None):
         self.length = length
         self.width = width
         self.height = height
@@ -10,20 +36,67 @@ class Section:
         self.infill_density = infill_density
         self.wall_count = wall_count
         self.line_width = line_width
-        
+        # None or "analytic": composite polar moment, "mesh": Saint-Venant solution (see loading.compute_section_properties)
+        self.torsion_method = torsion_method
+
         self.wall_thickness = self.wall_count * self.line_width
         self.load_material_properties()
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name in PROPERTY_FIELDS:
+            object.__setattr__(self, "_properties", None)
+            # keep the derived wall thickness in step with its inputs
+            if name in ("wall_count", "line_width") and hasattr(self, "wall_thickness"):
+                self.wall_thickness = self.wall_count * self.line_width
+        elif name == "material" and hasattr(self, "material_properties"):
+            self.load_material_properties()
     
-    def load_material_properties(self, material_database = "materials.json"):
-
-        with open(material_database, 'r') as f:
-            materials = json.load(f)
-        
-        if self.material in materials:
-            mat_props = materials[self.material]
-            self.E_shell = mat_props['youngs_modulus']  # Pascals
-            self.G_shell = mat_props['shear_modulus']  # Pascals
-            self.tensile_strength = mat_props['tensile_strength']  # Pascals
-        else:
-            raise ValueError(f"Material '{self.material}' not found in database.")
+    def load_material_properties(self, material_database=None):
+        # shared, immutable record from the material registry (see materials.py)
+        self.material_properties = get_material(self.material, material_database)
+
+    @property
+    def properties(self):
+        """Cached `loading.SectionProperties`, recomputed after any geometry or material change."""
+        properties = getattr(self, "_properties", None)
+        if properties is None:
+            properties = _shared.get_or_compute(self._shared_key(), lambda: compute_section_properties(self))
+            object.__setattr__(self, "_properties", properties)
+        return properties
+
+    def invalidate(self):
+        # for in-place changes the section cannot see (e.g. a re-registered material);
+        # drops the shared entry too, so other sections like this one recompute as well
+        _shared.discard(self._shared_key())
+        object.__setattr__(self, "_properties", None)
+
+    def _shared_key(self):
+        # only patterns looked up in the infill tables depend on their version
+        tabulated = self.line_width is not None and pattern_name(self.infill_pattern) is not None
+        return (tables_version() if tabulated else None,) + tuple(getattr(self, name) for name in _KEY_FIELDS)
+
+    @property
+    def E_shell(self):
+        return self.material_properties.youngs_modulus  # Pascals
+
+    @property
+    def G_shell(self):
+        return self.material_properties.shear_modulus  # Pascals
+
+    @property
+    def tensile_strength(self):
+        # allowable stress, the material's strength lowered by a weak infill core
+        return self.material_properties.tensile_strength * self.properties.strength_ratio  # Pascals
+
+
+def set_cache_size(maxsize):
+    _shared.resize(maxsize)
+
+
+def cache_info():
+    return _shared.info()
+
 
+def clear_cache():
+    _shared.clear()
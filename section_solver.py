@@ -0,0 +1,367 @@
+import hashlib
+import math
+
+import numpy as np
+
+from cache import LRUCache
+from instrumentation import instrumented, record_allocation
+
+DEFAULT_CELLS = 200
+
+# solved profiles keyed on (geometry hash, cells): J, the shear centre and
+# the unit stress field of a profile are solved once and scaled for every
+# torque; the sparse systems themselves are not kept
+_cache = LRUCache(maxsize=64)
+
+
+class Profile:
+    """
+    Arbitrary cross-section: a polygonal outline with polygonal holes and
+    optional regions of reduced stiffness, e.g. an infill core.
+
+    Polygons are sequences of (x, y) vertices in meters, x across the
+    width and y along the height. `regions` are (polygon, weight) pairs,
+    the weight being the modulus relative to the outline material; later
+    regions win where they overlap, and a weight of 0 is a hole.
+    """
+
+    def __init__(self, outline, holes=(), regions=()):
+        self.outline = _polygon(outline)
+        self.holes = [_polygon(h) for h in holes]
+        self.regions = [(_polygon(p), float(w)) for p, w in regions]
+        for _, weight in self.regions:
+            if not 0 <= weight <= 1:
+                raise ValueError("Region weights must lie between 0 and 1.")
+
+    @classmethod
+    def rectangle(cls, b, h, t=None, n=1.0):
+        """b x h rectangle centred on the origin, with a core inset by the wall thickness `t` and weighted by `n`."""
+        outline = _box(b / 2, h / 2)
+        if t is None or n == 1 or b <= 2 * t or h <= 2 * t:
+            return cls(outline)
+        return cls(outline, regions=[(_box(b / 2 - t, h / 2 - t), n)])
+
+    @classmethod
+    def from_section(cls, section):
+        """Rectangular shell and infill core of a `Section`, the core weighted by its shear modulus ratio."""
+        from infill import core_ratios
+
+        core = core_ratios(section.infill_pattern, section.infill_density, section.line_width)
+        return cls.rectangle(section.width, section.height, section.wall_thickness, core.G)
+
+    def key(self):
+        digest = hashlib.sha256()
+        digest.update(self.outline.tobytes())
+        for hole in self.holes:
+            digest.update(b"hole")
+            digest.update(hole.tobytes())
+        for polygon, weight in self.regions:
+            digest.update(repr(weight).encode("ascii"))
+            digest.update(polygon.tobytes())
+        return digest.hexdigest()
+
+
+def _box(a, b):
+    return [(-a, -b), (a, -b), (a, b), (-a, b)]
+
+
+def _polygon(points):
+    polygon = np.asarray(points, dtype=float)
+    if polygon.ndim != 2 or polygon.shape[1] != 2 or len(polygon) < 3:
+        raise ValueError("A polygon needs at least three (x, y) vertices.")
+    return polygon
+
+
+def _inside(polygon, X, Y):
+    # even-odd crossing test of the points against every polygon edge
+    inside = np.zeros(X.shape, dtype=bool)
+    for (ax, ay), (bx, by) in zip(polygon, np.roll(polygon, -1, axis=0)):
+        if ay == by:
+            continue
+        crosses = (ay > Y) != (by > Y)
+        inside ^= crosses & (X < ax + (Y - ay) * (bx - ax) / (by - ay))
+    return inside
+
+
+def rasterize(profile, cells=DEFAULT_CELLS):
+    """
+    Square-cell grid of the profile.
+
+    The longer side of the outline's bounding box gets `cells` cells and
+    the grid carries one ring of empty cells around the outline.
+
+    Returns:
+    - x, y: cell centre coordinates (1-D)
+    - weight: (len(y), len(x)) relative modulus of every cell, 0 outside material
+    """
+    low = profile.outline.min(axis=0)
+    high = profile.outline.max(axis=0)
+    size = high - low
+    if size.min() <= 0:
+        raise ValueError("The outline has no area.")
+    cell = size.max() / cells
+    nx, ny = (np.ceil(size / cell - 1e-9).astype(int) + 2)
+    centre = (low + high) / 2
+    x = centre[0] + (np.arange(nx) - (nx - 1) / 2) * cell
+    y = centre[1] + (np.arange(ny) - (ny - 1) / 2) * cell
+    X, Y = np.meshgrid(x, y)
+
+    weight = _inside(profile.outline, X, Y).astype(float)
+    inside = weight > 0
+    for polygon, value in profile.regions:
+        weight[inside & _inside(polygon, X, Y)] = value
+    for hole in profile.holes:
+        weight[_inside(hole, X, Y)] = 0.0
+    record_allocation("section_solver.grid", X.nbytes + Y.nbytes + weight.nbytes)
+    return x, y, weight
+
+
+def _faces(axis):
+    # (lower, upper) neighbour slices of every interior face along `axis`
+    lower = [slice(None), slice(None)]
+    upper = [slice(None), slice(None)]
+    lower[axis] = slice(None, -1)
+    upper[axis] = slice(1, None)
+    return tuple(lower), tuple(upper)
+
+
+def _assemble(shape, rows, cols, values):
+    from scipy import sparse
+
+    return sparse.coo_matrix((np.concatenate(values), (np.concatenate(rows), np.concatenate(cols))),
+                             shape=shape).tocsc()
+
+
+def _prandtl_system(weight, cell):
+    """
+    Finite-volume Prandtl system for a unit rate of twist.
+
+    div(grad(phi) / g) = -2 on the material, phi = 0 on the outer boundary
+    and phi constant on every enclosed hole. Each hole is a single unknown
+    whose equation is the Bredt condition: the circulation of shear stress
+    around the hole equals twice its area.
+
+    Returns:
+    - (matrix, rhs, node grid, hole areas)
+    """
+    from scipy import ndimage
+
+    material = weight > 0
+    empty, count = ndimage.label(~material)
+    # the empty ring around the grid makes the exterior a single component
+    exterior = empty[0, 0]
+    labels = [label for label in range(1, count + 1) if label != exterior]
+
+    n_material = int(material.sum())
+    node = np.full(weight.shape, -1)
+    node[material] = np.arange(n_material)
+    hole_cells = []
+    for i, label in enumerate(labels):
+        cells = empty == label
+        node[cells] = n_material + i
+        hole_cells.append(int(cells.sum()))
+    hole_areas = np.asarray(hole_cells, dtype=float) * cell**2
+    size = n_material + len(labels)
+
+    rows, cols, values = [], [], []
+    diagonal = np.zeros(size)
+    for axis in (0, 1):
+        lower, upper = _faces(axis)
+        a, b = node[lower], node[upper]
+        ga, gb = weight[lower], weight[upper]
+        inner = material[lower] & material[upper]
+        # conductance 1/g: harmonic mean between cells, the boundary sits half a cell away
+        w = np.where(inner, 2 / np.where(inner, ga + gb, 1), 0.0)
+        edge = material[lower] ^ material[upper]
+        g_edge = np.where(material[lower], ga, gb)
+        w = np.where(edge, 2 / np.where(edge, g_edge, 1), w)
+        face = inner | edge
+        a, b, w = a[face], b[face], w[face]
+        np.add.at(diagonal, a[a >= 0], w[a >= 0])
+        np.add.at(diagonal, b[b >= 0], w[b >= 0])
+        coupled = (a >= 0) & (b >= 0)
+        rows += [a[coupled], b[coupled]]
+        cols += [b[coupled], a[coupled]]
+        values += [-w[coupled], -w[coupled]]
+    rows.append(np.arange(size))
+    cols.append(np.arange(size))
+    values.append(diagonal)
+
+    rhs = np.concatenate([np.full(n_material, 2 * cell**2), 2 * hole_areas])
+    return _assemble((size, size), rows, cols, values), rhs, node, hole_areas
+
+
+def _warping_system(weight, cell, X, Y):
+    """
+    Finite-volume system of the Saint-Venant warping function about (0, 0).
+
+    div(g (grad(w) - (y, -x))) = 0 on the material with no flux through
+    free boundaries, holes included. One cell of every connected piece of
+    material is held at zero to remove the free constant.
+
+    Returns:
+    - (matrix, rhs, node grid, pinned nodes)
+    """
+    from scipy import ndimage
+
+    material = weight > 0
+    n_material = int(material.sum())
+    node = np.full(weight.shape, -1)
+    node[material] = np.arange(n_material)
+    pieces, count = ndimage.label(material)
+    pinned = np.asarray(ndimage.minimum(node, pieces, range(1, count + 1)), dtype=int).reshape(-1)
+
+    rows, cols, values = [], [], []
+    diagonal = np.zeros(n_material)
+    rhs = np.zeros(n_material)
+    for axis in (0, 1):
+        lower, upper = _faces(axis)
+        face = material[lower] & material[upper]
+        a, b = node[lower][face], node[upper][face]
+        ga, gb = weight[lower][face], weight[upper][face]
+        w = 2 * ga * gb / (ga + gb)
+        if axis == 1:
+            # faces normal to x carry g * y, faces normal to y carry -g * x
+            drive = w * Y[lower][face] * cell
+        else:
+            drive = -w * X[lower][face] * cell
+        np.add.at(diagonal, a, w)
+        np.add.at(diagonal, b, w)
+        np.add.at(rhs, a, -drive)
+        np.add.at(rhs, b, drive)
+        rows += [a, b]
+        cols += [b, a]
+        values += [-w, -w]
+    keep = np.ones(n_material, dtype=bool)
+    keep[pinned] = False
+    matrix = _assemble((n_material, n_material), rows + [np.arange(n_material)],
+                       cols + [np.arange(n_material)], values + [diagonal])
+    # pinning a node: drop its row and column, its value is zero
+    return matrix[keep][:, keep], rhs[keep], node, keep
+
+
+class SectionSolution:
+    """
+    Solved cross-section.
+
+    Attributes:
+    - J: Saint-Venant torsion constant in m^4, relative to the outline
+      material (the torsional stiffness is G * J)
+    - area, centroid, I_xx, I_yy, I_xy: modulus-weighted area, centroid
+      and second moments about the centroid (I_xx = integral of y^2)
+    - shear_centre: (x, y) of the shear centre
+    - phi, warping: stress function and warping function on the grid
+      for a unit rate of twist
+    - max_shear_unit: largest torsional shear stress per unit torque in 1/m^3
+    """
+
+    def __init__(self, profile, cells=DEFAULT_CELLS):
+        from scipy.sparse.linalg import spsolve
+
+        self.profile = profile
+        self.cells = cells
+        self.x, self.y, self.weight = rasterize(profile, cells)
+        self.cell = float(self.x[1] - self.x[0])
+        self.material = self.weight > 0
+        if not self.material.any():
+            raise ValueError("The profile has no material.")
+        X, Y = np.meshgrid(self.x, self.y)
+        dA = self.weight * self.cell**2
+        self.area = float(dA.sum())
+        cx = float((dA * X).sum() / self.area)
+        cy = float((dA * Y).sum() / self.area)
+        self.centroid = (cx, cy)
+        X, Y = X - cx, Y - cy
+        self.I_xx = float((dA * Y**2).sum())
+        self.I_yy = float((dA * X**2).sum())
+        self.I_xy = float((dA * X * Y).sum())
+
+        # Prandtl stress function: J = 2 * (integral of phi + sum of hole phi * hole area)
+        matrix, rhs, node, hole_areas = _prandtl_system(self.weight, self.cell)
+        values = spsolve(matrix, rhs)
+        self.hole_phi = values[self.material.sum():]
+        # hole cells carry their constant value, the exterior stays at zero
+        self.phi = np.where(node >= 0, values[np.maximum(node, 0)], 0.0)
+        self.J = float(2 * (values[:self.material.sum()].sum() * self.cell**2 + self.hole_phi @ hole_areas))
+        record_allocation("section_solver.prandtl", matrix.data.nbytes + self.phi.nbytes)
+
+        # warping function about the centroid, then the shear centre (Trefftz)
+        matrix, rhs, node, free = _warping_system(self.weight, self.cell, X, Y)
+        omega = np.zeros(free.size)
+        omega[free] = spsolve(matrix, rhs)
+        omega = np.where(node >= 0, omega[np.maximum(node, 0)], 0.0)
+        omega -= (dA * omega).sum() / self.area
+        self.warping = np.where(self.material, omega, 0.0)
+        I_wx = float((dA * omega * X).sum())
+        I_wy = float((dA * omega * Y).sum())
+        det = self.I_xx * self.I_yy - self.I_xy**2
+        self.shear_centre = (cx + (self.I_xy * I_wx - self.I_yy * I_wy) / det,
+                             cy + (self.I_xx * I_wx - self.I_xy * I_wy) / det)
+        record_allocation("section_solver.warping", matrix.data.nbytes + self.warping.nbytes)
+
+        tau_x, tau_y = self._unit_shear()
+        self._tau = (tau_x, tau_y)
+        self.max_shear_unit = float(np.hypot(tau_x, tau_y).max())
+
+    def _unit_shear(self):
+        # tau_x = dphi/dy, tau_y = -dphi/dx for a unit torque (phi / J)
+        def gradient(axis):
+            lower, upper = _faces(axis)
+            # a face next to a non-material cell is the boundary itself, half a cell away
+            spacing = np.where(self.material[lower] & self.material[upper], 1.0, 0.5) * self.cell
+            faces = (self.phi[upper] - self.phi[lower]) / spacing
+            pad = [(0, 0), (0, 0)]
+            pad[axis] = (1, 0)
+            before = np.pad(faces, pad)
+            pad[axis] = (0, 1)
+            after = np.pad(faces, pad)
+            return np.where(self.material, (before + after) / 2, 0.0)
+
+        return gradient(0) / self.J, -gradient(1) / self.J
+
+    def shear_stress(self, T):
+        """Torsional shear stress components (tau_x, tau_y) on the grid for a torque T in N*m."""
+        tau_x, tau_y = self._tau
+        return T * tau_x, T * tau_y
+
+    def max_shear(self, T):
+        return abs(T) * self.max_shear_unit
+
+    def twist_rate(self, T, shear_modulus):
+        """Rate of twist in rad/m of the profile under torque T, G being the outline material's shear modulus."""
+        return T / (shear_modulus * self.J)
+
+
+@instrumented("section_solver.solve")
+def solve_profile(profile, cells=DEFAULT_CELLS):
+    """
+    Solve a profile, or return the cached solution of the same geometry.
+
+    Parameters:
+    - profile: `Profile`
+    - cells: grid cells along the longer side of the bounding box
+
+    Returns:
+    - SectionSolution
+    """
+    key = (profile.key(), cells)
+    return _cache.get_or_compute(key, lambda: SectionSolution(profile, cells))
+
+
+def mesh_torsion_constant(b, h, t, n, cells=DEFAULT_CELLS):
+    """Saint-Venant torsion constant of the composite rectangle of `torsion.torsion_constant`."""
+    if b <= 0 or h <= 0 or not math.isfinite(b * h):
+        return 0.0
+    return solve_profile(Profile.rectangle(b, h, t, n), cells).J
+
+
+def set_cache_size(maxsize):
+    _cache.resize(maxsize)
+
+
+def cache_info():
+    return _cache.info()
+
+
+def clear_cache():
+    _cache.clear()
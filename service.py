@@ -0,0 +1,390 @@
+import asyncio
+import ipaddress
+import itertools
+import json
+import os
+import signal
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from beam import Beam, analyze_beam, validate_beam_data
+from cache import LRUCache
+from loadcases import normalize_load_case
+from store import definition_hash
+from sweep import evaluate_candidate, expand_range
+from worker import warm_up
+
+MAX_BODY = 16 * 1024 * 1024
+# larger sweeps belong in `main.py sweep`, which streams to a file
+MAX_SWEEP_CANDIDATES = 100000
+SWEEP_CHUNK = 256
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+# parsed beams kept by every pool process, keyed on the definition hash
+_beams = LRUCache(256)
+
+
+def _build_beam(beam_data):
+    problems = validate_beam_data(beam_data)
+    if problems:
+        raise ValueError("; ".join(problems))
+    return Beam.from_dict(beam_data)
+
+
+def _analyze_group(key, beam_data, cases, per_section):
+    # runs in a pool process: every case of every request on one beam
+    beam = _beams.get_or_compute(key, lambda: _build_beam(beam_data))
+    return analyze_beam(beam, cases, per_section, beam=beam_data.get("name", "beam"))
+
+
+def _sweep_chunk(beam_data, names, start, chunk, loads):
+    records = []
+    for offset, values in enumerate(chunk):
+        record = evaluate_candidate(beam_data, dict(zip(names, values)), loads)
+        record["index"] = start + offset
+        records.append(record)
+    return records
+
+
+def _torsion(b, h, t, n, method, tol):
+    from torsion import torsion_constant
+    return torsion_constant(b, h, t, n, method=method, tol=tol)
+
+
+class Metrics:
+    """Request counts and latencies per route, over the last `window` requests."""
+
+    def __init__(self, window=10000):
+        self.window = window
+        self.routes = {}
+        self.started = time.time()
+        self.rejected = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self.batched_cases = 0
+
+    def record(self, route, status, elapsed):
+        stats = self.routes.get(route)
+        if stats is None:
+            stats = self.routes[route] = {"count": 0, "errors": 0, "latency": deque(maxlen=self.window)}
+        stats["count"] += 1
+        stats["errors"] += status >= 400
+        stats["latency"].append(elapsed)
+
+    def report(self, in_flight):
+        routes = {}
+        for route, stats in self.routes.items():
+            latency = sorted(stats["latency"])
+            routes[route] = {"count": stats["count"], "errors": stats["errors"],
+                             "latency_ms": {name: latency[min(len(latency) - 1, int(q * len(latency)))] * 1e3
+                                            for name, q in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("max", 1.0))}
+                             if latency else {}}
+        return {"uptime_s": time.time() - self.started, "in_flight": in_flight, "rejected": self.rejected,
+                "batches": self.batches,
+                "mean_batch_requests": self.batched_requests / self.batches if self.batches else 0.0,
+                "mean_batch_cases": self.batched_cases / self.batches if self.batches else 0.0,
+                "routes": routes}
+
+
+class AnalysisService:
+    """
+    Local HTTP service around `Beam` analysis.
+
+    Routes (JSON bodies):
+    - POST /analyze {"beam", "loads", "per_section"}: one case or a list;
+      concurrent requests arriving within `batch_window` seconds are
+      merged into one evaluation per distinct beam
+    - POST /validate {"beam"}
+    - POST /sweep {"beam", "parameters", "loads"}: split over the pool
+    - POST /torsion {"b", "h", "t", "n", "method", "tol"}
+    - GET /metrics, GET /health
+
+    All evaluation runs in a process pool so the event loop only parses
+    and routes. Above `max_pending` requests in flight new requests get
+    503 with Retry-After instead of queueing without bound.
+    """
+
+    def __init__(self, workers=None, batch_window=0.002, max_batch_cases=4096, max_pending=1024):
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_window = batch_window
+        self.max_batch_cases = max_batch_cases
+        self.max_pending = max_pending
+        self.metrics = Metrics()
+        self.in_flight = 0
+        self.pool = None
+        self._queue = None
+        self._batcher = None
+        self._tasks = set()
+        self.routes = {
+            ("POST", "/analyze"): self.analyze,
+            ("POST", "/validate"): self.validate,
+            ("POST", "/sweep"): self.sweep,
+            ("POST", "/torsion"): self.torsion,
+            ("GET", "/metrics"): self.report,
+            ("GET", "/health"): self.health,
+        }
+
+    async def start(self):
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        # start every pool process now rather than on the first requests
+        await asyncio.gather(*(self._run(warm_up) for _ in range(self.workers)))
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.create_task(self._batch_loop())
+
+    async def close(self):
+        if self._batcher is not None:
+            self._batcher.cancel()
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.pool, func, *args)
+
+    # -- routes --
+
+    async def analyze(self, body):
+        beam_data = body["beam"]
+        loads = body.get("loads", {})
+        if isinstance(loads, dict):
+            loads = [loads]
+        if not loads:
+            raise ValueError("No load cases in 'loads'.")
+        cases = [normalize_load_case(case, i) for i, case in enumerate(loads)]
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((definition_hash(beam_data), beam_data, cases, bool(body.get("per_section")), future))
+        records, section_records = await future
+        response = {"results": records}
+        if body.get("per_section"):
+            response["sections"] = section_records
+        return response
+
+    async def validate(self, body):
+        return {"problems": validate_beam_data(body["beam"])}
+
+    async def sweep(self, body):
+        parameters = body["parameters"]
+        names = list(parameters)
+        values = [expand_range(parameters[name]) for name in names]
+        count = 1
+        for v in values:
+            count *= len(v)
+        if count > MAX_SWEEP_CANDIDATES:
+            raise ValueError(f"{count} candidates, the service takes at most {MAX_SWEEP_CANDIDATES}; use 'main.py sweep'.")
+        candidates = itertools.product(*values)
+        jobs = []
+        for start in range(0, count, SWEEP_CHUNK):
+            chunk = list(itertools.islice(candidates, SWEEP_CHUNK))
+            jobs.append(self._run(_sweep_chunk, body["beam"], names, start, chunk, body.get("loads", {})))
+        return {"results": [record for chunk in await asyncio.gather(*jobs) for record in chunk]}
+
+    async def torsion(self, body):
+        J = await self._run(_torsion, body["b"], body["h"], body["t"], body["n"],
+                            body.get("method", "analytic"), body.get("tol", 1e-6))
+        return {"J": J}
+
+    async def report(self, body):
+        return self.metrics.report(self.in_flight)
+
+    async def health(self, body):
+        return {"ok": True}
+
+    # -- micro-batching --
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            cases = len(batch[0][2])
+            deadline = loop.time() + self.batch_window
+            while cases < self.max_batch_cases:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                cases += len(item[2])
+            self.metrics.batches += 1
+            self.metrics.batched_requests += len(batch)
+            self.metrics.batched_cases += cases
+
+            groups = {}
+            for item in batch:
+                groups.setdefault(item[0], []).append(item)
+            for key, items in groups.items():
+                task = asyncio.create_task(self._evaluate_group(key, items))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    async def _evaluate_group(self, key, items):
+        cases = [case for item in items for case in item[2]]
+        per_section = any(item[3] for item in items)
+        try:
+            records, section_records = await self._run(_analyze_group, key, items[0][1], cases, per_section)
+            n_sections = len(section_records) // len(cases) if per_section else 0
+            results = []
+            start = 0
+            for _, _, item_cases, _, _ in items:
+                end = start + len(item_cases)
+                results.append((records[start:end], section_records[start * n_sections:end * n_sections]))
+                start = end
+        except Exception as e:
+            # every waiting request gets the error, none is left hanging
+            for item in items:
+                if not item[4].done():
+                    item[4].set_exception(e)
+            return
+        for item, result in zip(items, results):
+            if not item[4].done():
+                item[4].set_result(result)
+
+    # -- HTTP --
+
+    async def dispatch(self, method, path, body):
+        """Route one request and return (status, response body)."""
+        path = path.split("?", 1)[0]
+        handler = self.routes.get((method, path))
+        if handler is None:
+            if any(p == path for _, p in self.routes):
+                return 405, {"error": f"{method} not allowed on {path}"}
+            return 404, {"error": f"No route {path}"}
+        if self.in_flight >= self.max_pending:
+            self.metrics.rejected += 1
+            return 503, {"error": "Too many requests in flight, retry shortly."}
+        self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            data = json.loads(body) if body else {}
+            if not isinstance(data, dict):
+                raise ValueError("Request body must be a JSON object.")
+            status, response = 200, await handler(data)
+        except (ValueError, KeyError, TypeError) as e:
+            status, response = 400, {"error": str(e) if not isinstance(e, KeyError) else f"Missing field {e}"}
+        except Exception as e:
+            status, response = 500, {"error": f"{type(e).__name__}: {e}"}
+        finally:
+            self.in_flight -= 1
+        self.metrics.record(path, status, time.perf_counter() - start)
+        return status, response
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                if body is None:
+                    status, response = 413, {"error": f"Body larger than {MAX_BODY} bytes."}
+                else:
+                    status, response = await self.dispatch(method, path, body)
+                keep_alive = headers.get("connection", "").lower() != "close" and body is not None
+                writer.write(_response(status, response, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+async def _read_request(reader):
+    line = await reader.readline()
+    if not line:
+        return None
+    method, path, _ = line.decode("latin-1").split(" ", 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0))
+    if length > MAX_BODY:
+        return method, path, headers, None
+    body = await reader.readexactly(length) if length else b""
+    return method, path, headers, body
+
+
+def _response(status, payload, keep_alive):
+    body = json.dumps(payload).encode("utf-8")
+    headers = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}",
+               "Content-Type: application/json",
+               f"Content-Length: {len(body)}",
+               f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+    if status == 503:
+        headers.append("Retry-After: 1")
+    return ("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body
+
+
+def is_loopback(host):
+    """Whether `host` ("localhost" or an IP address) only accepts connections from this machine."""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+async def serve(host="127.0.0.1", port=8765, socket_path=None, allow_remote=False, **options):
+    """
+    Run the service until cancelled or terminated, on a TCP port or a unix socket.
+
+    The service has no authentication, so a TCP `host` must be a loopback
+    address unless `allow_remote` is set.
+    """
+    if not socket_path and not allow_remote and not is_loopback(host):
+        raise ValueError(f"Refusing to serve on non-loopback host '{host}' without allow_remote.")
+    service = AnalysisService(**options)
+    try:
+        await service.start()
+        if socket_path:
+            server = await asyncio.start_unix_server(service.handle_connection, path=socket_path)
+        else:
+            server = await asyncio.start_server(service.handle_connection, host, port)
+        stop = asyncio.Event()
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+        except (NotImplementedError, RuntimeError):
+            # no signal handlers on this platform or outside the main thread
+            pass
+        async with server:
+            await stop.wait()
+    finally:
+        await service.close()
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def request(path, body=None, host="127.0.0.1", port=8765, socket_path=None, timeout=60):
+    """Small blocking client: POST `body` (GET without one) and return (status, JSON response)."""
+    import http.client
+    import socket
+
+    if socket_path:
+        class UnixConnection(http.client.HTTPConnection):
+            def connect(self):
+                self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self.sock.settimeout(timeout)
+                self.sock.connect(socket_path)
+
+        connection = UnixConnection("localhost", timeout=timeout)
+    else:
+        connection = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        if body is None:
+            connection.request("GET", path)
+        else:
+            connection.request("POST", path, json.dumps(body), {"Content-Type": "application/json"})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
@@ -0,0 +1,323 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from beam import ANALYSIS_VERSION, Beam, analyze_beam, validate_beam_data
+from infill import tables_version
+from loadcases import LOAD_COMPONENTS, normalize_load_case
+from materials import registry
+
+DEFAULT_STORE = "designs.sqlite"
+
+# indexed per-section columns, values resolved against the beam defaults
+SECTION_COLUMNS = ("material", "infill_pattern", "infill_density", "wall_count", "line_width",
+                   "length", "width", "height")
+RESULT_COLUMNS = ("displacement", "rotation", "twist", "max_stress", "max_stress_section", "failed")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS beams (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL,
+    hash TEXT NOT NULL,
+    definition TEXT NOT NULL,
+    materials TEXT NOT NULL,
+    n_sections INTEGER NOT NULL,
+    total_length REAL NOT NULL,
+    added REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sections (
+    beam_id INTEGER NOT NULL REFERENCES beams(id) ON DELETE CASCADE,
+    section INTEGER NOT NULL,
+    material TEXT, infill_pattern TEXT, infill_density REAL, wall_count INTEGER, line_width REAL,
+    length REAL, width REAL, height REAL,
+    PRIMARY KEY (beam_id, section)
+);
+CREATE INDEX IF NOT EXISTS sections_material ON sections(material);
+CREATE INDEX IF NOT EXISTS sections_infill ON sections(infill_pattern, infill_density);
+CREATE INDEX IF NOT EXISTS sections_size ON sections(width, height);
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    beam_hash TEXT NOT NULL,
+    materials_version TEXT NOT NULL, -- see results_version
+    M REAL NOT NULL, F REAL NOT NULL, T REAL NOT NULL, TF REAL NOT NULL,
+    displacement REAL, rotation REAL, twist REAL, max_stress REAL, max_stress_section INTEGER, failed INTEGER,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_case ON results(M, F, T, TF, beam_hash);
+"""
+
+
+def definition_hash(data):
+    """Hash of a beam definition that ignores key order and formatting."""
+    canonical = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def results_version(materials):
+    """
+    Version of everything besides the beam definition that a result
+    depends on: the analysis kernels, the records of `materials` and the
+    infill model tables.
+    """
+    return f"{ANALYSIS_VERSION}+{registry.version(materials)}+{tables_version()}"
+
+
+def result_key(beam_hash, case, version):
+    # version: see `results_version`
+    loads = ",".join(repr(float(case[key])) for key in LOAD_COMPONENTS)
+    return hashlib.sha256(f"{beam_hash}|{loads}|{version}".encode("utf-8")).hexdigest()
+
+
+class DesignStore:
+    """
+    Beam definitions in a SQLite file, indexed by material, infill and
+    section size, with a cache of analysis results.
+
+    A cached result is keyed on the hash of (beam definition, load case,
+    analysis version, version of the materials the beam uses, version of
+    the infill tables), so editing a beam, one of its materials, the infill
+    models or the kernels simply misses the cache; nothing has to be
+    invalidated.
+    """
+
+    def __init__(self, path=DEFAULT_STORE):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(_SCHEMA)
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM beams").fetchone()[0]
+
+    def __contains__(self, name):
+        return self.connection.execute("SELECT 1 FROM beams WHERE name = ?", (name,)).fetchone() is not None
+
+    def add(self, name, data):
+        """Add or replace a beam definition. Raises ValueError for invalid beams."""
+        problems = validate_beam_data(data)
+        if problems:
+            raise ValueError(f"Beam '{name}': " + "; ".join(problems))
+        beam = Beam.from_dict(data)
+        materials = sorted({s.material for s in beam.sections})
+        with self.connection:
+            self.connection.execute("DELETE FROM beams WHERE name = ?", (name,))
+            cursor = self.connection.execute(
+                "INSERT INTO beams (name, hash, definition, materials, n_sections, total_length, added) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (name, definition_hash(data), json.dumps(data), json.dumps(materials), len(beam.sections),
+                 sum(s.length for s in beam.sections), time.time()))
+            self.connection.executemany(
+                f"INSERT INTO sections (beam_id, section, {', '.join(SECTION_COLUMNS)}) "
+                f"VALUES (?, ?, {', '.join('?' * len(SECTION_COLUMNS))})",
+                [(cursor.lastrowid, i, *(getattr(s, c) for c in SECTION_COLUMNS)) for i, s in enumerate(beam.sections)])
+
+    def add_file(self, path, name=None):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        name = name or os.path.splitext(os.path.basename(path))[0]
+        self.add(name, data)
+        return name
+
+    def import_files(self, paths):
+        """
+        Add beam files, skipping unchanged ones.
+
+        Returns:
+        - (names added or updated, {path: error} for files that could not be added)
+        """
+        known = dict(self.connection.execute("SELECT name, hash FROM beams").fetchall())
+        added = []
+        errors = {}
+        for path in paths:
+            name = os.path.splitext(os.path.basename(path))[0]
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if known.get(name) == definition_hash(data):
+                    continue
+                self.add(name, data)
+                added.append(name)
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                errors[path] = str(e)
+        return added, errors
+
+    def remove(self, name):
+        with self.connection:
+            self.connection.execute("DELETE FROM beams WHERE name = ?", (name,))
+
+    def names(self):
+        return [row[0] for row in self.connection.execute("SELECT name FROM beams ORDER BY name")]
+
+    def definition(self, name):
+        row = self.connection.execute("SELECT definition FROM beams WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise KeyError(f"Beam '{name}' not in the store.")
+        return json.loads(row[0])
+
+    def beam(self, name):
+        return Beam.from_dict(self.definition(name))
+
+    def find(self, match="all", **criteria):
+        """
+        Names of beams whose sections meet every criterion.
+
+        Criteria are section columns (material, infill_pattern,
+        infill_density, wall_count, line_width, length, width, height): a
+        plain value must match exactly, a (low, high) tuple is an inclusive
+        range with None for an open end. With match="all" every section
+        must qualify, with "any" one is enough.
+        """
+        where, params = _section_filter(criteria)
+        if match == "all":
+            sql = ("SELECT name FROM beams b WHERE NOT EXISTS "
+                   f"(SELECT 1 FROM sections s WHERE s.beam_id = b.id AND NOT ({where})) ORDER BY name")
+        elif match == "any":
+            sql = ("SELECT name FROM beams b WHERE EXISTS "
+                   f"(SELECT 1 FROM sections s WHERE s.beam_id = b.id AND {where}) ORDER BY name")
+        else:
+            raise ValueError("match must be 'all' or 'any'.")
+        return [row[0] for row in self.connection.execute(sql, params)]
+
+    def _results_version(self, materials_json, versions):
+        # beams sharing a material set share the version lookup
+        version = versions.get(materials_json)
+        if version is None:
+            version = versions[materials_json] = results_version(json.loads(materials_json))
+        return version
+
+    def analyze(self, names, cases):
+        """
+        Results of every load case on every named beam, from the cache where possible.
+
+        Returns:
+        - {name: [result record per case]}, records as in `beam.analyze_beam`
+        """
+        cases = [normalize_load_case(case, i) for i, case in enumerate(cases)]
+        versions = {}
+        output = {}
+        now = time.time()
+        for name in names:
+            row = self.connection.execute("SELECT hash, definition, materials FROM beams WHERE name = ?",
+                                          (name,)).fetchone()
+            if row is None:
+                raise KeyError(f"Beam '{name}' not in the store.")
+            version = self._results_version(row["materials"], versions)
+            keys = [result_key(row["hash"], case, version) for case in cases]
+            cached = {}
+            # stay well below SQLite's limit on bound parameters
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                cached.update((r["key"], r) for r in self.connection.execute(
+                    f"SELECT * FROM results WHERE key IN ({', '.join('?' * len(batch))})", batch))
+            missing = [i for i, key in enumerate(keys) if key not in cached]
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+
+            records = [None] * len(cases)
+            if missing:
+                beam = Beam.from_dict(json.loads(row["definition"]))
+                computed, _ = analyze_beam(beam, [cases[i] for i in missing], beam=name)
+                with self.connection:
+                    self.connection.executemany(
+                        f"INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, "
+                        f"{', '.join('?' * len(RESULT_COLUMNS))}, ?)",
+                        [(keys[i], row["hash"], version, *(cases[i][k] for k in LOAD_COMPONENTS),
+                          *(record[c] for c in RESULT_COLUMNS), now)
+                         for i, record in zip(missing, computed)])
+                for i, record in zip(missing, computed):
+                    records[i] = record
+            for i, key in enumerate(keys):
+                if records[i] is None:
+                    r = cached[key]
+                    records[i] = dict({"beam": name, "case": cases[i]["name"]},
+                                      **{c: r[c] for c in RESULT_COLUMNS}, error=None)
+                    records[i]["failed"] = bool(records[i]["failed"])
+            output[name] = records
+        return output
+
+    def query(self, load, max_displacement=None, max_twist=None, max_stress=None, failed=None,
+              match="all", **criteria):
+        """
+        Beams matching the section `criteria` (see `find`) whose results
+        under `load` meet the limits, e.g. all PETG beams with less than
+        1 mm tip deflection:
+
+            store.query({"F": 2.0}, max_displacement=0.001, material="PETG")
+
+        Results missing from the cache are computed (and cached) first, so
+        repeated queries run on the cache alone.
+
+        Returns:
+        - list of result records, sorted by beam name
+        """
+        case = normalize_load_case(load)
+        names = self.find(match, **criteria)
+        self.analyze(names, [case])
+
+        versions = {}
+        rows = self.connection.execute(
+            "SELECT b.name, b.hash, b.materials, r.* FROM beams b JOIN results r ON r.beam_hash = b.hash "
+            "WHERE r.M = ? AND r.F = ? AND r.T = ? AND r.TF = ? ORDER BY b.name",
+            tuple(case[k] for k in LOAD_COMPONENTS))
+        wanted = set(names)
+        records = []
+        for row in rows:
+            if row["name"] not in wanted or row["materials_version"] != self._results_version(row["materials"], versions):
+                continue
+            if max_displacement is not None and abs(row["displacement"]) > max_displacement:
+                continue
+            if max_twist is not None and abs(row["twist"]) > max_twist:
+                continue
+            if max_stress is not None and row["max_stress"] > max_stress:
+                continue
+            if failed is not None and bool(row["failed"]) != failed:
+                continue
+            record = {"beam": row["name"], "case": case["name"], **{c: row[c] for c in RESULT_COLUMNS}}
+            record["failed"] = bool(record["failed"])
+            records.append(record)
+        return records
+
+    def prune_results(self):
+        """Drop cached results of removed beams, old definitions, old analysis and material versions and old infill models."""
+        versions = {}
+        current = {(row["hash"], self._results_version(row["materials"], versions))
+                   for row in self.connection.execute("SELECT hash, materials FROM beams")}
+        stale = [row["key"] for row in self.connection.execute("SELECT key, beam_hash, materials_version FROM results")
+                 if (row["beam_hash"], row["materials_version"]) not in current]
+        with self.connection:
+            self.connection.executemany("DELETE FROM results WHERE key = ?", [(key,) for key in stale])
+        return len(stale)
+
+
+def _section_filter(criteria):
+    clauses = []
+    params = []
+    for column, value in criteria.items():
+        if column not in SECTION_COLUMNS:
+            raise ValueError(f"Unknown section column '{column}'.")
+        if isinstance(value, tuple):
+            low, high = value
+            if low is not None:
+                clauses.append(f"s.{column} >= ?")
+                params.append(low)
+            if high is not None:
+                clauses.append(f"s.{column} <= ?")
+                params.append(high)
+        else:
+            clauses.append(f"s.{column} = ?")
+            params.append(value)
+    return " AND ".join(clauses) or "1", params
@@ -0,0 +1,183 @@
+import copy
+import itertools
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from beam import SECTION_FIELDS, Beam
+from results import case_record, open_sink
+
+DIMENSION_FIELDS = ("length", "width", "height")
+
+# result columns of every sweep record, with their columnar types
+RESULT_SCHEMA = {"index": "int", "displacement": "float", "rotation": "float", "twist": "float",
+                 "max_stress": "float", "max_stress_section": "int", "failed": "bool", "error": "str"}
+
+# per-process state set up once by the pool initializer
+_worker = {}
+
+
+def expand_range(spec):
+    """
+    Turn one parameter range into a list of values.
+
+    Accepts a plain list, a single value, {"start", "stop", "num"} for
+    evenly spaced values (stop included) or {"start", "stop", "step"}.
+    """
+    if isinstance(spec, (list, tuple)):
+        return list(spec)
+    if not isinstance(spec, dict):
+        return [spec]
+    start = spec["start"]
+    stop = spec["stop"]
+    if "num" in spec:
+        num = int(spec["num"])
+        if num == 1:
+            return [start]
+        return [start + (stop - start) * i / (num - 1) for i in range(num)]
+    step = spec["step"]
+    count = int(round((stop - start) / step)) + 1
+    return [start + step * i for i in range(count)]
+
+
+def apply_parameters(beam_data, params):
+    """
+    Return a copy of a beam definition with sweep parameters applied.
+
+    A plain field name (e.g. "infill_density", "width") is set on every
+    section; "sections.<i>.<field>" targets a single section.
+    """
+    data = copy.deepcopy(beam_data)
+    sections = data.setdefault("sections", [])
+    for key, value in params.items():
+        if key.startswith("sections."):
+            _, index, field = key.split(".", 2)
+            sections[int(index)][field] = value
+        elif key in SECTION_FIELDS or key in DIMENSION_FIELDS:
+            for s in sections:
+                s[key] = value
+        else:
+            raise ValueError(f"Unknown sweep parameter '{key}'.")
+    return data
+
+
+def _value_kind(values):
+    # column type of a parameter for the columnar result format
+    if all(isinstance(v, str) for v in values):
+        return "str"
+    if all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+        return "int"
+    return "float"
+
+
+def count_candidates(parameters):
+    total = 1
+    for spec in parameters.values():
+        total *= len(expand_range(spec))
+    return total
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    start = 0
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield start, chunk
+        start += len(chunk)
+
+
+def _init_worker(beam_data, names, loads):
+    _worker["beam_data"] = beam_data
+    _worker["names"] = names
+    _worker["loads"] = loads
+
+
+def evaluate_candidate(beam_data, params, loads):
+    """Analyze one design and return a flat result record (same keys on failure)."""
+    record = dict(params)
+    record.update({k: None for k in RESULT_SCHEMA if k != "index"})
+    try:
+        beam = Beam.from_dict(apply_parameters(beam_data, params))
+        beam.input_load(loads.get("M", 0.0), loads.get("F", 0.0), loads.get("T", 0.0), loads.get("TF", 0.0))
+        beam.analysis()
+    except (ValueError, KeyError, IndexError, ZeroDivisionError) as e:
+        record["error"] = str(e)
+        return record
+    record = case_record(beam, **record)
+    record["error"] = None
+    if beam.max_stress_section >= 0:
+        record["failed"] = beam.max_stress > beam.sections[beam.max_stress_section].tensile_strength
+    else:
+        record["failed"] = False
+    return record
+
+
+def _evaluate_chunk(start, chunk):
+    beam_data = _worker["beam_data"]
+    names = _worker["names"]
+    loads = _worker["loads"]
+    records = []
+    for offset, values in enumerate(chunk):
+        record = evaluate_candidate(beam_data, dict(zip(names, values)), loads)
+        record["index"] = start + offset
+        records.append(record)
+    return records
+
+
+def run_sweep(beam_data, parameters, loads, output, workers=None, chunk_size=512, max_pending=None):
+    """
+    Evaluate the cartesian product of `parameters` over a process pool.
+
+    Parameters:
+    - beam_data: base beam definition (dict in the beams/<name>.json layout)
+      or a path to such a file
+    - parameters: {field: range spec}, see `expand_range` and `apply_parameters`
+    - loads: {"M", "F", "T", "TF"} load case applied to every candidate
+    - output: path results are streamed to, NDJSON, CSV or a columnar
+      directory depending on the extension (see `results.open_sink`)
+    - workers: number of processes (defaults to the CPU count)
+    - chunk_size: candidates per task sent to a worker
+    - max_pending: tasks in flight at once (defaults to 4 per worker), this
+      bounds memory no matter how large the design space is
+
+    Returns:
+    - number of candidates evaluated
+
+    Records are written in completion order and carry their candidate
+    "index" in the cartesian product.
+    """
+    if isinstance(beam_data, (str, os.PathLike)):
+        with open(beam_data, "r", encoding="utf-8") as f:
+            beam_data = json.load(f)
+    names = list(parameters)
+    values = [expand_range(parameters[name]) for name in names]
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 4 * workers
+
+    candidates = _chunks(itertools.product(*values), chunk_size)
+    count = 0
+    schema = {name: _value_kind(values[i]) for i, name in enumerate(names)}
+    schema.update(RESULT_SCHEMA)
+    fieldnames = ["index"] + names + [k for k in RESULT_SCHEMA if k != "index"]
+    with open_sink(output, fieldnames=fieldnames, schema=schema) as out, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                initargs=(beam_data, names, loads)) as pool:
+        pending = set()
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < max_pending:
+                chunk = next(candidates, None)
+                if chunk is None:
+                    exhausted = True
+                    break
+                pending.add(pool.submit(_evaluate_chunk, *chunk))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                for record in future.result():
+                    out.write(record)
+                    count += 1
+    return count
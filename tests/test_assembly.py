@@ -0,0 +1,63 @@
+import math
+
+import pytest
+
+from assembly import Assembly
+from beam import Beam
+
+pytest.importorskip("scipy")
+
+
+def member(sections, length=0.1):
+    beam = Beam("PLA", None, 20.0, 3, 0.0004)
+    for _ in range(sections):
+        beam.add_section(length / sections, 0.02, 0.01)
+    return beam
+
+
+def cantilever(sections):
+    assembly = Assembly()
+    assembly.add_node("A", 0, 0, 0)
+    assembly.add_node("B", 0.1, 0, 0)
+    beam = member(sections)
+    assembly.add_member("m", beam, "A", "B")
+    assembly.fix("A")
+    return assembly, beam
+
+
+@pytest.mark.parametrize("sections", [1, 12000])
+def test_long_finely_sectioned_cantilever(sections):
+    assembly, beam = cantilever(sections)
+    p = beam.sections[0].properties
+    F, L = 10.0, 0.1
+    result = assembly.solve({"B": {"Fz": F}})
+    ux, uy, uz, rx, ry, rz = result["displacements"]["B"][0]
+    assert uz == pytest.approx(F * L**3 / (3 * p.EI), rel=1e-9)
+    assert ry == pytest.approx(-F * L**2 / (2 * p.EI), rel=1e-9)
+    # the clamp carries the largest moment, and matches the single-beam analysis
+    beam.input_load(0.0, F, 0.0, 0.0)
+    beam.analysis()
+    assert result["members"]["m"]["max_stress_section"][0] == 0
+    assert result["max_stress"][0] == pytest.approx(beam.sections[0].required_yield_stress, rel=1e-9)
+
+
+@pytest.mark.parametrize("sections", [1, 3, 2000])
+def test_pinned_member_is_a_mechanism(sections):
+    assembly = Assembly()
+    assembly.add_node("A", 0, 0, 0)
+    assembly.add_node("B", 0.1 * math.cos(0.5), 0.1 * math.sin(0.5), 0)
+    assembly.add_member("m", member(sections), "A", "B")
+    assembly.fix("A", ("ux", "uy", "uz"))
+    with pytest.raises(ValueError, match="mechanism"):
+        assembly.factorize()
+
+
+def test_member_pinned_at_both_ends_can_spin():
+    assembly = Assembly()
+    assembly.add_node("A", 0, 0, 0)
+    assembly.add_node("B", 0.1, 0, 0)
+    assembly.add_member("m", member(4), "A", "B")
+    assembly.fix("A", ("ux", "uy", "uz"))
+    assembly.fix("B", ("ux", "uy", "uz"))
+    with pytest.raises(ValueError, match="mechanism"):
+        assembly.factorize()
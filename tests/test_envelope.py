@@ -0,0 +1,62 @@
+import pytest
+
+from beam import Beam
+
+
+def cantilever(sections=4, length=0.1):
+    beam = Beam("PLA", None, 20.0, 3, 0.0004)
+    for _ in range(sections):
+        beam.add_section(length / sections, 0.02, 0.01)
+    return beam
+
+
+@pytest.mark.parametrize("sections", [3, 4, 7])
+def test_tip_deflection_matches_closed_form(sections):
+    beam = cantilever(sections)
+    EI = beam.sections[0].properties.EI
+    F, L = 10.0, 0.1
+    beam.input_load(0.0, F, 0.0, 0.0)
+    displacement, rotation, _ = beam.analysis()
+    assert displacement == pytest.approx(F * L**3 / (3 * EI), rel=1e-12)
+    assert rotation == pytest.approx(F * L**2 / (2 * EI), rel=1e-12)
+    assert beam.analyze_batch({"F": [F]})["displacement"][0] == pytest.approx(displacement, rel=1e-12)
+    assert beam.profile().deflection(L) == pytest.approx(displacement, rel=1e-12)
+
+
+def test_envelope_deflection_along_the_beam():
+    beam = cantilever(4)
+    p = beam.sections[0].properties
+    F, L = 10.0, 0.1
+    report = beam.envelope([{"name": "tip", "F": F}])
+    for j, record in enumerate(report["sections"]):
+        x = (j + 1) * L / 4
+        assert record["displacement"] == pytest.approx(F * x**2 * (3 * L - x) / (6 * p.EI), rel=1e-12)
+    assert report["limits"]["displacement"]["section"] == 3
+    assert report["limits"]["displacement"]["value"] == pytest.approx(F * L**3 / (3 * p.EI), rel=1e-12)
+
+
+def test_envelope_stress_at_the_clamp():
+    beam = cantilever(4)
+    F, L = 10.0, 0.1
+    report = beam.envelope([{"name": "tip", "F": F}])
+    clamp = beam.profile(0.0, F, 0.0, 0.0).required_stress(0.0)
+    assert report["limits"]["stress"]["section"] == 0
+    assert report["limits"]["stress"]["value"] == pytest.approx(float(clamp), rel=1e-12)
+
+
+def test_envelope_checks_the_free_side_end():
+    # a tip moment opposing the force bends the free end more than the clamp
+    beam = cantilever(4)
+    M, F = -1.0, 5.0
+    report = beam.envelope([{"name": "mixed", "M": M, "F": F}])
+    tip = beam.profile(M, F, 0.0, 0.0).required_stress(0.1)
+    assert report["sections"][3]["stress"] == pytest.approx(float(tip), rel=1e-12)
+
+
+def test_displacement_limit_fails():
+    beam = cantilever(4)
+    EI = beam.sections[0].properties.EI
+    exact = 10.0 * 0.1**3 / (3 * EI)
+    report = beam.envelope([{"name": "tip", "F": 10.0}], max_displacement=0.75 * exact)
+    assert report["failed"]
+    assert not report["limits"]["displacement"]["ok"]
@@ -0,0 +1,40 @@
+import pytest
+
+from beam import Beam
+from compact import CompactBeam
+from infill import core_ratios, tables_version
+
+
+def section(pattern, density=60):
+    beam = Beam("PLA", pattern, density, 2, 0.0004)
+    beam.add_section(0.05, 0.02, 0.01)
+    return beam
+
+
+def test_weak_core_lowers_the_tensile_strength():
+    beam = section("gyroid")
+    s = beam.sections[0]
+    core = core_ratios("gyroid", 60, 0.0004)
+    assert core.strength < core.E
+    assert s.tensile_strength == pytest.approx(s.material_properties.tensile_strength * core.strength / core.E)
+    assert CompactBeam.from_beam(beam)[0].tensile_strength == pytest.approx(s.tensile_strength)
+
+
+def test_untabulated_pattern_keeps_the_material_strength():
+    s = section(None).sections[0]
+    assert s.tensile_strength == s.material_properties.tensile_strength
+
+
+def test_stress_between_core_and_material_strength_fails():
+    beam = section("gyroid")
+    s = beam.sections[0]
+    beam.input_load(0.0, 1.0, 0.0, 0.0)
+    beam.analysis()
+    F = (s.tensile_strength + s.material_properties.tensile_strength) / (2 * beam.max_stress)
+    report = beam.envelope([{"F": F}])
+    assert report["failed"]
+
+
+def test_shared_key_only_carries_the_tables_version_for_tabulated_patterns():
+    assert section(None).sections[0]._shared_key()[0] is None
+    assert section("gyroid").sections[0]._shared_key()[0] == tables_version()
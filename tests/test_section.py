@@ -0,0 +1,30 @@
+import pytest
+
+from beam import Beam
+
+pytest.importorskip("scipy")
+
+
+def solid_bar(side=0.01, torsion_method="mesh"):
+    # 100 % infill of the plain density model makes the core as stiff as the shell
+    beam = Beam.from_dict({
+        "defaults": {"material": "PLA", "infill_density": 100, "wall_count": 3, "line_width": 0.0004,
+                     "torsion_method": torsion_method},
+        "sections": [{"length": 0.1, "width": side, "height": side}],
+    })
+    return beam.sections[0]
+
+
+def test_mesh_torsion_matches_saint_venant_square():
+    a = 0.01
+    p = solid_bar(a).properties
+    # J = 0.1406 a^4 and tau_max = T / (0.208 a^3) for a solid square
+    assert p.J == pytest.approx(0.1406 * a**4, rel=1e-3)
+    assert p.r / p.J == pytest.approx(1 / (0.208 * a**3), rel=2e-2)
+
+
+def test_torsion_method_is_part_of_the_cached_properties():
+    section = solid_bar(torsion_method=None)
+    analytic = section.properties.J
+    section.torsion_method = "mesh"
+    assert section.properties.J < analytic
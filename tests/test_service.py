@@ -0,0 +1,18 @@
+import asyncio
+
+import pytest
+
+from service import is_loopback, serve
+
+
+@pytest.mark.parametrize("host, expected", [
+    ("127.0.0.1", True), ("127.0.0.2", True), ("::1", True), ("localhost", True),
+    ("0.0.0.0", False), ("192.168.1.10", False), ("::", False), ("example.com", False),
+])
+def test_is_loopback(host, expected):
+    assert is_loopback(host) is expected
+
+
+def test_serve_refuses_remote_host():
+    with pytest.raises(ValueError, match="non-loopback"):
+        asyncio.run(serve("0.0.0.0", 0, workers=1))
@@ -0,0 +1,18 @@
+import store
+from store import DesignStore
+
+
+def test_analysis_version_change_misses_the_cache(tmp_path, monkeypatch):
+    designs = DesignStore(str(tmp_path / "designs.sqlite"))
+    designs.add("b", {
+        "defaults": {"material": "PLA", "infill_density": 20, "wall_count": 2, "line_width": 0.0004},
+        "sections": [{"length": 0.05, "width": 0.02, "height": 0.01}],
+    })
+    designs.analyze(["b"], [{"F": 1.0}])
+    designs.analyze(["b"], [{"F": 1.0}])
+    assert (designs.hits, designs.misses) == (1, 1)
+
+    monkeypatch.setattr(store, "ANALYSIS_VERSION", store.ANALYSIS_VERSION + 1)
+    designs.analyze(["b"], [{"F": 1.0}])
+    assert (designs.hits, designs.misses) == (1, 2)
+    assert designs.prune_results() == 1
@@ -0,0 +1,27 @@
+import json
+
+import worker
+from loadcases import normalize_load_case
+from main import analyze_beam_file
+
+
+def degenerate_beam():
+    return {
+        "defaults": {"material": "PLA", "infill_density": 20, "wall_count": 2, "line_width": 0.0004},
+        "sections": [{"length": 0.01, "width": 0.0, "height": 0.0}],
+    }
+
+
+def test_arithmetic_error_is_a_job_error():
+    response = worker.handle_job({"id": 7, "beam": degenerate_beam(), "loads": {"M": 1.0, "F": 1.0}})
+    assert response["id"] == 7
+    assert not response["ok"]
+    assert "division by zero" in response["error"]
+
+
+def test_arithmetic_error_is_a_file_error(tmp_path):
+    path = tmp_path / "flat.json"
+    path.write_text(json.dumps(degenerate_beam()))
+    records, sections = analyze_beam_file(str(path), [normalize_load_case({"M": 1.0, "F": 1.0})])
+    assert records == [{"beam": "flat", "file": str(path), "error": "float division by zero"}]
+    assert sections == []
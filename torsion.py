@@ -0,0 +1,193 @@
+import math
+
+from cache import LRUCache
+from instrumentation import instrumented, record_allocation
+
+# memoized torsion constants keyed on (b, h, t, n, method, tol)
+_cache = LRUCache(maxsize=4096)
+
+
+def polar_moment_rectangle(b, h):
+    # polar moment of a solid b x h rectangle about its centroid
+    return b * h * (b**2 + h**2) / 12
+
+
+def core_dimensions(b, h, t):
+    # the core vanishes once the walls meet, the section is then fully shell
+    bi = b - 2 * t
+    hi = h - 2 * t
+    if hasattr(bi, "shape") or hasattr(hi, "shape"):
+        import numpy as np
+        return np.maximum(bi, 0.0), np.maximum(hi, 0.0)
+    return max(bi, 0.0), max(hi, 0.0)
+
+
+def analytic_torsion_constant(b, h, t, n):
+    """
+    Closed form of the composite polar moment used by `torsion_load`.
+
+    The shell is the outer rectangle minus the core, and the core is
+    weighted by the infill ratio `n`. Works on scalars and NumPy arrays.
+    """
+    bi, hi = core_dimensions(b, h, t)
+    J_outer = polar_moment_rectangle(b, h)
+    J_inner = polar_moment_rectangle(bi, hi)
+    return J_outer - (1 - n) * J_inner
+
+
+def saint_venant_rectangle(b, h, terms=20):
+    # series solution of the Saint-Venant torsion constant of a solid rectangle
+    a, c = max(b, h), min(b, h)
+    if c <= 0:
+        return 0.0
+    series = 0.0
+    for k in range(terms):
+        m = 2 * k + 1
+        series += math.tanh(m * math.pi * a / (2 * c)) / m**5
+    return a * c**3 * (1 / 3 - 64 / math.pi**5 * (c / a) * series)
+
+
+def series_torsion_constant(b, h, t, n, terms=20):
+    """
+    Saint-Venant series estimate for a composite rectangular section.
+
+    The core contribution is scaled by the infill ratio `n` the same way
+    as in the polar moment. This is exact for a solid section (n = 1)
+    only: Saint-Venant constants are not additive, so even the hollow
+    section (n = 0) is approximate. Subtracting the solid core overstates
+    a closed thin-walled shell compared with its Bredt value (by about
+    10% for walls a twentieth of the section).
+    """
+    bi, hi = core_dimensions(b, h, t)
+    J_outer = saint_venant_rectangle(b, h, terms)
+    J_inner = saint_venant_rectangle(bi, hi, terms)
+    return J_outer - (1 - n) * J_inner
+
+
+def _midpoint_polar_moment(b, h, bi, hi, n, points):
+    import numpy as np
+
+    # the integrand (x^2 + y^2) * w(x, y) is separable once the core
+    # weight is split off, so only 1-D sample arrays are needed
+    dx = b / points
+    dy = h / points
+    x = (np.arange(points) + 0.5) * dx - b / 2
+    y = (np.arange(points) + 0.5) * dy - h / 2
+    x2 = x**2
+    y2 = y**2
+
+    # fraction of every sample cell covered by the core, so the core edge
+    # does not have to line up with the sampling
+    core_x = np.clip(np.minimum(x + dx / 2, bi / 2) - np.maximum(x - dx / 2, -bi / 2), 0, dx) / dx
+    core_y = np.clip(np.minimum(y + dy / 2, hi / 2) - np.maximum(y - dy / 2, -hi / 2), 0, dy) / dy
+
+    full = points * x2.sum() + points * y2.sum()
+    core = core_y.sum() * (core_x * x2).sum() + core_x.sum() * (core_y * y2).sum()
+    record_allocation("torsion.numeric.samples", x.nbytes + y.nbytes + x2.nbytes + y2.nbytes + core_x.nbytes + core_y.nbytes)
+    return float((full - (1 - n) * core) * dx * dy)
+
+
+@instrumented("torsion.numeric")
+def numeric_torsion_constant(b, h, t, n, tol=1e-6, points=64, max_points=1 << 22):
+    """
+    Adaptive midpoint integration of the composite polar moment.
+
+    The sampling is doubled until two successive estimates agree to the
+    relative tolerance `tol`, or `max_points` per axis is reached.
+    """
+    bi, hi = core_dimensions(b, h, t)
+    previous = _midpoint_polar_moment(b, h, bi, hi, n, points)
+    while points < max_points:
+        points *= 2
+        J = _midpoint_polar_moment(b, h, bi, hi, n, points)
+        if abs(J - previous) <= tol * abs(J):
+            return J
+        previous = J
+    return previous
+
+
+@instrumented("torsion.grid")
+def grid_torsion_constant(b, h, t, n, nx=1000, ny=1000):
+    # brute force integration over a full nx x ny meshgrid (reference only)
+    import numpy as np
+
+    bi = b - 2 * t
+    hi = h - 2 * t
+
+    x = np.linspace(-b/2, b/2, nx)
+    y = np.linspace(-h/2, h/2, ny)
+    dx = x[1] - x[0]
+    dy = y[1] - y[0]
+    X, Y = np.meshgrid(x, y)
+
+    mask_core = (np.abs(X) <= bi/2) & (np.abs(Y) <= hi/2)
+    shear_modulus = np.where(mask_core, n, 1)
+
+    integrand = (X**2 + Y**2) * shear_modulus
+    record_allocation("torsion.grid.meshgrid", X.nbytes + Y.nbytes)
+    record_allocation("torsion.grid.masks", mask_core.nbytes + shear_modulus.nbytes)
+    record_allocation("torsion.grid.integrand", integrand.nbytes)
+    return np.sum(integrand) * dx * dy
+
+
+_METHODS = {
+    "analytic": lambda b, h, t, n, tol: analytic_torsion_constant(b, h, t, n),
+    "series": lambda b, h, t, n, tol: series_torsion_constant(b, h, t, n),
+    "numeric": lambda b, h, t, n, tol: numeric_torsion_constant(b, h, t, n, tol=tol),
+    "mesh": lambda b, h, t, n, tol: _mesh_torsion_constant(b, h, t, n),
+}
+
+
+def _mesh_torsion_constant(b, h, t, n):
+    # scipy and the grid solver are only loaded when the method is used
+    from section_solver import mesh_torsion_constant
+    return mesh_torsion_constant(b, h, t, n)
+
+
+@instrumented("torsion.constant")
+def torsion_constant(b, h, t, n, method="analytic", tol=1e-6):
+    """
+    Torsion constant of a composite rectangular section.
+
+    Parameters:
+    - b, h: outer width and height in meters
+    - t: wall thickness in meters
+    - n: infill ratio of the core (0 to 1)
+    - method: "analytic" (closed form), "series" (Saint-Venant series),
+      "numeric" (adaptive integration with relative tolerance `tol`) or
+      "mesh" (Prandtl stress function solved on a grid, see `section_solver`)
+
+    Returns:
+    - J: torsion constant in m^4
+
+    "analytic" and "numeric" integrate the polar moment, which
+    overestimates the Saint-Venant constant of non-circular sections.
+    "mesh" solves for the Saint-Venant constant of the composite section,
+    shell and core together; it is opt-in, the section properties used by
+    `Beam` are computed with "analytic" unless a section sets
+    `torsion_method` to "mesh".
+
+    Scalar results are memoized in a bounded LRU cache, array inputs are
+    evaluated directly.
+    """
+    if method not in _METHODS:
+        raise ValueError(f"Unknown torsion method '{method}'.")
+    compute = _METHODS[method]
+    if any(hasattr(v, "shape") for v in (b, h, t, n)):
+        if method != "analytic":
+            raise ValueError("Only the analytic torsion method accepts arrays.")
+        return compute(b, h, t, n, tol)
+    key = (b, h, t, n, method, tol)
+    return _cache.get_or_compute(key, lambda: compute(b, h, t, n, tol))
+
+
+def set_cache_size(maxsize):
+    _cache.resize(maxsize)
+
+
+def cache_info():
+    return _cache.info()
+
+
+def clear_cache():
+    _cache.clear()
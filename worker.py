@@ -0,0 +1,179 @@
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+
+from beam import Beam, analyze_beam, validate_beam_data
+from cache import LRUCache
+from loadcases import normalize_load_case
+
+# parsed beams are kept between jobs, so a repeated beam skips the JSON
+# parsing, material lookups and section property evaluation
+_beams = LRUCache(256)
+# jobs share the cached beams, which `Beam.analysis` writes results into
+_lock = threading.Lock()
+_stats = {"jobs": 0, "errors": 0, "busy_s": 0.0, "started": time.time()}
+
+
+def _cached_beam(job):
+    if "beam" in job:
+        data = job["beam"]
+        key = ("data", json.dumps(data, sort_keys=True))
+        return _beams.get_or_compute(key, lambda: Beam.from_dict(data)), data.get("name", "beam")
+    path = job["beam_file"]
+    # the modification time makes an edited file a new cache entry
+    key = ("file", os.path.abspath(path), os.stat(path).st_mtime_ns)
+    name = os.path.splitext(os.path.basename(path))[0]
+    return _beams.get_or_compute(key, lambda: Beam.from_json(path)), name
+
+
+def _analyze(job):
+    loads = job.get("loads", {})
+    if isinstance(loads, dict):
+        loads = [loads]
+    cases = [normalize_load_case(case, i) for i, case in enumerate(loads)]
+    beam, name = _cached_beam(job)
+    records, section_records = analyze_beam(beam, cases, bool(job.get("per_section")), beam=name)
+    response = {"results": records}
+    if job.get("per_section"):
+        response["sections"] = section_records
+    return response
+
+
+def _validate(job):
+    if "beam" in job:
+        data = job["beam"]
+    else:
+        with open(job["beam_file"], "r", encoding="utf-8") as f:
+            data = json.load(f)
+    return {"problems": validate_beam_data(data)}
+
+
+def _stats_job(job):
+    return {"stats": dict(_stats, cached_beams=_beams.info())}
+
+
+def _clear(job):
+    # forget cached beams, e.g. after materials.json changed
+    _beams.clear()
+    return {}
+
+
+OPERATIONS = {
+    "analyze": _analyze,
+    "validate": _validate,
+    "ping": lambda job: {},
+    "stats": _stats_job,
+    "clear": _clear,
+}
+
+
+def handle_job(job):
+    """
+    Run one job and return its response.
+
+    A job is an object with "op" (analyze, validate, ping, stats, clear;
+    default analyze), an optional "id" echoed back, and for analyze and
+    validate either "beam" (a beam definition) or "beam_file" (a path).
+    Analyze jobs take "loads", one {"M", "F", "T", "TF"} case or a list of
+    them, and "per_section" for per-section stresses.
+
+    Returns:
+    - {"id", "ok": True, "elapsed_ms", ...results} or {"id", "ok": False, "error"}
+    """
+    start = time.perf_counter()
+    job_id = job.get("id") if isinstance(job, dict) else None
+    try:
+        if not isinstance(job, dict):
+            raise ValueError("Job must be a JSON object.")
+        operation = OPERATIONS.get(job.get("op", "analyze"))
+        if operation is None:
+            raise ValueError(f"Unknown operation '{job.get('op')}'.")
+        with _lock:
+            response = operation(job)
+        response = dict({"id": job_id, "ok": True}, **response)
+    except (OSError, ValueError, KeyError, TypeError, ArithmeticError) as e:
+        response = {"id": job_id, "ok": False, "error": str(e)}
+    elapsed = time.perf_counter() - start
+    with _lock:
+        _stats["jobs"] += 1
+        _stats["errors"] += not response["ok"]
+        _stats["busy_s"] += elapsed
+    response["elapsed_ms"] = elapsed * 1e3
+    return response
+
+
+def handle_line(line):
+    try:
+        job = json.loads(line)
+    except ValueError as e:
+        return {"id": None, "ok": False, "error": f"Invalid JSON: {e}"}
+    return handle_job(job)
+
+
+def warm_up():
+    """Import the batch path and run a tiny analysis so the first job is not the slow one."""
+    beam = Beam(material="PLA", infill_density=20, wall_count=2, line_width=0.0004)
+    beam.add_section(0.01, 0.01, 0.01)
+    beam.input_load(1.0, 1.0, 1.0, 1.0)
+    beam.analysis()
+    beam.analyze_batch({"M": [1.0, 2.0]})
+
+
+def serve_stream(infile=None, outfile=None):
+    """Answer NDJSON jobs from `infile` (default stdin) until end of input, one response line each."""
+    infile = infile or sys.stdin
+    outfile = outfile or sys.stdout
+    for line in infile:
+        if not line.strip():
+            continue
+        outfile.write(json.dumps(handle_line(line)) + "\n")
+        outfile.flush()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            self.wfile.write((json.dumps(handle_line(line)) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve_socket(path):
+    """
+    Answer NDJSON jobs on a unix socket at `path` until interrupted.
+
+    Every connection may send any number of jobs; connections are served
+    concurrently, the jobs themselves run one at a time.
+    """
+    if os.path.exists(path):
+        os.unlink(path)
+    with _Server(path, _Handler) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(path)
+
+
+def submit(path, jobs):
+    """Send jobs to a worker listening on `path` and return the responses in order."""
+    import socket
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        with sock.makefile("rw", encoding="utf-8") as stream:
+            responses = []
+            for job in jobs:
+                stream.write(json.dumps(job) + "\n")
+                stream.flush()
+                responses.append(json.loads(stream.readline()))
+            return responses